@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 实时事件插件：用例开始/结束时以 JSON 行追加写入事件文件，供平台实时展示执行进度
+
+使用方式：pytest -p pytest_live_plugin（插件所在目录需要在 PYTHONPATH 中），
+事件文件路径通过环境变量 PYTEST_LIVE_EVENTS_FILE 指定，未设置时插件不做任何事情。
+"""
+
+import json
+import os
+import time
+
+EVENTS_FILE_ENV = 'PYTEST_LIVE_EVENTS_FILE'
+SHARD_INDEX_ENV = 'PYTEST_SHARD_INDEX'
+
+# nodeid -> allure 标题（@allure.title 设置的用例名称）
+_titles = {}
+
+
+def _emit(event):
+    """追加写入一行事件；多个分片进程写同一个文件时依赖 O_APPEND 保证单行写入不交错"""
+    path = os.environ.get(EVENTS_FILE_ENV)
+    if not path:
+        return
+    event['time'] = round(time.time(), 3)
+    shard = os.environ.get(SHARD_INDEX_ENV)
+    if shard:
+        event['shard'] = int(shard)
+    line = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def pytest_collection_finish(session):
+    for item in session.items:
+        title = getattr(getattr(item, 'obj', None), '__allure_display_name__', None)
+        if title:
+            _titles[item.nodeid] = title
+    _emit({'event': 'collected', 'count': len(session.items)})
+
+
+def pytest_runtest_logstart(nodeid, location):
+    _emit({'event': 'started', 'nodeid': nodeid, 'title': _titles.get(nodeid)})
+
+
+def pytest_runtest_logreport(report):
+    # 每个用例只发送一次结束事件：call 阶段的结果，或 setup 阶段失败/跳过（不会再执行 call）
+    if report.when == 'call' or (report.when == 'setup' and report.outcome != 'passed'):
+        outcome = report.outcome
+        if report.when == 'setup' and outcome == 'failed':
+            outcome = 'error'
+        _emit({
+            'event': 'finished',
+            'nodeid': report.nodeid,
+            'title': _titles.get(report.nodeid),
+            'outcome': outcome,
+            'duration': round(report.duration, 3)
+        })
+    elif report.when == 'teardown' and report.outcome == 'failed':
+        _emit({'event': 'teardown_failed', 'nodeid': report.nodeid, 'title': _titles.get(report.nodeid)})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    _emit({'event': 'session_finished', 'exitstatus': int(exitstatus)})
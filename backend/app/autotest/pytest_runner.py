@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  常驻 Pytest 执行进程：启动时预先导入 pytest、allure-pytest 和平台工具模块，之后逐个执行平台下发的任务
+
+使用方式：python pytest_runner.py（由 PytestRunnerPool 启动，不需要手动运行）
+- 标准输入每行一个任务 JSON：{"args": pytest 参数, "env": 环境变量, "cwd": 工作目录,
+  "stdout_path": 输出日志, "stderr_path": 错误日志, "test_files": 测试文件}
+- 控制消息写到启动时复制出来的标准输出句柄，每行一个 JSON：ready（预加载完成）、finished（任务结束，含返回码）；
+  执行任务期间文件描述符 1/2 重定向到任务的日志文件，空闲时指向 /dev/null
+- 执行任务数达到 PYTEST_RUNNER_MAX_JOBS 或内存峰值超过 PYTEST_RUNNER_MAX_MEMORY_MB 时，
+  在 finished 消息中标记 recycle 后退出，由平台启动新的进程替换
+"""
+
+import importlib
+import json
+import os
+import resource
+import sys
+import traceback
+
+MAX_JOBS_ENV = 'PYTEST_RUNNER_MAX_JOBS'
+MAX_MEMORY_ENV = 'PYTEST_RUNNER_MAX_MEMORY_MB'
+
+# 生成的测试代码会导入的平台模块（与 test_case_generator 生成的文件头一致）
+PRELOAD_MODULES = (
+    'utils.log_util',
+    'utils.path_util',
+    'utils.http_client_util',
+    'utils.response_util',
+    'autotest.config.config_util',
+)
+
+# pytest 内部错误的退出码
+INTERNAL_ERROR = 3
+# 插件模块已预先导入，pytest 无法再对其做断言重写，忽略对应的警告
+EXTRA_ARGS = ['-W', 'ignore::pytest.PytestAssertRewriteWarning']
+
+
+def _preload():
+    """预先导入 pytest、allure-pytest、实时事件插件和平台工具模块，导入失败的模块留到执行时再导入"""
+    import pytest  # noqa: F401
+    import allure  # noqa: F401
+    import allure_pytest.plugin  # noqa: F401
+    import pytest_live_plugin  # noqa: F401
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    # 插件已导入，移除脚本目录，避免 autotest 下的 config 等目录以顶层包名被导入
+    if sys.path and os.path.abspath(sys.path[0] or '.') == script_dir:
+        sys.path.pop(0)
+
+    # 与生成的测试文件相同：Docker 环境使用 app.xxx，本地环境使用 backend.app.xxx
+    if script_dir.startswith('/app'):
+        project_root, package = '/app', 'app'
+    else:
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(script_dir)))
+        package = 'backend.app'
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(f'{package}.{name}')
+        except Exception:
+            traceback.print_exc()
+
+
+def _memory_mb():
+    """进程内存峰值（MB，Linux 下 ru_maxrss 单位为 KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _redirect(stdout_fd, stderr_fd):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+
+
+def _run_job(job, devnull):
+    """在当前进程中执行一次 pytest.main"""
+    os.environ.clear()
+    os.environ.update(job.get('env') or {})
+    # PYTHONPATH 只在解释器启动时生效，这里手动加入 sys.path；
+    # 任务结束后恢复 sys.path（包括 pytest 插入的 rootdir），避免常驻进程的搜索路径随任务累积
+    path_before = list(sys.path)
+    for path in reversed((os.environ.get('PYTHONPATH') or '').split(os.pathsep)):
+        if path and path not in sys.path:
+            sys.path.insert(0, path)
+    os.chdir(job['cwd'])
+
+    modules_before = set(sys.modules)
+    stdout_fd = os.open(job['stdout_path'], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    stderr_fd = os.open(job['stderr_path'], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        _redirect(stdout_fd, stderr_fd)
+        import pytest
+        returncode = int(pytest.main(EXTRA_ARGS + list(job['args'])))
+    except BaseException:
+        traceback.print_exc()
+        returncode = INTERNAL_ERROR
+    finally:
+        _redirect(devnull, devnull)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        sys.path[:] = path_before
+
+    # 卸载本次导入的测试模块，下次执行同名文件时重新导入；预加载的依赖模块保留
+    test_dirs = {os.path.dirname(os.path.abspath(path)) for path in job.get('test_files') or []}
+    for name in set(sys.modules) - modules_before:
+        module_file = getattr(sys.modules.get(name), '__file__', None) or ''
+        if os.path.dirname(os.path.abspath(module_file)) in test_dirs:
+            sys.modules.pop(name, None)
+    return returncode
+
+
+def main():
+    # 复制一份标准输出作为控制通道，原来的 1/2 号描述符留给 pytest 输出
+    control = os.fdopen(os.dup(1), 'w', encoding='utf-8', buffering=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    _redirect(devnull, devnull)
+
+    def _send(message):
+        control.write(json.dumps(message) + '\n')
+        control.flush()
+
+    _preload()
+    max_jobs = int(os.environ.get(MAX_JOBS_ENV) or 0)
+    max_memory_mb = float(os.environ.get(MAX_MEMORY_ENV) or 0)
+    _send({'event': 'ready', 'pid': os.getpid()})
+
+    jobs = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        returncode = _run_job(json.loads(line), devnull)
+        jobs += 1
+        memory_mb = round(_memory_mb(), 1)
+        recycle = bool((max_jobs and jobs >= max_jobs) or (max_memory_mb and memory_mb >= max_memory_mb))
+        _send({'event': 'finished', 'returncode': returncode, 'jobs': jobs, 'memory_mb': memory_mb,
+               'recycle': recycle})
+        if recycle:
+            break
+
+
+if __name__ == '__main__':
+    main()
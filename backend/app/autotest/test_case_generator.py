@@ -32,6 +32,8 @@ SKIP_NO = "no"
 ASYNC_MARKER = "(asyncio)"
 DOWNLOAD_MARKER = "(download)"
 UPLOAD_MARKER = "(upload)"
+# 生成代码的版本：修改生成逻辑后需要递增，使已缓存的测试文件失效
+GENERATOR_VERSION = '1'
 
 # 特殊字段映射
 SPECIAL_FIELD_MAPPING = {
@@ -549,7 +551,8 @@ class TestAPI:
 
 def generate_pytest_code_from_test_cases(test_cases: List, component_name: str, 
                                           module_name: str, environment_name: str, env_config: Dict,
-                                          output_dir: str) -> str:
+                                          output_dir: str, name_suffix: str = '',
+                                          file_name: Optional[str] = None) -> str:
     """
     从数据库的测试用例对象生成 pytest 测试代码
     
@@ -559,6 +562,8 @@ def generate_pytest_code_from_test_cases(test_cases: List, component_name: str,
     :param environment_name: 环境名称
     :param env_config: 环境配置字典
     :param output_dir: 输出目录
+    :param name_suffix: 文件名后缀（同一秒内生成多个文件时用于区分，如分片序号）
+    :param file_name: 指定输出文件名，为空时按时间戳、组件、模块和环境生成
     :return: 生成的测试文件路径
     """
     # 确保输出目录存在
@@ -569,7 +574,7 @@ def generate_pytest_code_from_test_cases(test_cases: List, component_name: str,
     module_suffix = f"_{module_name.replace(' ', '_').replace('/', '_')}" if module_name else ""
     env_suffix = f"_{environment_name}" if environment_name else ""
     component_suffix = f"_{component_name.replace(' ', '_').replace('/', '_')}" if component_name else ""
-    test_file_name = f"test_auto_{timestamp}{component_suffix}{module_suffix}{env_suffix}.py"
+    test_file_name = file_name or f"test_auto_{timestamp}{component_suffix}{module_suffix}{env_suffix}{name_suffix}.py"
     test_file_path = os.path.join(output_dir, test_file_name)
     
     # 获取模块名（从第一个测试用例获取，如果没有则使用传入的模块名）
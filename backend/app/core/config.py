@@ -50,6 +50,106 @@ class Config:
     
     # CORS 配置
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
+    
+    # 外部数据库连接池注册表配置（进程级共享）
+    DB_ENGINE_REGISTRY_MAX_SIZE = int(os.getenv('DB_ENGINE_REGISTRY_MAX_SIZE', 32))  # 最多缓存的连接池数量
+    DB_ENGINE_REGISTRY_IDLE_TIMEOUT = int(os.getenv('DB_ENGINE_REGISTRY_IDLE_TIMEOUT', 600))  # 空闲多少秒后释放连接池
+    DB_ENGINE_POOL_SIZE = int(os.getenv('DB_ENGINE_POOL_SIZE', 5))
+    DB_ENGINE_MAX_OVERFLOW = int(os.getenv('DB_ENGINE_MAX_OVERFLOW', 10))
+    DB_ENGINE_POOL_RECYCLE = int(os.getenv('DB_ENGINE_POOL_RECYCLE', 3600))
+    DB_CONNECTION_CONFIG_TTL = int(os.getenv('DB_CONNECTION_CONFIG_TTL', 30))  # 连接配置缓存秒数
+    DB_HEALTH_FAILURE_THRESHOLD = int(os.getenv('DB_HEALTH_FAILURE_THRESHOLD', 3))  # 连续失败多少次后熔断
+    DB_HEALTH_COOLDOWN = int(os.getenv('DB_HEALTH_COOLDOWN', 30))  # 熔断冷却秒数
+    
+    # Redis 连接池注册表配置（进程级共享）
+    REDIS_POOL_REGISTRY_MAX_SIZE = int(os.getenv('REDIS_POOL_REGISTRY_MAX_SIZE', 32))  # 最多缓存的连接池数量
+    REDIS_POOL_REGISTRY_IDLE_TIMEOUT = int(os.getenv('REDIS_POOL_REGISTRY_IDLE_TIMEOUT', 600))  # 空闲多少秒后释放连接池
+    REDIS_POOL_MAX_CONNECTIONS = int(os.getenv('REDIS_POOL_MAX_CONNECTIONS', 20))  # 每个连接池的最大连接数
+    REDIS_SOCKET_TIMEOUT = int(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))  # 连接空闲超过该秒数后借出前检测存活
+    
+    # 表结构元数据缓存配置
+    DB_SCHEMA_CACHE_TTL = int(os.getenv('DB_SCHEMA_CACHE_TTL', 300))  # 超过该秒数后校验表版本
+    DB_SCHEMA_CACHE_MAX_ENTRIES = int(os.getenv('DB_SCHEMA_CACHE_MAX_ENTRIES', 20000))
+    DB_SCHEMA_CACHE_VERSION_CHECK_INTERVAL = int(os.getenv('DB_SCHEMA_CACHE_VERSION_CHECK_INTERVAL', 5))  # 同一库版本信息复用秒数
+    
+    # 数据表浏览配置
+    DB_TABLE_DATA_EXACT_COUNT_THRESHOLD = int(os.getenv('DB_TABLE_DATA_EXACT_COUNT_THRESHOLD', 100000))  # 估算行数超过该值时不再精确 COUNT
+    
+    # SQL 查询流式输出配置
+    SQL_STREAM_MAX_ROWS = int(os.getenv('SQL_STREAM_MAX_ROWS', 1000000))  # NDJSON 流式输出的最大行数
+    
+    # 后台查询任务配置
+    SQL_JOB_MAX_WORKERS = int(os.getenv('SQL_JOB_MAX_WORKERS', 4))  # 每个进程的查询任务线程数
+    SQL_JOB_MAX_EXECUTION_TIME = int(os.getenv('SQL_JOB_MAX_EXECUTION_TIME', 300))  # 单个查询最长执行秒数，超时后 KILL QUERY
+    SQL_JOB_MAX_ROWS = int(os.getenv('SQL_JOB_MAX_ROWS', 100000))  # 单个查询最多保存的结果行数
+    SQL_JOB_RESULT_TTL = int(os.getenv('SQL_JOB_RESULT_TTL', 600))  # 查询结果缓存秒数
+    SQL_JOB_SPOOL_DIR = os.getenv('SQL_JOB_SPOOL_DIR', '')  # 查询结果文件目录，为空时使用系统临时目录
+    
+    # 数据比对配置
+    DATA_COMPARE_MAX_WORKERS = int(os.getenv('DATA_COMPARE_MAX_WORKERS', 2))  # 每个进程同时执行的比对任务数
+    DATA_COMPARE_RESULT_TTL = int(os.getenv('DATA_COMPARE_RESULT_TTL', 86400))  # 比对结果保留秒数
+    
+    # 列画像配置
+    DB_COLUMN_PROFILE_TTL = int(os.getenv('DB_COLUMN_PROFILE_TTL', 300))  # 列画像/唯一值缓存时间（秒）
+    DB_COLUMN_PROFILE_SAMPLE_SIZE = int(os.getenv('DB_COLUMN_PROFILE_SAMPLE_SIZE', 10000))  # 大表抽样行数
+    DB_COLUMN_PROFILE_EXACT_THRESHOLD = int(os.getenv('DB_COLUMN_PROFILE_EXACT_THRESHOLD', 100000))  # 估算行数不超过该值时精确统计
+
+    # Redis 键空间分析配置
+    REDIS_ANALYZE_MAX_WORKERS = int(os.getenv('REDIS_ANALYZE_MAX_WORKERS', 2))
+    REDIS_ANALYZE_BATCH_SIZE = int(os.getenv('REDIS_ANALYZE_BATCH_SIZE', 500))  # 每批 SCAN/pipeline 的 key 数量
+    REDIS_ANALYZE_BATCH_INTERVAL = float(os.getenv('REDIS_ANALYZE_BATCH_INTERVAL', 0.05))  # 批次之间休眠秒数
+    REDIS_ANALYZE_LEASE_TIMEOUT = int(os.getenv('REDIS_ANALYZE_LEASE_TIMEOUT', 120))  # 分析任务的租约秒数，超时未续约视为执行进程已退出
+
+    # Redis key 数量统计配置
+    REDIS_KEY_COUNT_SAMPLE_SIZE = int(os.getenv('REDIS_KEY_COUNT_SAMPLE_SIZE', 1000))  # 估算时的抽样数量
+    REDIS_KEY_COUNT_CACHE_TTL = int(os.getenv('REDIS_KEY_COUNT_CACHE_TTL', 600))  # 精确统计结果缓存秒数
+    REDIS_KEY_COUNT_MAX_WORKERS = int(os.getenv('REDIS_KEY_COUNT_MAX_WORKERS', 2))
+
+    # Redis 批量操作配置
+    REDIS_BULK_MAX_WORKERS = int(os.getenv('REDIS_BULK_MAX_WORKERS', 2))
+    REDIS_BULK_DEFAULT_RATE_LIMIT = int(os.getenv('REDIS_BULK_DEFAULT_RATE_LIMIT', 0))  # 默认每秒处理 key 数量，0 表示不限速
+    REDIS_BULK_RESULT_TTL = int(os.getenv('REDIS_BULK_RESULT_TTL', 86400))  # 任务记录保留秒数
+
+    # Redis 数据迁移配置
+    REDIS_TRANSFER_MAX_WORKERS = int(os.getenv('REDIS_TRANSFER_MAX_WORKERS', 2))
+    REDIS_TRANSFER_SPOOL_DIR = os.getenv('REDIS_TRANSFER_SPOOL_DIR')  # 导出文件目录，默认系统临时目录
+    REDIS_TRANSFER_RESULT_TTL = int(os.getenv('REDIS_TRANSFER_RESULT_TTL', 7 * 86400))  # 任务和导出文件保留秒数
+
+    # Pytest 异步执行任务配置
+    PYTEST_JOB_MAX_CONCURRENCY = int(os.getenv('PYTEST_JOB_MAX_CONCURRENCY', 2))  # 所有 worker 进程合计同时执行的任务数
+    PYTEST_JOB_LEASE_TIMEOUT = int(os.getenv('PYTEST_JOB_LEASE_TIMEOUT', 120))  # 执行中任务的租约秒数，超时未续约视为执行进程已退出
+    PYTEST_JOB_POLL_INTERVAL = float(os.getenv('PYTEST_JOB_POLL_INTERVAL', 2))  # 调度线程轮询排队任务的间隔（秒）
+    PYTEST_JOB_LOCK_DIR = os.getenv('PYTEST_JOB_LOCK_DIR')  # 跨进程文件锁目录，默认系统临时目录
+    PYTEST_JOB_DISPATCHER_ENABLED = os.getenv('PYTEST_JOB_DISPATCHER_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # 是否在本进程领取执行任务
+
+    # Pytest 分片执行配置
+    PYTEST_MAX_SHARDS = int(os.getenv('PYTEST_MAX_SHARDS', 8))  # 单次执行最多拆分的 pytest 进程数
+    PYTEST_SHARD_HISTORY_REPORTS = int(os.getenv('PYTEST_SHARD_HISTORY_REPORTS', 20))  # 估算用例耗时使用的最近报告数量
+    PYTEST_SELECTION_HISTORY_REPORTS = int(os.getenv('PYTEST_SELECTION_HISTORY_REPORTS', 50))  # 按历史选择用例时读取的最近报告数量
+
+    # Pytest 失败重跑配置（用例/模块的重跑策略优先）
+    PYTEST_RERUN_DEFAULT_MAX_RERUNS = int(os.getenv('PYTEST_RERUN_DEFAULT_MAX_RERUNS', 0))  # 没有重跑策略时失败用例的默认重跑次数，0 为不重跑
+    PYTEST_RERUN_BACKOFF_SECONDS = float(os.getenv('PYTEST_RERUN_BACKOFF_SECONDS', 2))  # 默认重跑退避秒数，第 N 轮等待 退避秒数 * 2^(N-1)
+    PYTEST_RERUN_MAX_RERUNS = int(os.getenv('PYTEST_RERUN_MAX_RERUNS', 3))  # 单个用例最多重跑次数
+    PYTEST_FLAKY_HISTORY_REPORTS = int(os.getenv('PYTEST_FLAKY_HISTORY_REPORTS', 50))  # 计算用例不稳定度时读取的最近报告数量
+
+    # Pytest 常驻执行进程池配置
+    PYTEST_RUNNER_POOL_ENABLED = os.getenv('PYTEST_RUNNER_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # 在预先导入依赖的常驻进程中执行 pytest
+    PYTEST_RUNNER_POOL_SIZE = int(os.getenv('PYTEST_RUNNER_POOL_SIZE', 2))  # 每个 worker 进程保持的空闲常驻进程数
+    PYTEST_RUNNER_MAX_JOBS = int(os.getenv('PYTEST_RUNNER_MAX_JOBS', 20))  # 常驻进程执行该数量的任务后退出重建
+    PYTEST_RUNNER_MAX_MEMORY_MB = int(os.getenv('PYTEST_RUNNER_MAX_MEMORY_MB', 512))  # 常驻进程内存峰值超过该值（MB）后退出重建
+
+    # Pytest 生成代码缓存配置
+    PYTEST_CODE_CACHE_ENABLED = os.getenv('PYTEST_CODE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # 相同用例和环境配置复用已生成的测试文件
+    PYTEST_CODE_CACHE_TTL = int(os.getenv('PYTEST_CODE_CACHE_TTL', 7 * 86400))  # 生成的测试文件超过该秒数未被使用时清理
+    PYTEST_CODE_CACHE_MAX_FILES = int(os.getenv('PYTEST_CODE_CACHE_MAX_FILES', 500))  # 最多保留的生成测试文件数，超出时按最近使用时间淘汰
+    PYTEST_CODE_CACHE_CLEANUP_INTERVAL = int(os.getenv('PYTEST_CODE_CACHE_CLEANUP_INTERVAL', 3600))  # 调度线程清理生成测试文件的间隔（秒）
+
+    # 数据库导出配置
+    DB_EXPORT_MAX_PARALLELISM = int(os.getenv('DB_EXPORT_MAX_PARALLELISM', 8))  # 并行导出的最大工作线程数
+    DB_EXPORT_SPOOL_DIR = os.getenv('DB_EXPORT_SPOOL_DIR', '')  # 并行导出临时文件目录，为空时使用系统临时目录
+    DB_EXPORT_PROGRESS_TTL = int(os.getenv('DB_EXPORT_PROGRESS_TTL', 86400))  # 导出进度文件保留秒数
 
 
 class DevelopmentConfig(Config):
@@ -8,7 +8,8 @@
 """
 
 from .database_conn_model import DatabaseConnection
+from .redis_model import RedisKeyspaceReport
 from .sql_model import SQLTemplate, QueryHistory
 
-__all__ = ['DatabaseConnection', 'SQLTemplate', 'QueryHistory']
+__all__ = ['DatabaseConnection', 'RedisKeyspaceReport', 'SQLTemplate', 'QueryHistory']
 
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Redis 键空间分析报告实体类
+"""
+
+import json
+
+from ...core.database import db
+from ...models.base.base_model import BaseModel
+
+
+class RedisKeyspaceReport(BaseModel):
+    """Redis 键空间分析报告模型（同时作为分析任务的状态记录）"""
+    __tablename__ = 'redis_keyspace_reports'
+
+    connection_id = db.Column(db.Integer, db.ForeignKey('database_connections.id'), nullable=False, comment='连接ID')
+    status = db.Column(db.String(20), default='queued', comment='状态: queued, running, finished, failed, cancelled')
+    mode = db.Column(db.String(20), default='scan', comment='分析方式: scan（全量扫描）, sample（抽样）')
+    pattern = db.Column(db.String(500), default='*', comment='key 匹配模式')
+    delimiter = db.Column(db.String(10), default=':', comment='前缀分隔符')
+    prefix_depth = db.Column(db.Integer, default=1, comment='前缀层级')
+    sample_size = db.Column(db.Integer, nullable=True, comment='抽样数量')
+    db_size = db.Column(db.BigInteger, nullable=True, comment='分析开始时的 DBSIZE')
+    scanned_keys = db.Column(db.BigInteger, default=0, comment='已分析 key 数量')
+    total_memory = db.Column(db.BigInteger, default=0, comment='已分析 key 的内存合计（字节）')
+    estimated_total_memory = db.Column(db.BigInteger, nullable=True, comment='按抽样比例推算的内存合计（字节）')
+    duration = db.Column(db.Float, nullable=True, comment='分析耗时（秒）')
+    summary = db.Column(db.Text(length=2 ** 24), comment='分析结果(JSON格式，按前缀统计、TTL 分布、大 key 列表，MySQL 中为 MEDIUMTEXT)')
+    error_message = db.Column(db.Text, comment='错误信息')
+    cancel_requested = db.Column(db.Boolean, default=False, comment='是否请求取消')
+    lease_owner = db.Column(db.String(100), nullable=True, comment='执行分析的进程标识（主机名:进程号）')
+    lease_expires_at = db.Column(db.DateTime, nullable=True, comment='执行中任务的租约到期时间，过期视为执行进程已退出')
+    started_at = db.Column(db.DateTime, nullable=True, comment='开始时间')
+    finished_at = db.Column(db.DateTime, nullable=True, comment='结束时间')
+
+    def to_dict(self, include_summary=True):
+        """
+        将分析报告对象转换为字典
+
+        Args:
+            include_summary: 是否包含分析结果明细
+
+        Returns:
+            dict: 分析报告数据的字典表示
+        """
+        result = super().to_dict()
+        summary = result.pop('summary', None)
+        if include_summary:
+            result['summary'] = json.loads(summary) if summary else None
+        return result
+
+    def __repr__(self):
+        return f'<RedisKeyspaceReport {self.id}>'
@@ -33,6 +33,11 @@ class QueryHistory(BaseModel):
     success = db.Column(db.Boolean, default=True, comment='是否成功')
     error_message = db.Column(db.Text, comment='错误信息')
     connection_id = db.Column(db.Integer, db.ForeignKey('database_connections.id'), nullable=True, comment='连接ID')
+    database_name = db.Column(db.String(100), nullable=True, comment='数据库名称')
+    time_to_first_row = db.Column(db.Float, nullable=True, comment='首行返回耗时（秒）')
+    fetch_time = db.Column(db.Float, nullable=True, comment='结果读取耗时（秒）')
+    row_count = db.Column(db.Integer, nullable=True, comment='返回行数')
+    bytes_fetched = db.Column(db.BigInteger, nullable=True, comment='返回数据量（字节，按值文本长度估算）')
 
     def to_dict(self):
         """
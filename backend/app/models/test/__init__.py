@@ -10,7 +10,10 @@
 from .test_case_model import TestCase
 from .test_environment_model import TestEnvironment
 from .test_report_model import TestReport
+from .pytest_job_model import PytestJob
+from .test_case_result_model import TestCaseResult
+from .test_rerun_policy_model import TestRerunPolicy
 
-__all__ = ['TestCase', 'TestEnvironment', 'TestReport']
+__all__ = ['TestCase', 'TestEnvironment', 'TestReport', 'PytestJob', 'TestCaseResult', 'TestRerunPolicy']
 
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 执行任务实体类
+"""
+
+import json
+
+from ...core.database import db
+from ...models.base.base_model import BaseModel
+
+
+class PytestJob(BaseModel):
+    """Pytest 执行任务模型（任务队列与执行状态记录，多个 worker 进程共享）"""
+    __tablename__ = 'pytest_jobs'
+
+    component_name = db.Column(db.String(100), comment='组件名称')
+    module_name = db.Column(db.String(100), comment='模块名称')
+    environment_name = db.Column(db.String(100), nullable=False, comment='环境名称')
+    status = db.Column(db.String(20), default='queued', index=True,
+                       comment='状态: queued, running, finished, failed, cancelled')
+    phase = db.Column(db.String(50), comment='当前阶段: starting, selecting, generating, running, reporting, saving, notifying')
+    progress = db.Column(db.Integer, default=0, comment='进度百分比')
+    options = db.Column(db.Text, comment='执行选项(JSON格式)')
+    result = db.Column(db.Text, comment='执行结果(JSON格式)')
+    output_dir = db.Column(db.String(500), nullable=True, comment='执行目录（日志、实时事件与 allure 结果）')
+    report_id = db.Column(db.Integer, nullable=True, comment='测试报告ID')
+    error_message = db.Column(db.Text, comment='错误信息')
+    cancel_requested = db.Column(db.Boolean, default=False, comment='是否请求取消')
+    lease_owner = db.Column(db.String(200), nullable=True, comment='执行进程标识（主机名:进程号）')
+    lease_expires_at = db.Column(db.DateTime, nullable=True, comment='租约过期时间，执行进程定期续约')
+    started_at = db.Column(db.DateTime, nullable=True, comment='开始时间')
+    finished_at = db.Column(db.DateTime, nullable=True, comment='结束时间')
+
+    def to_dict(self):
+        """
+        将执行任务对象转换为字典
+
+        Returns:
+            dict: 执行任务数据的字典表示
+        """
+        result = super().to_dict()
+        for field in ('options', 'result'):
+            value = result.get(field)
+            result[field] = json.loads(value) if value else None
+        return result
+
+    def __repr__(self):
+        return f'<PytestJob {self.id}>'
@@ -30,6 +30,11 @@ class TestCase(BaseModel):
     is_skip = db.Column(db.String(10), default='no', comment='是否跳过')
     file_path = db.Column(db.String(500), comment='文件路径')
 
+    @property
+    def allure_title(self):
+        """生成代码中 @allure.title 的值，也是 allure 结果中的用例名称"""
+        return f'{self.test_case_id}-{self.test_case_name}'
+
     def to_dict(self):
         """
         将测试用例对象转换为字典
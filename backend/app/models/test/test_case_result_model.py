@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  测试用例执行结果实体类
+"""
+
+from ...core.database import db
+from ...models.base.base_model import BaseModel
+
+
+class TestCaseResult(BaseModel):
+    """测试用例执行结果模型（每份测试报告中每个用例一条，用于历史统计）"""
+    __tablename__ = 'test_case_results'
+
+    report_id = db.Column(db.Integer, db.ForeignKey('test_reports.id'), nullable=False, index=True, comment='测试报告ID')
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=True, index=True,
+                             comment='测试用例主键ID（按 allure 标题匹配，匹配不到时为空）')
+    case_name = db.Column(db.String(500), nullable=False, comment='用例名称（allure 标题: 用例ID-用例名称）')
+    full_name = db.Column(db.String(500), comment='用例完整名称（模块.类#方法）')
+    status = db.Column(db.String(20), nullable=False, comment='最终状态: passed, failed, broken, skipped, unknown')
+    first_status = db.Column(db.String(20), comment='首次执行状态（失败重跑前的结果）')
+    attempts = db.Column(db.Integer, default=1, comment='执行次数（首次执行 + 重跑次数）')
+    duration = db.Column(db.Float, default=0.0, comment='执行时长(秒)')
+    message = db.Column(db.Text, comment='失败信息')
+    started_at = db.Column(db.DateTime, nullable=True, comment='开始时间')
+
+    @property
+    def is_flaky(self):
+        """首次执行失败、重跑后通过"""
+        return self.status == 'passed' and self.first_status in ('failed', 'broken')
+
+    def __repr__(self):
+        return f'<TestCaseResult {self.case_name}: {self.status}>'
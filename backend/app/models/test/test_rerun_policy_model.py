@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  失败重跑策略实体类
+"""
+
+from ...core.database import db
+from ...models.base.base_model import BaseModel
+
+
+class TestRerunPolicy(BaseModel):
+    """失败重跑策略模型（按用例或按模块配置，用例策略优先于模块策略）"""
+    __tablename__ = 'test_rerun_policies'
+
+    test_case_id = db.Column(db.Integer, db.ForeignKey('test_cases.id'), nullable=True, index=True,
+                             comment='测试用例主键ID（为空时按模块匹配）')
+    component_name = db.Column(db.String(100), comment='组件名称（按模块匹配时可选）')
+    module_name = db.Column(db.String(100), index=True, comment='模块名称')
+    max_reruns = db.Column(db.Integer, nullable=False, default=1, comment='失败后最多重跑次数')
+    backoff_seconds = db.Column(db.Float, nullable=False, default=2.0, comment='首次重跑前等待秒数，之后每次翻倍')
+    description = db.Column(db.String(500), comment='说明')
+
+    def __repr__(self):
+        return f'<TestRerunPolicy {self.test_case_id or self.module_name}: {self.max_reruns}>'
@@ -38,6 +38,18 @@ from ..core.config import config, get_config_name
 from ..core.database import db, migrate
 from ..core.response_logger import ResponseLogger
 from ..services.init import InitService
+from ..services.database.column_profile_service import column_profile_service
+from ..services.database.connection_registry import engine_registry, redis_pool_registry
+from ..services.database.data_compare_service import data_compare_service
+from ..services.database.query_job_service import query_job_service
+from ..services.database.redis_analyzer_service import redis_keyspace_analyzer
+from ..services.database.redis_bulk_service import redis_bulk_service
+from ..services.database.redis_key_count_service import redis_key_count_service
+from ..services.database.redis_transfer_service import redis_transfer_service
+from ..services.database.schema_metadata_cache import schema_cache
+from ..services.test.pytest_code_cache_service import pytest_code_cache
+from ..services.test.pytest_job_service import pytest_job_service
+from ..services.test.pytest_runner_pool import pytest_runner_pool
 from ..services.tool import script_management_service
 from ..services.auth import AuthService
 from ..services.auth.api_access_log_service import ApiAccessLogService
@@ -95,6 +107,19 @@ def create_app(config_name=None):
 
     db.init_app(app)
     migrate.init_app(app, db)
+    engine_registry.init_app(app)
+    redis_pool_registry.init_app(app)
+    schema_cache.init_app(app)
+    column_profile_service.init_app(app)
+    query_job_service.init_app(app)
+    data_compare_service.init_app(app)
+    redis_keyspace_analyzer.init_app(app)
+    redis_key_count_service.init_app(app)
+    redis_bulk_service.init_app(app)
+    redis_transfer_service.init_app(app)
+    pytest_code_cache.init_app(app)
+    pytest_runner_pool.init_app(app)
+    pytest_job_service.init_app(app)
 
     with app.app_context():
         _initialize_database(app)
@@ -10,7 +10,10 @@
 from flask import Blueprint, request, jsonify
 
 from ...core.exceptions import APIException
+from ...services.database.data_compare_service import data_compare_service
+from ...services.database.database_export_service import DatabaseExportService
 from ...services.database.database_info_service import DatabaseInfoService
+from ...services.database.sql_service import SQLService
 
 database_info_bp = Blueprint('database_info', __name__)
 
@@ -71,13 +74,31 @@ def get_column_unique_values(connection_id, database_name, table_name, column_na
         raise APIException('服务器错误', 500, {'details': str(e)})
 
 
+@database_info_bp.route('/database-info/<int:connection_id>/databases/<database_name>/tables/<table_name>/columns/<column_name>/profile', methods=['GET'])
+def get_column_profile(connection_id, database_name, table_name, column_name):
+    """获取列值画像（近似基数、空值比例、Top-N 值），refresh=true 时忽略缓存"""
+    try:
+        top_n = request.args.get('top_n', type=int)
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        result = DatabaseInfoService().get_column_profile(connection_id, database_name, table_name, column_name,
+                                                          top_n=top_n, refresh=refresh)
+        return jsonify(result)
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
 @database_info_bp.route('/database-info/<int:connection_id>/databases/<database_name>/tables/<table_name>/data', methods=['GET'])
 def get_table_data(connection_id, database_name, table_name):
-    """获取数据表数据（支持分页和筛选）"""
+    """获取数据表数据（支持页码/游标分页、估算总数和筛选）"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 100, type=int)
         search = request.args.get('search')
+        paging = request.args.get('paging')  # 可选，offset 或 keyset
+        cursor = request.args.get('cursor')  # 可选，keyset 分页游标（next_cursor / prev_cursor）
+        count = request.args.get('count')  # 可选，exact、estimated 或 none
         # 获取筛选条件（JSON格式）
         filters_json = request.args.get('filters')
         filters = None
@@ -88,7 +109,8 @@ def get_table_data(connection_id, database_name, table_name):
             except json.JSONDecodeError:
                 filters = None
         
-        result = DatabaseInfoService().get_table_data(connection_id, database_name, table_name, page, per_page, search, filters)
+        result = DatabaseInfoService().get_table_data(connection_id, database_name, table_name, page, per_page, search, filters,
+                                                      paging=paging, cursor=cursor, count=count)
         return jsonify(result)
     except APIException as e:
         raise e
@@ -103,11 +125,13 @@ def execute_query(connection_id):
         data = request.get_json()
         database_name = data.get('database_name')
         query = data.get('query')
+        limit = data.get('limit')  # 可选，每页行数
+        continuation_token = data.get('continuation_token')  # 可选，上一页返回的续页令牌
         
         if not query:
             raise APIException('SQL查询不能为空', 400)
         
-        result = DatabaseInfoService().execute_query(connection_id, database_name, query)
+        result = DatabaseInfoService().execute_query(connection_id, database_name, query, limit, continuation_token)
         return jsonify(result)
     except APIException as e:
         raise e
@@ -115,6 +139,31 @@ def execute_query(connection_id):
         raise APIException('服务器错误', 500, {'details': str(e)})
 
 
+@database_info_bp.route('/database-info/<int:connection_id>/execute-stream', methods=['POST'])
+def execute_query_stream(connection_id):
+    """以 NDJSON 格式流式返回查询结果（用于大结果集导出）"""
+    try:
+        from flask import Response, g, stream_with_context
+        
+        data = request.get_json()
+        query = data.get('query')
+        if not query:
+            raise APIException('SQL查询不能为空', 400)
+        
+        lines = SQLService.stream_sql_ndjson(
+            query,
+            max_rows=data.get('max_rows'),
+            connection_id=connection_id,
+            database_name=data.get('database_name'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
 @database_info_bp.route('/database-info/<int:connection_id>/close', methods=['POST'])
 def close_connection(connection_id):
     """关闭数据库连接"""
@@ -127,6 +176,92 @@ def close_connection(connection_id):
         raise APIException('服务器错误', 500, {'details': str(e)})
 
 
+@database_info_bp.route('/database-info/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """获取连接池注册表统计信息（存活连接池、借出连接数、命中率）"""
+    try:
+        return jsonify(DatabaseInfoService.get_pool_stats())
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@database_info_bp.route('/database-info/schema-cache/stats', methods=['GET'])
+def get_schema_cache_stats():
+    """获取表结构元数据缓存统计信息"""
+    try:
+        return jsonify(DatabaseInfoService.get_schema_cache_stats())
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@database_info_bp.route('/database-info/<int:connection_id>/schema-cache/refresh', methods=['POST'])
+def refresh_schema_cache(connection_id):
+    """刷新表结构元数据缓存（可指定数据库名、表名）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = DatabaseInfoService.refresh_schema_cache(
+            connection_id,
+            data.get('database_name'),
+            data.get('table_name')
+        )
+        return jsonify(result)
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@database_info_bp.route('/database-info/compare', methods=['POST'])
+def submit_data_compare():
+    """提交数据比对任务（按主键分块校验和比对两个连接中的表）"""
+    try:
+        from flask import g
+        
+        data = request.get_json()
+        job = data_compare_service.submit(
+            data.get('source_connection_id'),
+            data.get('source_database'),
+            data.get('target_connection_id'),
+            data.get('target_database'),
+            data.get('table_name'),
+            target_table=data.get('target_table'),
+            chunk_size=data.get('chunk_size'),
+            max_keys=data.get('max_keys'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(job), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('提交数据比对任务失败', 500, {'details': str(e)})
+
+
+@database_info_bp.route('/database-info/compare/<job_id>', methods=['GET'])
+def get_data_compare(job_id):
+    """获取数据比对任务状态和结果（新增、修改、删除的主键）"""
+    try:
+        return jsonify(data_compare_service.get_status(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@database_info_bp.route('/database-info/compare/<job_id>/cancel', methods=['POST'])
+def cancel_data_compare(job_id):
+    """取消数据比对任务"""
+    try:
+        return jsonify(data_compare_service.cancel(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
 @database_info_bp.route('/database-info/<int:connection_id>/export-sql', methods=['POST'])
 def export_data_to_sql(connection_id):
     """导出选中的数据为SQL文件"""
@@ -178,9 +313,9 @@ def export_data_to_sql(connection_id):
 
 @database_info_bp.route('/database-info/<int:connection_id>/export-databases-sql', methods=['POST'])
 def export_databases_to_sql(connection_id):
-    """导出多个数据库为SQL文件（包括表结构和数据）"""
+    """导出多个数据库为SQL文件（包括表结构和数据），以流式响应分块返回"""
     try:
-        from flask import Response
+        from flask import Response, stream_with_context
         
         data = request.get_json()
         # 支持新格式：database_tables（数据库和表的映射）
@@ -188,6 +323,11 @@ def export_databases_to_sql(connection_id):
         database_tables = data.get('database_tables', {})
         database_names = data.get('database_names', [])
         sql_types = data.get('sql_types', None)  # 可选，默认为全部类型
+        insert_batch_size = data.get('insert_batch_size')  # 可选，每条多行INSERT包含的行数
+        fetch_size = data.get('fetch_size')  # 可选，每次从数据库读取的行数
+        compress = data.get('compress')  # 可选，'gzip' 表示压缩输出
+        parallelism = data.get('parallelism')  # 可选，大于1时按表并行导出
+        export_id = data.get('export_id')  # 可选，并行导出的任务ID，用于查询导出进度
         
         # 兼容旧格式：如果只有database_names，转换为database_tables格式
         if database_names and len(database_names) > 0:
@@ -195,13 +335,39 @@ def export_databases_to_sql(connection_id):
                 database_tables = {db_name: None for db_name in database_names}
         elif not database_tables or len(database_tables) == 0:
             raise APIException('没有选择任何数据库', 400)
+        if compress not in (None, '', 'gzip'):
+            raise APIException('不支持的压缩格式，仅支持 gzip', 400)
+        if parallelism not in (None, ''):
+            try:
+                parallelism = int(parallelism)
+            except (TypeError, ValueError):
+                raise APIException('parallelism 必须为整数', 400)
+        else:
+            parallelism = None
         
-        service = DatabaseInfoService()
-        sql_content = service.export_databases_to_sql(
-            connection_id, 
-            database_tables, 
-            sql_types
-        )
+        service = DatabaseExportService()
+        headers = {}
+        if parallelism is not None and parallelism > 1:
+            export_id, chunks = service.export_databases_sql_parallel(
+                connection_id,
+                database_tables,
+                sql_types,
+                parallelism=parallelism,
+                export_id=export_id,
+                insert_batch_size=insert_batch_size,
+                fetch_size=fetch_size
+            )
+            # 通过响应头返回导出任务ID，用于查询导出进度
+            headers['X-Export-Id'] = export_id
+            headers['Access-Control-Expose-Headers'] = 'Content-Disposition, X-Export-Id'
+        else:
+            chunks = service.export_databases_sql_stream(
+                connection_id, 
+                database_tables, 
+                sql_types,
+                insert_batch_size=insert_batch_size,
+                fetch_size=fetch_size
+            )
         
         # 生成文件名
         from datetime import datetime
@@ -212,13 +378,24 @@ def export_databases_to_sql(connection_id):
             db_names_str += f"_等{len(db_names)}个"
         filename = f"databases_{db_names_str}_{timestamp}.sql"
         
-        # 返回SQL文件
+        # 返回SQL文件（流式输出，不在内存中拼接完整内容）
+        if compress == 'gzip':
+            return Response(
+                stream_with_context(DatabaseExportService.gzip_stream(chunks)),
+                mimetype='application/gzip',
+                headers={
+                    'Content-Disposition': f'attachment; filename="{filename}.gz"',
+                    **headers
+                }
+            )
+        
         response = Response(
-            sql_content,
+            stream_with_context(chunks),
             mimetype='application/sql',
             headers={
                 'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'text/plain; charset=utf-8'
+                'Content-Type': 'text/plain; charset=utf-8',
+                **headers
             }
         )
         return response
@@ -228,3 +405,14 @@ def export_databases_to_sql(connection_id):
     except Exception as e:
         raise APIException('导出数据库SQL失败', 500, {'details': str(e)})
 
+
+@database_info_bp.route('/database-info/export-progress/<export_id>', methods=['GET'])
+def get_export_progress(export_id):
+    """获取并行导出进度（每个表已导出的行数和字节数）"""
+    try:
+        return jsonify(DatabaseExportService().get_export_progress(export_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
@@ -7,10 +7,14 @@
 @description  Redis 数据库路由
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, send_file
 
 from ...core.exceptions import APIException
+from ...services.database.redis_analyzer_service import redis_keyspace_analyzer
+from ...services.database.redis_bulk_service import redis_bulk_service
+from ...services.database.redis_key_count_service import redis_key_count_service
 from ...services.database.redis_service import RedisService
+from ...services.database.redis_transfer_service import redis_transfer_service
 
 redis_bp = Blueprint('redis', __name__)
 
@@ -31,11 +35,31 @@ def get_keys(connection_id):
         raise APIException('服务器错误', 500, {'details': str(e)})
 
 
+@redis_bp.route('/redis/<int:connection_id>/keys/meta', methods=['POST'])
+def get_keys_meta(connection_id):
+    """批量获取 key 的元信息（类型、TTL、编码、长度、内存占用）"""
+    try:
+        data = request.get_json() or {}
+        keys = data.get('keys', [])
+        
+        if not keys:
+            raise APIException('请提供要查询的 keys', 400)
+        
+        result = RedisService().get_keys_meta(connection_id, keys)
+        return jsonify(result)
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
 @redis_bp.route('/redis/<int:connection_id>/keys/<path:key>', methods=['GET'])
 def get_key_info(connection_id, key):
-    """获取 key 的详细信息"""
+    """获取 key 的详细信息（集合类值按 cursor、count 分页读取）"""
     try:
-        result = RedisService().get_key_info(connection_id, key)
+        cursor = request.args.get('cursor')
+        count = request.args.get('count', type=int)
+        result = RedisService().get_key_info(connection_id, key, cursor, count)
         return jsonify(result)
     except APIException as e:
         raise e
@@ -121,11 +145,35 @@ def delete_keys(connection_id):
 
 @redis_bp.route('/redis/<int:connection_id>/keys/count', methods=['GET'])
 def get_key_count(connection_id):
-    """获取 key 的数量"""
+    """获取 key 的数量（mode=estimate 抽样估算，mode=exact 提交后台精确统计任务）"""
     try:
         pattern = request.args.get('pattern', '*')
-        result = RedisService().get_key_count(connection_id, pattern)
-        return jsonify(result)
+        mode = request.args.get('mode', 'estimate')
+        sample_size = request.args.get('sample_size', type=int)
+        result, ready = RedisService().get_key_count(connection_id, pattern, mode, sample_size)
+        return jsonify(result), 200 if ready else 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/keys/count-jobs/<job_id>', methods=['GET'])
+def get_key_count_job(job_id):
+    """获取精确统计任务的状态和结果"""
+    try:
+        return jsonify(redis_key_count_service.get_job(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/keys/count-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_key_count_job(job_id):
+    """取消精确统计任务"""
+    try:
+        return jsonify(redis_key_count_service.cancel(job_id))
     except APIException as e:
         raise e
     except Exception as e:
@@ -161,3 +209,267 @@ def close_connection(connection_id):
     except Exception as e:
         raise APIException('服务器错误', 500, {'details': str(e)})
 
+
+@redis_bp.route('/redis/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """获取 Redis 连接池注册表统计信息（存活连接池、借出连接数、命中率）"""
+    try:
+        return jsonify(RedisService.get_pool_stats())
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/analyze', methods=['POST'])
+def submit_keyspace_analysis(connection_id):
+    """提交键空间分析任务（按前缀统计内存、TTL 分布和大 key）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = redis_keyspace_analyzer.submit(
+            connection_id,
+            pattern=data.get('pattern', '*'),
+            delimiter=data.get('delimiter', ':'),
+            prefix_depth=data.get('prefix_depth'),
+            sample_size=data.get('sample_size'),
+            top_n=data.get('top_n'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(result), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/analyze/reports', methods=['GET'])
+def list_keyspace_reports(connection_id):
+    """获取连接的历史分析报告"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify(redis_keyspace_analyzer.list_reports(connection_id, limit))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/analyze/reports/<int:report_id>', methods=['GET'])
+def get_keyspace_report(report_id):
+    """获取分析报告（进度或结果）"""
+    try:
+        return jsonify(redis_keyspace_analyzer.get_report(report_id).to_dict())
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/analyze/reports/<int:report_id>/cancel', methods=['POST'])
+def cancel_keyspace_analysis(report_id):
+    """取消分析任务"""
+    try:
+        return jsonify(redis_keyspace_analyzer.cancel(report_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/analyze/reports/<int:report_id>/compare/<int:base_report_id>', methods=['GET'])
+def compare_keyspace_reports(report_id, base_report_id):
+    """对比两次分析结果（按前缀的数量与内存变化）"""
+    try:
+        return jsonify(redis_keyspace_analyzer.compare(report_id, base_report_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/bulk', methods=['POST'])
+def submit_bulk_operation(connection_id):
+    """提交批量操作任务（按模式删除、设置/移除过期时间、重命名前缀）"""
+    try:
+        data = request.get_json() or {}
+        operation = data.get('operation')
+        
+        if not operation:
+            raise APIException('请提供操作类型', 400)
+        
+        result = redis_bulk_service.submit(
+            connection_id,
+            operation,
+            pattern=data.get('pattern'),
+            ttl=data.get('ttl'),
+            prefix=data.get('prefix'),
+            new_prefix=data.get('new_prefix'),
+            dry_run=data.get('dry_run', False),
+            rate_limit=data.get('rate_limit'),
+            batch_size=data.get('batch_size'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(result), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/bulk-jobs', methods=['GET'])
+def list_bulk_jobs(connection_id):
+    """获取连接的批量操作任务列表"""
+    try:
+        return jsonify(redis_bulk_service.list_jobs(connection_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/bulk-jobs/<job_id>', methods=['GET'])
+def get_bulk_job(job_id):
+    """获取批量操作任务进度（扫描/处理数量、吞吐量）"""
+    try:
+        return jsonify(redis_bulk_service.get_job(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/bulk-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_bulk_job(job_id):
+    """取消批量操作任务"""
+    try:
+        return jsonify(redis_bulk_service.cancel(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/copy', methods=['POST'])
+def submit_copy(connection_id):
+    """提交复制任务（DUMP/RESTORE 流式复制到目标连接）"""
+    try:
+        data = request.get_json() or {}
+        target_connection_id = data.get('target_connection_id')
+        
+        if not target_connection_id:
+            raise APIException('请提供目标连接ID', 400)
+        
+        result = redis_transfer_service.submit_copy(
+            connection_id,
+            int(target_connection_id),
+            pattern=data.get('pattern', '*'),
+            replace=data.get('replace', True),
+            batch_size=data.get('batch_size'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(result), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/export', methods=['POST'])
+def submit_export(connection_id):
+    """提交导出任务（导出为可重新导入的数据文件）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = redis_transfer_service.submit_export(
+            connection_id,
+            pattern=data.get('pattern', '*'),
+            batch_size=data.get('batch_size'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(result), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/<int:connection_id>/import', methods=['POST'])
+def submit_import(connection_id):
+    """提交导入任务（使用已完成导出任务的文件或上传的导出文件）"""
+    try:
+        if 'file' in request.files:
+            data = request.form
+            file_storage = request.files['file']
+        else:
+            data = request.get_json(silent=True) or {}
+            file_storage = None
+        replace = str(data.get('replace', 'true')).lower() not in ('false', '0')
+        result = redis_transfer_service.submit_import(
+            connection_id,
+            export_job_id=data.get('export_job_id'),
+            file_storage=file_storage,
+            replace=replace,
+            batch_size=data.get('batch_size'),
+            current_user=getattr(g, 'current_user', None)
+        )
+        return jsonify(result), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/transfer-jobs', methods=['GET'])
+def list_transfer_jobs():
+    """获取迁移任务列表"""
+    try:
+        return jsonify(redis_transfer_service.list_jobs())
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/transfer-jobs/<job_id>', methods=['GET'])
+def get_transfer_job(job_id):
+    """获取迁移任务进度"""
+    try:
+        return jsonify(redis_transfer_service.get_job(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/transfer-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_transfer_job(job_id):
+    """取消迁移任务"""
+    try:
+        return jsonify(redis_transfer_service.cancel(job_id))
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/transfer-jobs/<job_id>/resume', methods=['POST'])
+def resume_transfer_job(job_id):
+    """从上次保存的游标继续失败或已取消的迁移任务"""
+    try:
+        return jsonify(redis_transfer_service.resume(job_id)), 202
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
+
+
+@redis_bp.route('/redis/transfer-jobs/<job_id>/download', methods=['GET'])
+def download_export_file(job_id):
+    """下载导出文件"""
+    try:
+        path = redis_transfer_service.get_export_file(job_id)
+        return send_file(path, as_attachment=True, download_name=f'redis_export_{job_id}.rdump',
+                         mimetype='application/octet-stream')
+    except APIException as e:
+        raise e
+    except Exception as e:
+        raise APIException('服务器错误', 500, {'details': str(e)})
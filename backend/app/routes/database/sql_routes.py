@@ -7,8 +7,10 @@
 @description  SQL 工具箱路由
 """
 
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 
+from ...core.exceptions import APIException
+from ...services.database.query_job_service import query_job_service
 from ...services.database.sql_service import SQLService
 
 sql_bp = Blueprint('sql', __name__)
@@ -35,6 +37,7 @@ def execute_sql():
     limit = data.get('limit', 1000)
     connection_id = data.get('connection_id')
     database_name = data.get('database_name')
+    continuation_token = data.get('continuation_token')  # 续页令牌，获取下一页时携带
 
     if not sql_query:
         return jsonify({'success': False, 'error': 'SQL查询不能为空'})
@@ -47,10 +50,104 @@ def execute_sql():
             return jsonify({'success': False, 'error': '连接ID格式错误'})
 
     current_user = getattr(g, 'current_user', None)
-    result = SQLService.execute_sql(sql_query, limit, connection_id, database_name, current_user)
+    result = SQLService.execute_sql(sql_query, limit, connection_id, database_name, current_user, continuation_token)
     return jsonify(result)
 
 
+@sql_bp.route('/sql/execute-stream', methods=['POST'])
+def execute_sql_stream():
+    """以 NDJSON 格式流式返回查询结果（用于大结果集导出）"""
+    data = request.get_json()
+    sql_query = data.get('sql_query', '').strip()
+    connection_id = data.get('connection_id')
+    database_name = data.get('database_name')
+    max_rows = data.get('max_rows')
+
+    if not sql_query:
+        return jsonify({'success': False, 'error': 'SQL查询不能为空'}), 400
+
+    # 转换connection_id为整数（如果提供）
+    if connection_id is not None:
+        try:
+            connection_id = int(connection_id)
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'error': '连接ID格式错误'}), 400
+
+    current_user = getattr(g, 'current_user', None)
+    try:
+        lines = SQLService.stream_sql_ndjson(sql_query, max_rows, connection_id, database_name, current_user)
+    except APIException as e:
+        return jsonify({'success': False, 'error': e.message}), e.status_code
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+@sql_bp.route('/sql/jobs', methods=['POST'])
+def submit_query_job():
+    """提交后台查询任务"""
+    data = request.get_json()
+    sql_query = data.get('sql_query', '').strip()
+    connection_id = data.get('connection_id')
+
+    if not sql_query:
+        return jsonify({'success': False, 'error': 'SQL查询不能为空'}), 400
+
+    # 转换connection_id为整数（如果提供）
+    if connection_id is not None:
+        try:
+            connection_id = int(connection_id)
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'error': '连接ID格式错误'}), 400
+
+    current_user = getattr(g, 'current_user', None)
+    try:
+        job = query_job_service.submit(
+            sql_query,
+            connection_id=connection_id,
+            database_name=data.get('database_name'),
+            max_execution_time=data.get('max_execution_time'),
+            max_rows=data.get('max_rows'),
+            current_user=current_user
+        )
+    except APIException as e:
+        return jsonify({'success': False, 'error': e.message}), e.status_code
+    return jsonify({'success': True, 'data': job}), 202
+
+
+@sql_bp.route('/sql/jobs', methods=['GET'])
+def list_query_jobs():
+    """获取后台查询任务列表"""
+    return jsonify({'success': True, 'data': query_job_service.list_jobs()})
+
+
+@sql_bp.route('/sql/jobs/<job_id>', methods=['GET'])
+def get_query_job(job_id):
+    """获取后台查询任务状态"""
+    try:
+        return jsonify({'success': True, 'data': query_job_service.get_status(job_id)})
+    except APIException as e:
+        return jsonify({'success': False, 'error': e.message}), e.status_code
+
+
+@sql_bp.route('/sql/jobs/<job_id>/results', methods=['GET'])
+def get_query_job_results(job_id):
+    """分页获取后台查询任务结果"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 100, type=int)
+    try:
+        return jsonify({'success': True, 'data': query_job_service.get_results(job_id, page, per_page)})
+    except APIException as e:
+        return jsonify({'success': False, 'error': e.message}), e.status_code
+
+
+@sql_bp.route('/sql/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_query_job(job_id):
+    """取消后台查询任务（执行 KILL QUERY）"""
+    try:
+        return jsonify({'success': True, 'data': query_job_service.cancel(job_id)})
+    except APIException as e:
+        return jsonify({'success': False, 'error': e.message}), e.status_code
+
+
 @sql_bp.route('/sql/templates', methods=['GET'])
 def get_templates():
     """获取所有SQL模板"""
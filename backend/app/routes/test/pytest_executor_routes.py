@@ -7,9 +7,13 @@
 @description  Pytest执行路由
 """
 
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 
+from ...services.test.pytest_code_cache_service import pytest_code_cache
 from ...services.test.pytest_executor_service import PytestExecutorService
+from ...services.test.pytest_job_service import pytest_job_service
+from ...services.test.pytest_live_service import PytestLiveService
+from ...services.test.pytest_rerun_service import PytestRerunService
 from ...core.exceptions import APIException
 
 pytest_executor_bp = Blueprint('pytest_executor', __name__)
@@ -17,21 +21,175 @@ pytest_executor_bp = Blueprint('pytest_executor', __name__)
 
 @pytest_executor_bp.route('/pytest-executor/execute', methods=['POST'])
 def execute_pytest():
-    """执行Pytest测试并生成Allure报告"""
+    """
+    执行Pytest测试并生成Allure报告
+    与 /pytest-executor/jobs 相同提交到执行队列（占用同一执行名额），立即返回任务ID，
+    通过任务状态或事件流接口获取执行结果
+    """
     try:
         data = request.get_json() or {}
-        module_name = data.get('module_name')
         environment_name = data.get('environment_name')
-        component_name = data.get('component_name')
-        current_user = g.get('current_user')
-        
         if not environment_name:
             return jsonify({'error': '请选择测试环境'}), 400
 
-        result = PytestExecutorService.execute_pytest(component_name, module_name, environment_name, current_user)
-        return jsonify(result)
+        options = {name: data[name] for name in ('shards', 'selection', 'rerun') if data.get(name) is not None}
+        job = pytest_job_service.submit(
+            environment_name=environment_name,
+            component_name=data.get('component_name'),
+            module_name=data.get('module_name'),
+            options=options or None,
+            current_user=g.get('current_user')
+        )
+        return jsonify(job), 202
     except APIException as e:
         return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@pytest_executor_bp.route('/pytest-executor/jobs', methods=['POST'])
+def submit_pytest_job():
+    """提交Pytest异步执行任务，立即返回任务ID"""
+    try:
+        data = request.get_json() or {}
+        environment_name = data.get('environment_name')
+        if not environment_name:
+            return jsonify({'error': '请选择测试环境'}), 400
+
+        job = pytest_job_service.submit(
+            environment_name=environment_name,
+            component_name=data.get('component_name'),
+            module_name=data.get('module_name'),
+            options=data.get('options'),
+            current_user=g.get('current_user')
+        )
+        return jsonify(job), 202
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/jobs', methods=['GET'])
+def get_pytest_jobs():
+    """获取Pytest执行任务列表"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        status = request.args.get('status')
+        return jsonify(pytest_job_service.list_jobs(page, per_page, status))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/jobs/<int:job_id>', methods=['GET'])
+def get_pytest_job(job_id):
+    """获取Pytest执行任务状态和进度"""
+    try:
+        return jsonify(pytest_job_service.get_job_status(job_id))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_pytest_job(job_id):
+    """取消Pytest执行任务"""
+    try:
+        return jsonify(pytest_job_service.cancel(job_id, g.get('current_user')))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/jobs/<int:job_id>/events', methods=['GET'])
+def stream_pytest_job_events(job_id):
+    """以 Server-Sent Events 推送任务状态与用例执行事件（Last-Event-ID 或 offset 用于断线续传）"""
+    try:
+        offset = request.headers.get('Last-Event-ID') or request.args.get('offset', 0)
+        include_log = request.args.get('include_log', 'false').lower() in ('1', 'true', 'yes')
+        events = PytestLiveService.stream_job_events(job_id, offset=int(offset), include_log=include_log)
+        return Response(stream_with_context(events), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except ValueError:
+        return jsonify({'error': 'offset 必须为整数'}), 400
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/jobs/<int:job_id>/log', methods=['GET'])
+def get_pytest_job_log(job_id):
+    """按字节偏移分段读取任务的pytest输出日志"""
+    try:
+        return jsonify(PytestLiveService.read_job_log(
+            job_id,
+            file_name=request.args.get('file'),
+            offset=request.args.get('offset', 0, type=int),
+            limit=request.args.get('limit', type=int)
+        ))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/code-cache/cleanup', methods=['POST'])
+def cleanup_pytest_code_cache():
+    """立即清理不再使用的生成测试文件"""
+    try:
+        removed = pytest_code_cache.cleanup(PytestExecutorService._get_testcase_dir())
+        return jsonify({'removed': removed})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/rerun-policies', methods=['GET'])
+def get_rerun_policies():
+    """获取失败重跑策略列表"""
+    try:
+        return jsonify(PytestRerunService.get_policies(
+            module_name=request.args.get('module_name'),
+            test_case_id=request.args.get('test_case_id', type=int)
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/rerun-policies', methods=['POST'])
+def create_rerun_policy():
+    """创建失败重跑策略（按用例或模块）"""
+    try:
+        policy = PytestRerunService.create_policy(request.get_json() or {}, g.get('current_user'))
+        return jsonify(policy), 201
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/rerun-policies/<int:policy_id>', methods=['PUT'])
+def update_rerun_policy(policy_id):
+    """更新失败重跑策略"""
+    try:
+        return jsonify(PytestRerunService.update_policy(policy_id, request.get_json() or {}, g.get('current_user')))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@pytest_executor_bp.route('/pytest-executor/rerun-policies/<int:policy_id>', methods=['DELETE'])
+def delete_rerun_policy(policy_id):
+    """删除失败重跑策略"""
+    try:
+        return jsonify(PytestRerunService.delete_policy(policy_id))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -10,6 +10,7 @@
 from flask import Blueprint, request, jsonify, send_from_directory, g
 import os
 
+from ...services.test.test_flakiness_service import TestFlakinessService
 from ...services.test.test_report_service import TestReportService
 from ...core.exceptions import APIException
 from ...models.test.test_report_model import TestReport
@@ -48,6 +49,19 @@ def get_test_reports():
         return jsonify({'error': str(e)}), 500
 
 
+@test_report_bp.route('/test-reports/flaky-cases', methods=['GET'])
+def get_flaky_cases():
+    """按不稳定度从高到低获取测试用例（根据历史执行结果计算）"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        min_score = request.args.get('min_score', 0.0, type=float)
+        return jsonify(TestFlakinessService.list_flaky_cases(limit=limit, min_score=min_score))
+    except APIException as e:
+        return jsonify({'error': e.message, 'payload': e.payload}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @test_report_bp.route('/test-reports/<int:report_id>', methods=['GET'])
 def get_test_report_by_id(report_id):
     """根据ID获取测试报告详情"""
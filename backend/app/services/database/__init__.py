@@ -7,10 +7,14 @@
 @description  数据库服务模块
 """
 
+from .connection_registry import engine_registry, redis_pool_registry
 from .database_conn_service import DatabaseConnService
+from .database_export_service import DatabaseExportService
 from .database_info_service import DatabaseInfoService
+from .schema_metadata_cache import schema_cache
 from .sql_service import SQLService
 
-__all__ = ['DatabaseConnService', 'DatabaseInfoService', 'SQLService']
+__all__ = ['engine_registry', 'DatabaseConnService', 'DatabaseExportService', 'DatabaseInfoService', 'redis_pool_registry',
+           'schema_cache', 'SQLService']
 
 
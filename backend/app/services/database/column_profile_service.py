@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  列值画像服务层（近似基数、空值比例、Top-N 值，按列缓存）
+"""
+
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import text
+
+from ...core.exceptions import APIException
+from .connection_registry import engine_registry
+from .schema_metadata_cache import schema_cache
+
+
+class ColumnProfileService:
+    """
+    列值画像服务类
+    - 小表（估算行数不超过 exact_threshold）直接精确统计
+    - 大表优先使用索引：列是某个索引的第一列时，基数取 information_schema.STATISTICS.CARDINALITY，
+      唯一值通过索引松散扫描（DISTINCT ... ORDER BY）获取
+    - 无可用索引时按主键范围随机取若干连续块作为样本（类似 TABLESAMPLE SYSTEM），
+      由样本估算空值比例、Top-N 值，并用 GEE 估计量估算基数
+    - 结果按 (连接, 库, 表, 列) 缓存 ttl 秒
+    """
+
+    DEFAULT_TOP_N = 20
+    MAX_TOP_N = 200
+    DEFAULT_SAMPLE_SIZE = 10000
+    # 样本拆分的随机块数量
+    SAMPLE_BLOCKS = 20
+    STRING_TYPES = ['VARCHAR', 'CHAR', 'TEXT', 'TINYTEXT', 'MEDIUMTEXT', 'LONGTEXT', 'STRING']
+
+    def __init__(self, ttl=300, max_entries=2000, sample_size=DEFAULT_SAMPLE_SIZE, exact_threshold=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sample_size = sample_size
+        self.exact_threshold = exact_threshold
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DB_COLUMN_PROFILE_TTL', self.ttl)
+        self.sample_size = app.config.get('DB_COLUMN_PROFILE_SAMPLE_SIZE', self.sample_size)
+        self.exact_threshold = app.config.get('DB_COLUMN_PROFILE_EXACT_THRESHOLD', self.exact_threshold)
+
+    def profile_column(self, connection_id, database_name, table_name, column_name, top_n=None, refresh=False):
+        """
+        获取列值画像
+        :param top_n: 返回出现次数最多的前 N 个值
+        :param refresh: 是否忽略缓存重新统计
+        :return: 行数、空值比例、近似基数、Top-N 值及统计方式
+        """
+        top_n = max(1, min(int(top_n or self.DEFAULT_TOP_N), self.MAX_TOP_N))
+        cache_key = (connection_id, database_name, table_name, column_name, 'profile', top_n)
+        if not refresh:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+        engine = engine_registry.acquire(connection_id)
+        inspector = schema_cache.inspector(connection_id, engine)
+        self._get_column_info(inspector, database_name, table_name, column_name)
+        table_sql = f"`{database_name}`.`{table_name}`"
+        column_sql = f"`{column_name}`"
+
+        with engine.connect() as conn:
+            estimated_rows = self._estimate_rows(conn, database_name, table_name)
+            if estimated_rows is not None and estimated_rows <= self.exact_threshold:
+                profile = self._exact_profile(conn, table_sql, column_sql, top_n)
+            else:
+                profile = self._sampled_profile(conn, inspector, database_name, table_name, column_name,
+                                                estimated_rows, top_n)
+
+        profile.update({
+            'column': column_name,
+            'profiled_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'cache_ttl': self.ttl
+        })
+        self._cache_set(cache_key, profile)
+        return profile
+
+    def get_unique_values(self, connection_id, database_name, table_name, column_name, limit=1000):
+        """
+        获取列的唯一值（用于筛选下拉框）
+        列有索引或表较小时使用 SELECT DISTINCT（可走索引松散扫描）；
+        否则从样本中取唯一值，返回 approximate=True
+        """
+        cache_key = (connection_id, database_name, table_name, column_name, 'unique', limit)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        engine = engine_registry.acquire(connection_id)
+        inspector = schema_cache.inspector(connection_id, engine)
+        column_info = self._get_column_info(inspector, database_name, table_name, column_name, required=False)
+        is_string_type = bool(column_info) and any(
+            str_type in str(column_info['type']).upper() for str_type in self.STRING_TYPES
+        )
+
+        with engine.connect() as conn:
+            estimated_rows = self._estimate_rows(conn, database_name, table_name)
+            indexed = self._find_leading_index(inspector, database_name, table_name, column_name) is not None
+            if indexed or estimated_rows is None or estimated_rows <= self.exact_threshold:
+                # 构建WHERE条件
+                # 对于字符串类型（VARCHAR, CHAR, TEXT等），需要检查空字符串
+                # 对于数值、日期时间等类型，只需要检查 IS NOT NULL
+                where_conditions = [f"`{column_name}` IS NOT NULL"]
+                if is_string_type:
+                    where_conditions.append(f"`{column_name}` != ''")
+                where_clause = " AND ".join(where_conditions)
+
+                # 查询该列的所有唯一值，限制数量以避免数据过大
+                query = text(f"SELECT DISTINCT `{column_name}` FROM `{database_name}`.`{table_name}` "
+                             f"WHERE {where_clause} ORDER BY `{column_name}` LIMIT {limit}")
+                raw_values = [row[0] for row in conn.execute(query)]
+                approximate = False
+            else:
+                sample = self._sample_values(conn, inspector, database_name, table_name, column_name)
+                raw_values = sorted({value for value in sample if value is not None}, key=self._sort_key)[:limit]
+                approximate = True
+
+        # 获取所有唯一值，过滤掉空值
+        values = []
+        for val in raw_values:
+            if val is not None:
+                # 对于字符串类型，再次过滤空字符串
+                val_str = str(val).strip()
+                if val_str:
+                    values.append(val_str)
+
+        result = {
+            'data': values,
+            'total': len(values),
+            'has_more': approximate or len(values) >= limit,
+            'approximate': approximate
+        }
+        self._cache_set(cache_key, result)
+        return result
+
+    def invalidate(self, connection_id, database_name=None, table_name=None):
+        with self._lock:
+            keys = [key for key in self._cache
+                    if key[0] == connection_id
+                    and (database_name is None or key[1] == database_name)
+                    and (table_name is None or key[2] == table_name)]
+            for key in keys:
+                del self._cache[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0
+            }
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.time() - entry[1] < self.ttl:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def _cache_set(self, key, value):
+        with self._lock:
+            self._cache[key] = (value, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _get_column_info(inspector, database_name, table_name, column_name, required=True):
+        for col in inspector.get_columns(table_name, schema=database_name):
+            if col['name'] == column_name:
+                return col
+        if required:
+            raise APIException(f'列 {column_name} 不存在', 404)
+        return None
+
+    @staticmethod
+    def _estimate_rows(conn, database_name, table_name):
+        try:
+            value = conn.execute(text("""
+                SELECT TABLE_ROWS FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name
+            """), {'schema': database_name, 'table_name': table_name}).scalar()
+            return int(value) if value is not None else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def _find_leading_index(inspector, database_name, table_name, column_name):
+        """查找以该列为第一列的索引名（主键返回 PRIMARY）"""
+        pk_columns = (inspector.get_pk_constraint(table_name, schema=database_name) or {}).get('constrained_columns') or []
+        if pk_columns and pk_columns[0] == column_name:
+            return 'PRIMARY'
+        for index in inspector.get_indexes(table_name, schema=database_name):
+            columns = index.get('column_names') or []
+            if columns and columns[0] == column_name:
+                return index['name']
+        return None
+
+    @staticmethod
+    def _sort_key(value):
+        return (type(value).__name__, value)
+
+    def _exact_profile(self, conn, table_sql, column_sql, top_n):
+        row = conn.execute(text(
+            f"SELECT COUNT(*), COALESCE(SUM({column_sql} IS NULL), 0), COUNT(DISTINCT {column_sql}) FROM {table_sql}"
+        )).fetchone()
+        total, nulls, distinct = int(row[0]), int(row[1]), int(row[2])
+        result = conn.execute(text(
+            f"SELECT {column_sql}, COUNT(*) AS cnt FROM {table_sql} WHERE {column_sql} IS NOT NULL "
+            f"GROUP BY {column_sql} ORDER BY cnt DESC LIMIT {top_n}"
+        ))
+        top_values = [{'value': self._format_value(value), 'count': int(count),
+                       'ratio': round(count / total, 6) if total else 0} for value, count in result]
+        return {
+            'method': 'exact',
+            'row_count': total,
+            'row_count_estimated': False,
+            'sample_size': total,
+            'null_count': nulls,
+            'null_ratio': round(nulls / total, 6) if total else 0,
+            'cardinality': distinct,
+            'cardinality_estimated': False,
+            'top_values': top_values
+        }
+
+    def _sampled_profile(self, conn, inspector, database_name, table_name, column_name, estimated_rows, top_n):
+        sample = self._sample_values(conn, inspector, database_name, table_name, column_name)
+        sample_size = len(sample)
+        total = estimated_rows if estimated_rows is not None else sample_size
+        counter = Counter(value for value in sample if value is not None)
+        nulls = sample_size - sum(counter.values())
+
+        # 列有索引时使用索引统计的基数，否则用 GEE 估计量：sqrt(N/n) * f1 + sum(f_j, j >= 2)
+        method = 'sample'
+        cardinality = None
+        index_name = self._find_leading_index(inspector, database_name, table_name, column_name)
+        if index_name:
+            cardinality = self._index_cardinality(conn, database_name, table_name, index_name)
+            if cardinality is not None:
+                method = 'index+sample'
+        if cardinality is None and sample_size:
+            singletons = sum(1 for count in counter.values() if count == 1)
+            repeated = len(counter) - singletons
+            scale = math.sqrt(total / sample_size) if total > sample_size else 1
+            cardinality = int(round(scale * singletons + repeated))
+
+        top_values = []
+        for value, count in counter.most_common(top_n):
+            ratio = count / sample_size if sample_size else 0
+            top_values.append({'value': self._format_value(value), 'count': int(round(ratio * total)),
+                               'ratio': round(ratio, 6)})
+        return {
+            'method': method,
+            'row_count': total,
+            'row_count_estimated': True,
+            'sample_size': sample_size,
+            'null_count': int(round(nulls / sample_size * total)) if sample_size else 0,
+            'null_ratio': round(nulls / sample_size, 6) if sample_size else 0,
+            'cardinality': cardinality,
+            'cardinality_estimated': True,
+            'top_values': top_values
+        }
+
+    @staticmethod
+    def _index_cardinality(conn, database_name, table_name, index_name):
+        try:
+            value = conn.execute(text("""
+                SELECT CARDINALITY FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name AND INDEX_NAME = :index_name
+                  AND SEQ_IN_INDEX = 1
+            """), {'schema': database_name, 'table_name': table_name, 'index_name': index_name}).scalar()
+            return int(value) if value is not None else None
+        except Exception:
+            return None
+
+    def _sample_values(self, conn, inspector, database_name, table_name, column_name):
+        """
+        按主键范围取样：在 [MIN(pk), MAX(pk)] 中随机选取 SAMPLE_BLOCKS 个起点，每个起点读取连续的一块，
+        所有块通过 UNION ALL 一次查询返回；主键不是单列整数时退化为读取前 sample_size 行
+        """
+        table_sql = f"`{database_name}`.`{table_name}`"
+        column_sql = f"`{column_name}`"
+        pk_columns = (inspector.get_pk_constraint(table_name, schema=database_name) or {}).get('constrained_columns') or []
+
+        if len(pk_columns) == 1:
+            pk_sql = f"`{pk_columns[0]}`"
+            low, high = conn.execute(text(f"SELECT MIN({pk_sql}), MAX({pk_sql}) FROM {table_sql}")).fetchone()
+            if isinstance(low, int) and isinstance(high, int) and high > low:
+                block_size = max(1, math.ceil(self.sample_size / self.SAMPLE_BLOCKS))
+                starts = sorted(random.randint(low, high) for _ in range(self.SAMPLE_BLOCKS))
+                parts = [f"SELECT * FROM (SELECT {column_sql} FROM {table_sql} WHERE {pk_sql} >= :s{i} "
+                         f"ORDER BY {pk_sql} LIMIT {block_size}) AS b{i}" for i in range(len(starts))]
+                params = {f's{i}': start for i, start in enumerate(starts)}
+                return [row[0] for row in conn.execute(text(' UNION ALL '.join(parts)), params)]
+
+        return [row[0] for row in conn.execute(text(f"SELECT {column_sql} FROM {table_sql} LIMIT {self.sample_size}"))]
+
+    @staticmethod
+    def _format_value(value):
+        if value is None or isinstance(value, (int, float, str, bool)):
+            return value
+        return str(value)
+
+
+# 全局服务实例
+column_profile_service = ColumnProfileService()
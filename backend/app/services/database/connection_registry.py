@@ -0,0 +1,547 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  外部连接注册表：进程级共享的连接池资源（LRU 淘汰 + 空闲回收 + 配置失效）
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from ...core.exceptions import APIException
+from ...models.database.database_conn_model import DatabaseConnection
+
+
+class ConnectionRegistry:
+    """
+    连接资源注册表基类
+
+    - 以 (连接ID, 变体, 凭据指纹) 为键缓存连接资源，同一进程内的所有请求共享
+    - 超过最大数量时按 LRU 淘汰，空闲超时的资源由后台线程回收
+    - 连接配置被修改或删除时调用 invalidate() 立即失效；
+      其他进程通过凭据指纹在 config_ttl 秒内感知变化
+    """
+
+    # 子类覆盖：注册表名称（用于统计展示）
+    name = 'connection'
+
+    def __init__(self, max_size=32, idle_timeout=600, config_ttl=30):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.config_ttl = config_ttl
+        # 计算配置指纹的密钥，init_app 时使用 SECRET_KEY
+        self._fingerprint_key = os.urandom(32)
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # {(connection_id, variant, fingerprint): entry}
+        self._configs = {}  # {connection_id: (config, fingerprint, loaded_at)}
+        self._sweeper = None
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'idle_disposals': 0,
+            'invalidations': 0
+        }
+
+    def init_app(self, app, prefix):
+        """从 Flask 配置读取参数并启动空闲回收线程"""
+        self.max_size = app.config.get(f'{prefix}_MAX_SIZE', self.max_size)
+        self.idle_timeout = app.config.get(f'{prefix}_IDLE_TIMEOUT', self.idle_timeout)
+        self.config_ttl = app.config.get('DB_CONNECTION_CONFIG_TTL', self.config_ttl)
+        secret_key = app.config.get('SECRET_KEY')
+        if secret_key:
+            self._fingerprint_key = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+        self._start_sweeper()
+
+    # ------------------------------------------------------------------
+    # 子类扩展点
+    # ------------------------------------------------------------------
+
+    def _validate_config(self, config):
+        """校验连接配置是否适用于当前注册表，不适用时抛出 APIException"""
+
+    def _create_resource(self, config, variant):
+        """根据连接配置创建连接资源"""
+        raise NotImplementedError
+
+    def _dispose_resource(self, resource):
+        """释放连接资源"""
+        raise NotImplementedError
+
+    def _is_busy(self, resource):
+        """资源是否仍有连接被借出（忙碌的资源不做空闲回收）"""
+        return False
+
+    def _resource_stats(self, resource):
+        """资源的运行时统计"""
+        return {}
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    def acquire(self, connection_id, variant='default'):
+        """获取连接资源，不存在或凭据变化时创建新资源"""
+        config, fingerprint = self._load_config(connection_id)
+        key = (connection_id, variant, fingerprint)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._counters['hits'] += 1
+                entry['last_used'] = now
+                entry['uses'] += 1
+                self._entries.move_to_end(key)
+                return entry['resource']
+
+            self._counters['misses'] += 1
+            # 同一连接同一变体的旧指纹资源已过期，直接释放
+            stale_keys = [k for k in self._entries if k[0] == connection_id and k[1] == variant]
+            for stale_key in stale_keys:
+                self._dispose_entry(stale_key)
+
+            resource = self._create_resource(config, variant)
+            self._entries[key] = {
+                'resource': resource,
+                'created_at': now,
+                'last_used': now,
+                'uses': 1
+            }
+
+            # 超过容量按 LRU 淘汰
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._dispose_entry(oldest_key)
+                self._counters['evictions'] += 1
+
+            return resource
+
+    def invalidate(self, connection_id):
+        """使指定连接的所有资源失效（连接配置修改、删除或手动关闭时调用）"""
+        with self._lock:
+            self._configs.pop(connection_id, None)
+            keys = [k for k in self._entries if k[0] == connection_id]
+            for key in keys:
+                self._dispose_entry(key)
+            if keys:
+                self._counters['invalidations'] += 1
+            return len(keys)
+
+    def sweep(self):
+        """回收空闲超时的资源，返回回收数量"""
+        now = time.monotonic()
+        disposed = 0
+        with self._lock:
+            for key in list(self._entries.keys()):
+                entry = self._entries[key]
+                if now - entry['last_used'] < self.idle_timeout:
+                    continue
+                if self._is_busy(entry['resource']):
+                    continue
+                self._dispose_entry(key)
+                self._counters['idle_disposals'] += 1
+                disposed += 1
+        return disposed
+
+    def peek(self, connection_id):
+        """返回指定连接当前缓存的所有资源（不计入命中统计、不刷新空闲时间）"""
+        with self._lock:
+            return [entry['resource'] for key, entry in self._entries.items() if key[0] == connection_id]
+
+    def clear(self):
+        """释放所有资源"""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._dispose_entry(key)
+            self._configs.clear()
+
+    def stats(self):
+        """注册表统计信息：存活连接池、借出连接数和命中率"""
+        now = time.monotonic()
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            pools = []
+            for (connection_id, variant, _), entry in self._entries.items():
+                # 配置指纹由包含密码的配置计算，只在内部区分连接池，不对外返回
+                pool_info = {
+                    'connection_id': connection_id,
+                    'variant': variant,
+                    'uses': entry['uses'],
+                    'age_seconds': round(now - entry['created_at'], 1),
+                    'idle_seconds': round(now - entry['last_used'], 1)
+                }
+                pool_info.update(self._resource_stats(entry['resource']))
+                pools.append(pool_info)
+
+            return {
+                'registry': self.name,
+                'live_pools': len(self._entries),
+                'max_size': self.max_size,
+                'idle_timeout': self.idle_timeout,
+                'checked_out': sum(p.get('checked_out', 0) for p in pools),
+                'hit_rate': round(self._counters['hits'] / lookups, 4) if lookups else 0.0,
+                **self._counters,
+                'pools': pools
+            }
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self, config):
+        """计算连接配置指纹（凭据或地址变化时指纹随之变化），使用 HMAC 避免根据指纹离线猜测密码"""
+        raw = '\x1f'.join(str(config.get(f) or '') for f in sorted(config.keys()))
+        return hmac.new(self._fingerprint_key, raw.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _load_config(self, connection_id):
+        """读取连接配置，config_ttl 秒内复用缓存以避免每次请求都查询平台库"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._configs.get(connection_id)
+            if cached and now - cached[2] < self.config_ttl:
+                return cached[0], cached[1]
+
+        db_conn = DatabaseConnection.query.filter_by(id=connection_id, is_active=True).first()
+        if not db_conn:
+            self.invalidate(connection_id)
+            raise APIException('数据库连接不存在或已被禁用', 404)
+
+        # 只保存普通字段，避免 ORM 对象跨线程/跨会话使用
+        config = {
+            'connection_id': connection_id,
+            'host': db_conn.host,
+            'port': db_conn.port,
+            'database': db_conn.database,
+            'username': db_conn.username,
+            'password': db_conn.password,
+            'driver': db_conn.driver,
+            'charset': db_conn.charset
+        }
+        self._validate_config(config)
+        fingerprint = self._fingerprint(config)
+
+        with self._lock:
+            self._configs[connection_id] = (config, fingerprint, now)
+        return config, fingerprint
+
+    def _dispose_entry(self, key):
+        """从注册表移除并释放资源（调用方需持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        try:
+            self._dispose_resource(entry['resource'])
+        except Exception as e:
+            print(f'释放{self.name}连接资源失败 (key={key}): {str(e)}')
+
+    def _start_sweeper(self):
+        """启动后台空闲回收线程（每个进程只启动一次）"""
+        if self._sweeper is not None or not self.idle_timeout or self.idle_timeout <= 0:
+            return
+
+        interval = max(5, self.idle_timeout // 2)
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f'{self.name}连接空闲回收失败: {str(e)}')
+
+        self._sweeper = threading.Thread(target=_run, name=f'{self.name}-registry-sweeper', daemon=True)
+        self._sweeper.start()
+
+
+class ConnectionHealthTracker:
+    """
+    连接健康状态跟踪
+
+    - 连续失败达到 failure_threshold 次后将连接标记为不健康，
+      cooldown 秒内直接抛出缓存的错误，不再向远端发起连接
+    - 后台线程按 probe_interval 探测不健康连接，恢复后立即解除熔断；
+      冷却期结束后也会放行请求重新尝试（再次失败会重新进入冷却）
+    """
+
+    def __init__(self, registry, failure_threshold=3, cooldown=30):
+        self.registry = registry
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._states = {}  # {connection_id: {'failures', 'last_error', 'unhealthy_since', 'retry_at'}}
+        self._prober = None
+
+    def init_app(self, app):
+        self.failure_threshold = app.config.get('DB_HEALTH_FAILURE_THRESHOLD', self.failure_threshold)
+        self.cooldown = app.config.get('DB_HEALTH_COOLDOWN', self.cooldown)
+        self._start_prober()
+
+    def check(self, connection_id):
+        """连接处于熔断冷却期时抛出缓存的错误"""
+        with self._lock:
+            state = self._states.get(connection_id)
+            if not state or state['unhealthy_since'] is None:
+                return
+            remaining = state['retry_at'] - time.monotonic()
+            if remaining <= 0:
+                return
+            raise APIException(
+                f"数据库连接不可用（连续失败 {state['failures']} 次）: {state['last_error']}",
+                503,
+                {'retry_after': round(remaining, 1), 'connection_id': connection_id}
+            )
+
+    def record_success(self, connection_id):
+        """记录一次成功的连接借出，清除失败状态"""
+        if connection_id not in self._states:
+            return
+        with self._lock:
+            self._states.pop(connection_id, None)
+
+    def record_failure(self, connection_id, error):
+        """记录一次连接失败，达到阈值后进入熔断冷却期"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.setdefault(connection_id, {
+                'failures': 0,
+                'last_error': None,
+                'unhealthy_since': None,
+                'retry_at': 0
+            })
+            state['failures'] += 1
+            state['last_error'] = str(error)
+            if state['failures'] >= self.failure_threshold:
+                if state['unhealthy_since'] is None:
+                    state['unhealthy_since'] = now
+                state['retry_at'] = now + self.cooldown
+
+    def reset(self, connection_id):
+        """清除连接的健康状态（连接配置变化时调用）"""
+        with self._lock:
+            self._states.pop(connection_id, None)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                str(connection_id): {
+                    'failures': state['failures'],
+                    'healthy': state['unhealthy_since'] is None,
+                    'last_error': state['last_error'],
+                    'unhealthy_seconds': round(now - state['unhealthy_since'], 1) if state['unhealthy_since'] else 0,
+                    'retry_after': round(max(0, state['retry_at'] - now), 1) if state['unhealthy_since'] else 0
+                }
+                for connection_id, state in self._states.items()
+            }
+
+    def attach(self, engine, connection_id):
+        """在引擎上注册连接事件，由连接池借出/连接错误驱动健康状态"""
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.record_success(connection_id)
+
+        @event.listens_for(engine, 'handle_error')
+        def _on_error(context):
+            # 只统计连接层面的错误（建立连接失败或连接断开），SQL 语法错误等不计入
+            if context.is_disconnect or context.connection is None:
+                self.record_failure(connection_id, context.original_exception)
+
+    def probe(self):
+        """探测所有不健康的连接，返回恢复的连接ID列表"""
+        with self._lock:
+            unhealthy = [cid for cid, state in self._states.items() if state['unhealthy_since'] is not None]
+
+        recovered = []
+        for connection_id in unhealthy:
+            for engine in self.registry.peek(connection_id):
+                try:
+                    # 借出连接时 pool_pre_ping 完成存活检测，成功后 checkout 事件会清除失败状态
+                    with engine.connect():
+                        pass
+                    recovered.append(connection_id)
+                    break
+                except Exception:
+                    continue
+        return recovered
+
+    def _start_prober(self):
+        """启动后台探测线程（每个进程只启动一次）"""
+        if self._prober is not None:
+            return
+
+        interval = max(5, self.cooldown // 2)
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.probe()
+                except Exception as e:
+                    print(f'连接健康探测失败: {str(e)}')
+
+        self._prober = threading.Thread(target=_run, name='engine-health-prober', daemon=True)
+        self._prober.start()
+
+
+class EngineRegistry(ConnectionRegistry):
+    """SQLAlchemy 引擎注册表（MySQL 等关系型数据库）"""
+
+    name = 'engine'
+
+    # 变体：default 连接到配置的数据库，no_db 连接到 mysql 系统库（用于查询数据库列表）
+    VARIANT_DEFAULT = 'default'
+    VARIANT_NO_DB = 'no_db'
+
+    def __init__(self, max_size=32, idle_timeout=600, config_ttl=30, pool_size=5, max_overflow=10, pool_recycle=3600):
+        super().__init__(max_size=max_size, idle_timeout=idle_timeout, config_ttl=config_ttl)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.health = ConnectionHealthTracker(self)
+
+    def init_app(self, app, prefix='DB_ENGINE_REGISTRY'):
+        self.pool_size = app.config.get('DB_ENGINE_POOL_SIZE', self.pool_size)
+        self.max_overflow = app.config.get('DB_ENGINE_MAX_OVERFLOW', self.max_overflow)
+        self.pool_recycle = app.config.get('DB_ENGINE_POOL_RECYCLE', self.pool_recycle)
+        super().init_app(app, prefix)
+        self.health.init_app(app)
+
+    def acquire(self, connection_id, variant='default'):
+        """获取引擎；连接处于熔断冷却期时直接抛出缓存的错误"""
+        self.health.check(connection_id)
+        return super().acquire(connection_id, variant)
+
+    def invalidate(self, connection_id):
+        self.health.reset(connection_id)
+        return super().invalidate(connection_id)
+
+    def stats(self):
+        result = super().stats()
+        result['health'] = self.health.stats()
+        return result
+
+    def _validate_config(self, config):
+        if (config.get('driver') or 'mysql').lower() == 'redis':
+            raise APIException('该连接是 Redis 类型，请使用 Redis 管理功能', 400)
+
+    def _create_resource(self, config, variant):
+        database = 'mysql' if variant == self.VARIANT_NO_DB else config['database']
+        # 使用 pymysql 作为 MySQL 驱动
+        connection_string = (f"mysql+pymysql://{config['username']}:{config['password']}"
+                             f"@{config['host']}:{config['port']}/{database}?charset={config['charset']}")
+        try:
+            engine = create_engine(
+                connection_string,
+                poolclass=QueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=True,  # 借出连接时检测连接是否有效，无需额外的 SELECT 1 探测
+                echo=False
+            )
+        except Exception as e:
+            raise APIException(f'数据库连接失败: {str(e)}', 500)
+        self.health.attach(engine, config['connection_id'])
+        return engine
+
+    def _dispose_resource(self, resource):
+        resource.dispose()
+
+    def _is_busy(self, resource):
+        try:
+            return resource.pool.checkedout() > 0
+        except Exception:
+            return False
+
+    def _resource_stats(self, resource):
+        pool = resource.pool
+        try:
+            return {
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': pool.overflow()
+            }
+        except Exception:
+            return {}
+
+
+class RedisPoolRegistry(ConnectionRegistry):
+    """
+    Redis 连接池注册表
+    每个连接ID共享一个 redis.ConnectionPool，请求中只创建轻量的 Redis 客户端对象，
+    不再每次查询平台库、重建连接和发送 PING；连接存活由 health_check_interval 在连接空闲后按需检测
+    """
+
+    name = 'redis'
+
+    def __init__(self, max_size=32, idle_timeout=600, config_ttl=30, max_connections=20,
+                 socket_timeout=5, health_check_interval=30):
+        super().__init__(max_size=max_size, idle_timeout=idle_timeout, config_ttl=config_ttl)
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.health_check_interval = health_check_interval
+
+    def init_app(self, app, prefix='REDIS_POOL_REGISTRY'):
+        self.max_connections = app.config.get('REDIS_POOL_MAX_CONNECTIONS', self.max_connections)
+        self.socket_timeout = app.config.get('REDIS_SOCKET_TIMEOUT', self.socket_timeout)
+        self.health_check_interval = app.config.get('REDIS_HEALTH_CHECK_INTERVAL', self.health_check_interval)
+        super().init_app(app, prefix)
+
+    def client(self, connection_id):
+        """获取使用共享连接池的 Redis 客户端"""
+        return redis.Redis(connection_pool=self.acquire(connection_id))
+
+    def _validate_config(self, config):
+        if (config.get('driver') or '').lower() != 'redis':
+            raise APIException('该连接不是 Redis 类型', 400)
+
+    def _create_resource(self, config, variant):
+        try:
+            return redis.ConnectionPool(
+                host=config['host'],
+                port=int(config['port'] or 6379),
+                db=int(config['database'] or 0),
+                password=config['password'] or None,
+                max_connections=self.max_connections,
+                socket_connect_timeout=self.socket_timeout,
+                socket_timeout=self.socket_timeout,
+                health_check_interval=self.health_check_interval,
+                decode_responses=False  # 不自动解码，保持原始字节
+            )
+        except Exception as e:
+            raise APIException(f'Redis 连接失败: {str(e)}', 500)
+
+    def _dispose_resource(self, resource):
+        resource.disconnect()
+
+    def _is_busy(self, resource):
+        return len(getattr(resource, '_in_use_connections', ())) > 0
+
+    def _resource_stats(self, resource):
+        try:
+            return {
+                'max_connections': resource.max_connections,
+                'created_connections': resource._created_connections,
+                'checked_out': len(resource._in_use_connections),
+                'available': len(resource._available_connections)
+            }
+        except Exception:
+            return {}
+
+
+# 进程级单例：所有请求共享同一个引擎注册表
+engine_registry = EngineRegistry()
+redis_pool_registry = RedisPoolRegistry()
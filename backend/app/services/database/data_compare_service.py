@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  数据比对服务层（按主键分块校验和比对两个连接中的同名表）
+"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ...core.exceptions import APIException
+from ...utils.job_util import BackgroundJobRunner, FileJobStore, JobStatus
+from .connection_registry import engine_registry
+from .query_stream_service import QueryStreamService
+from .schema_metadata_cache import schema_cache
+
+
+class DataCompareCancelled(Exception):
+    """比对任务被取消"""
+
+
+class DataCompareService:
+    """
+    数据比对服务类
+    以源表（基准）为参照，按主键把表切分为连续的范围块：
+    1. 在两端分别计算每块的行数和 BIT_XOR(CRC32(CONCAT_WS(...))) 校验和，只传输聚合结果
+    2. 只有校验和不一致的块才拉取 (主键, 行校验和)，逐行定位差异
+    3. 输出目标表相对源表新增（inserted）、修改（updated）、删除（deleted）的主键
+    """
+
+    DEFAULT_CHUNK_SIZE = 10000
+    MAX_CHUNK_SIZE = 200000
+    # 每类差异最多返回的主键数量
+    DEFAULT_MAX_KEYS = 1000
+
+    def __init__(self):
+        self.store = FileJobStore('data_compare', ttl=86400)
+        self.runner = BackgroundJobRunner('data-compare', max_workers=2)
+
+    def init_app(self, app):
+        self.store.ttl = app.config.get('DATA_COMPARE_RESULT_TTL', self.store.ttl)
+        self.runner.init_app(app, app.config.get('DATA_COMPARE_MAX_WORKERS'))
+
+    def submit(self, source_connection_id, source_database, target_connection_id, target_database, table_name,
+               target_table=None, chunk_size=None, max_keys=None, current_user=None):
+        """
+        提交比对任务
+        :param source_connection_id: 源（基准）连接ID
+        :param target_connection_id: 目标连接ID
+        :param table_name: 源表名
+        :param target_table: 目标表名，默认与源表同名
+        :param chunk_size: 每块的行数
+        :param max_keys: 每类差异最多返回的主键数量
+        :return: 任务状态
+        """
+        if not all([source_connection_id, source_database, target_connection_id, target_database, table_name]):
+            raise APIException('源连接、源数据库、目标连接、目标数据库和表名不能为空', 400)
+        target_table = target_table or table_name
+        chunk_size = self._normalize_int(chunk_size, self.DEFAULT_CHUNK_SIZE, self.MAX_CHUNK_SIZE)
+        max_keys = self._normalize_int(max_keys, self.DEFAULT_MAX_KEYS, 100000)
+
+        source_engine = engine_registry.acquire(source_connection_id)
+        target_engine = engine_registry.acquire(target_connection_id)
+        key_columns, columns, column_warnings = self._resolve_columns(
+            source_connection_id, source_engine, source_database, table_name,
+            target_connection_id, target_engine, target_database, target_table
+        )
+
+        self.store.cleanup()
+        job = self.store.create({
+            'source': {'connection_id': source_connection_id, 'database': source_database, 'table': table_name},
+            'target': {'connection_id': target_connection_id, 'database': target_database, 'table': target_table},
+            'key_columns': key_columns,
+            'columns': columns,
+            'warnings': column_warnings,
+            'chunk_size': chunk_size,
+            'max_keys': max_keys,
+            'estimated_rows': self._estimate_rows(source_engine, source_database, table_name),
+            'progress': {'chunks': 0, 'different_chunks': 0, 'source_rows': 0, 'target_rows': 0},
+            'result': None,
+            'created_by': current_user.id if current_user else None
+        })
+        self.runner.submit_job(self.store, job['job_id'], self._run, source_engine, target_engine)
+        return job
+
+    def get_status(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('比对任务不存在或已过期', 404)
+        return job
+
+    def cancel(self, job_id):
+        job = self.get_status(job_id)
+        if job['status'] not in JobStatus.FINAL_STATUSES:
+            self.store.request_cancel(job_id)
+        return self.store.load(job_id)
+
+    def _resolve_columns(self, source_connection_id, source_engine, source_database, table_name,
+                         target_connection_id, target_engine, target_database, target_table):
+        """确定主键和参与比对的列（两端共有的列，按源表字段顺序）"""
+        source_inspector = schema_cache.inspector(source_connection_id, source_engine)
+        target_inspector = schema_cache.inspector(target_connection_id, target_engine)
+        try:
+            source_columns = [col['name'] for col in source_inspector.get_columns(table_name, schema=source_database)]
+            target_columns = [col['name'] for col in target_inspector.get_columns(target_table, schema=target_database)]
+        except Exception as e:
+            raise APIException(f'获取表结构失败: {str(e)}', 400)
+        if not source_columns:
+            raise APIException(f'源表 {source_database}.{table_name} 不存在', 404)
+        if not target_columns:
+            raise APIException(f'目标表 {target_database}.{target_table} 不存在', 404)
+
+        source_pk = (source_inspector.get_pk_constraint(table_name, schema=source_database) or {}).get('constrained_columns') or []
+        target_pk = (target_inspector.get_pk_constraint(target_table, schema=target_database) or {}).get('constrained_columns') or []
+        if not source_pk:
+            raise APIException('源表没有主键，无法按主键分块比对', 400)
+        if source_pk != target_pk:
+            raise APIException(f'两端主键不一致: 源表 {source_pk}，目标表 {target_pk}', 400)
+
+        target_set = set(target_columns)
+        columns = [col for col in source_columns if col in target_set]
+        warnings = []
+        only_source = [col for col in source_columns if col not in target_set]
+        only_target = [col for col in target_columns if col not in set(source_columns)]
+        if only_source:
+            warnings.append(f"仅源表存在的列（不参与比对）: {', '.join(only_source)}")
+        if only_target:
+            warnings.append(f"仅目标表存在的列（不参与比对）: {', '.join(only_target)}")
+        return source_pk, columns, warnings
+
+    @staticmethod
+    def _estimate_rows(engine, database, table_name):
+        try:
+            with engine.connect() as conn:
+                value = conn.execute(text("""
+                    SELECT TABLE_ROWS FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name
+                """), {'schema': database, 'table_name': table_name}).scalar()
+                return int(value) if value is not None else None
+        except Exception:
+            return None
+
+    def _run(self, job_id, source_engine, target_engine):
+        """在后台线程中执行比对"""
+        job = self.store.load(job_id)
+        if self.store.is_cancel_requested(job_id):
+            self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat())
+            return
+
+        self.store.update(job_id, status=JobStatus.RUNNING, started_at=datetime.now().isoformat())
+        try:
+            with source_engine.connect() as source_conn, target_engine.connect() as target_conn:
+                result = self._compare(job, source_conn, target_conn)
+            self.store.update(job_id, status=JobStatus.FINISHED, result=result,
+                              finished_at=datetime.now().isoformat())
+        except DataCompareCancelled:
+            self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat())
+        except Exception as e:
+            self.store.update(job_id, status=JobStatus.FAILED, error=str(e), finished_at=datetime.now().isoformat())
+
+    def _compare(self, job, source_conn, target_conn):
+        key_columns = job['key_columns']
+        columns = job['columns']
+        chunk_size = job['chunk_size']
+        max_keys = job['max_keys']
+        source_table = f"`{job['source']['database']}`.`{job['source']['table']}`"
+        target_table = f"`{job['target']['database']}`.`{job['target']['table']}`"
+
+        diff = {'inserted': [], 'updated': [], 'deleted': []}
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0}
+        progress = {'chunks': 0, 'different_chunks': 0, 'source_rows': 0, 'target_rows': 0}
+
+        lower = None
+        while True:
+            if self.store.is_cancel_requested(job['job_id']):
+                raise DataCompareCancelled()
+
+            # 以源表为准确定块的上界，最后一块不设上界以覆盖目标表中更大的主键
+            upper = self._next_boundary(source_conn, source_table, key_columns, lower, chunk_size)
+            where_sql, params = self._range_condition(key_columns, lower, upper)
+
+            source_count, source_checksum = self._chunk_checksum(source_conn, source_table, columns, where_sql, params)
+            target_count, target_checksum = self._chunk_checksum(target_conn, target_table, columns, where_sql, params)
+            progress['chunks'] += 1
+            progress['source_rows'] += source_count
+            progress['target_rows'] += target_count
+
+            if (source_count, source_checksum) != (target_count, target_checksum):
+                progress['different_chunks'] += 1
+                source_rows = self._chunk_row_checksums(source_conn, source_table, key_columns, columns, where_sql, params)
+                target_rows = self._chunk_row_checksums(target_conn, target_table, key_columns, columns, where_sql, params)
+                for kind, keys in self._diff_rows(source_rows, target_rows).items():
+                    counts[kind] += len(keys)
+                    remaining = max_keys - len(diff[kind])
+                    if remaining > 0:
+                        diff[kind].extend(self._format_key(key) for key in keys[:remaining])
+
+            self.store.update(job['job_id'], progress=progress)
+            if upper is None:
+                break
+            lower = upper
+
+        return {
+            'identical': not any(counts.values()),
+            'counts': counts,
+            'keys': diff,
+            'truncated': any(counts[kind] > len(diff[kind]) for kind in counts),
+            'source_rows': progress['source_rows'],
+            'target_rows': progress['target_rows'],
+            'chunks': progress['chunks'],
+            'different_chunks': progress['different_chunks']
+        }
+
+    @staticmethod
+    def _key_sql(key_columns):
+        return ', '.join(f"`{col}`" for col in key_columns)
+
+    def _next_boundary(self, conn, table_sql, key_columns, lower, chunk_size):
+        """取下一块的上界（包含）：从 lower 之后第 chunk_size 行的主键，不足一块时返回 None"""
+        where_sql, params = self._range_condition(key_columns, lower, None)
+        key_sql = self._key_sql(key_columns)
+        row = conn.execute(text(
+            f"SELECT {key_sql} FROM {table_sql} {where_sql} ORDER BY {key_sql} LIMIT 1 OFFSET {chunk_size - 1}"
+        ), params).fetchone()
+        return tuple(row) if row else None
+
+    @staticmethod
+    def _range_condition(key_columns, lower, upper):
+        """构建主键范围条件 (lower, upper]"""
+        conditions = []
+        params = {}
+        if len(key_columns) == 1:
+            key_sql = f"`{key_columns[0]}`"
+            if lower is not None:
+                conditions.append(f"{key_sql} > :l0")
+                params['l0'] = lower[0]
+            if upper is not None:
+                conditions.append(f"{key_sql} <= :u0")
+                params['u0'] = upper[0]
+        else:
+            key_sql = '(' + ', '.join(f"`{col}`" for col in key_columns) + ')'
+            if lower is not None:
+                conditions.append(f"{key_sql} > ({', '.join(f':l{i}' for i in range(len(key_columns)))})")
+                params.update({f'l{i}': value for i, value in enumerate(lower)})
+            if upper is not None:
+                conditions.append(f"{key_sql} <= ({', '.join(f':u{i}' for i in range(len(key_columns)))})")
+                params.update({f'u{i}': value for i, value in enumerate(upper)})
+        where_sql = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        return where_sql, params
+
+    @staticmethod
+    def _row_checksum_sql(columns):
+        """单行校验和表达式：CONCAT_WS 会跳过 NULL，因此追加 ISNULL 标记区分 NULL 与空字符串"""
+        values = ', '.join(f"`{col}`" for col in columns)
+        null_flags = ', '.join(f"ISNULL(`{col}`)" for col in columns)
+        return f"CRC32(CONCAT_WS('#', {values}, CONCAT({null_flags})))"
+
+    def _chunk_checksum(self, conn, table_sql, columns, where_sql, params):
+        row = conn.execute(text(
+            f"SELECT COUNT(*), COALESCE(BIT_XOR({self._row_checksum_sql(columns)}), 0) FROM {table_sql} {where_sql}"
+        ), params).fetchone()
+        return int(row[0]), int(row[1])
+
+    def _chunk_row_checksums(self, conn, table_sql, key_columns, columns, where_sql, params):
+        """拉取差异块中每行的 (主键, 行校验和)，不传输整行数据"""
+        key_sql = self._key_sql(key_columns)
+        result = conn.execute(text(
+            f"SELECT {key_sql}, {self._row_checksum_sql(columns)} FROM {table_sql} {where_sql} ORDER BY {key_sql}"
+        ), params)
+        size = len(key_columns)
+        return {tuple(row[:size]): int(row[size]) for row in result}
+
+    @staticmethod
+    def _diff_rows(source_rows, target_rows):
+        return {
+            'inserted': [key for key in target_rows if key not in source_rows],
+            'updated': [key for key, checksum in source_rows.items()
+                        if key in target_rows and target_rows[key] != checksum],
+            'deleted': [key for key in source_rows if key not in target_rows]
+        }
+
+    @staticmethod
+    def _format_key(key):
+        values = [value if isinstance(value, (int, float, str)) or value is None
+                  else QueryStreamService.json_default(value) for value in key]
+        return values[0] if len(values) == 1 else values
+
+    @staticmethod
+    def _normalize_int(value, default, maximum):
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise APIException('参数必须为整数', 400)
+        return max(1, min(value, maximum))
+
+
+# 全局服务实例
+data_compare_service = DataCompareService()
@@ -13,6 +13,9 @@ from sqlalchemy.exc import IntegrityError
 from ...core.database import db
 from ...core.exceptions import APIException
 from ...models.database.database_conn_model import DatabaseConnection
+from .column_profile_service import column_profile_service
+from .connection_registry import engine_registry, redis_pool_registry
+from .schema_metadata_cache import schema_cache
 
 
 class DatabaseConnService:
@@ -146,6 +149,12 @@ class DatabaseConnService:
             
             db.session.commit()
             
+            # 连接配置已变化，释放已缓存的连接池和表结构元数据
+            engine_registry.invalidate(connection_id)
+            redis_pool_registry.invalidate(connection_id)
+            schema_cache.invalidate(connection_id)
+            column_profile_service.invalidate(connection_id)
+            
             return connection.to_dict()
         
         except IntegrityError as e:
@@ -167,6 +176,12 @@ class DatabaseConnService:
             
             db.session.commit()
             
+            # 连接已删除，释放已缓存的连接池和表结构元数据
+            engine_registry.invalidate(connection_id)
+            redis_pool_registry.invalidate(connection_id)
+            schema_cache.invalidate(connection_id)
+            column_profile_service.invalidate(connection_id)
+            
             return {'message': '数据库连接删除成功'}
         
         except Exception as e:
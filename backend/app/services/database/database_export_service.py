@@ -0,0 +1,585 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  数据库导出服务层（流式生成 SQL，内存占用与表大小无关）
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from ...core.exceptions import APIException
+from .connection_registry import engine_registry
+from .database_info_service import DatabaseInfoService
+from .schema_metadata_cache import schema_cache
+
+
+class DatabaseExportService:
+    """数据库导出服务类"""
+
+    # 每次从数据库读取的行数（键集分页的页大小 / 服务端游标的 fetchmany 大小）
+    DEFAULT_FETCH_SIZE = 1000
+    # 每条多行 INSERT 语句包含的行数
+    DEFAULT_INSERT_BATCH_SIZE = 100
+    MAX_INSERT_BATCH_SIZE = 5000
+
+    # 导出时使用 NOW() 代替原值的字段
+    NOW_COLUMNS = ('created_at', 'updated_at')
+
+    DEFAULT_SQL_TYPES = ['CREATE', 'INSERT', 'UPDATE', 'DELETE', 'SELECT']
+
+    # 并行导出默认并行度
+    DEFAULT_PARALLELISM = 4
+    # 合并临时文件时每次读取的字符数
+    SPOOL_READ_SIZE = 64 * 1024
+
+    @staticmethod
+    def escape_sql_value(value):
+        """转义SQL值"""
+        if value is None:
+            return 'NULL'
+        elif isinstance(value, bool):
+            return '1' if value else '0'
+        elif isinstance(value, (int, float)):
+            return str(value)
+        elif isinstance(value, bytes):
+            return f"0x{value.hex()}"
+        elif isinstance(value, datetime):
+            # 保留微秒，DATETIME(6)/TIMESTAMP(6) 字段导出后可以原样导入
+            fmt = '%Y-%m-%d %H:%M:%S.%f' if value.microsecond else '%Y-%m-%d %H:%M:%S'
+            return f"'{value.strftime(fmt)}'"
+        else:
+            # 字符串类型，转义单引号和反斜杠
+            value_str = str(value)
+            value_str = value_str.replace('\\', '\\\\')
+            value_str = value_str.replace("'", "\\'")
+            return f"'{value_str}'"
+
+    @staticmethod
+    def gzip_stream(chunks):
+        """将文本块流增量压缩为 gzip 字节流"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def export_databases_sql_stream(self, connection_id, database_tables, sql_types=None,
+                                    insert_batch_size=None, fetch_size=None):
+        """
+        流式导出多个数据库为SQL（包括表结构和数据）
+        :param connection_id: 连接ID
+        :param database_tables: 数据库和表的映射关系，格式: {db_name: [table1, ...]} 或 {db_name: None}（None表示导出所有表）
+        :param sql_types: SQL类型列表，可选 ['CREATE', 'INSERT', 'UPDATE', 'DELETE', 'SELECT']，默认为全部
+        :param insert_batch_size: 每条多行 INSERT 语句包含的行数
+        :param fetch_size: 每次从数据库读取的行数
+        :return: 生成 SQL 文本块的生成器
+        """
+        if not database_tables or len(database_tables) == 0:
+            raise APIException('没有选择任何数据库', 400)
+
+        if sql_types is None:
+            sql_types = list(self.DEFAULT_SQL_TYPES)
+        insert_batch_size = self._normalize_batch_size(insert_batch_size, self.DEFAULT_INSERT_BATCH_SIZE,
+                                                       self.MAX_INSERT_BATCH_SIZE)
+        fetch_size = self._normalize_batch_size(fetch_size, self.DEFAULT_FETCH_SIZE, 10000)
+
+        # 在生成器开始之前获取引擎，连接错误可以在响应开始前以正常的错误响应返回
+        engine = engine_registry.acquire(connection_id)
+        return self._generate_databases_sql(connection_id, engine, database_tables, sql_types,
+                                            insert_batch_size, fetch_size)
+
+    @staticmethod
+    def _normalize_batch_size(value, default, maximum):
+        try:
+            value = int(value) if value is not None else default
+        except (TypeError, ValueError):
+            value = default
+        return max(1, min(value, maximum))
+
+    def _generate_databases_sql(self, connection_id, engine, database_tables, sql_types, insert_batch_size, fetch_size):
+        """生成整个导出文件的 SQL 文本块"""
+        yield self._build_header(database_tables, sql_types)
+
+        inspector = schema_cache.inspector(connection_id, engine)
+        with engine.connect() as conn:
+            for db_name, selected_tables in database_tables.items():
+                tables_to_export, message = self.resolve_tables(inspector, db_name, selected_tables)
+                yield f"\n-- ==================== 数据库: {db_name} ====================\n\n"
+                if message:
+                    yield f"-- {message}\n\n"
+                    continue
+
+                for table_name in tables_to_export:
+                    yield from self.generate_table_sql(conn, inspector, db_name, table_name, sql_types,
+                                                       insert_batch_size, fetch_size)
+
+    def export_databases_sql_parallel(self, connection_id, database_tables, sql_types=None, parallelism=None,
+                                      export_id=None, insert_batch_size=None, fetch_size=None):
+        """
+        并行导出多个数据库为SQL：各表在有界线程池中并发导出到各自的临时文件，
+        再按外键依赖顺序依次输出，输出内容与串行导出一致
+        :param parallelism: 并行度（工作线程数），受 DB_EXPORT_MAX_PARALLELISM 与连接池容量的一半限制
+        :param export_id: 导出任务ID，不传时自动生成，用于查询导出进度
+        :return: (export_id, 生成 SQL 文本块的生成器)
+        """
+        if not database_tables or len(database_tables) == 0:
+            raise APIException('没有选择任何数据库', 400)
+
+        if sql_types is None:
+            sql_types = list(self.DEFAULT_SQL_TYPES)
+        insert_batch_size = self._normalize_batch_size(insert_batch_size, self.DEFAULT_INSERT_BATCH_SIZE,
+                                                       self.MAX_INSERT_BATCH_SIZE)
+        fetch_size = self._normalize_batch_size(fetch_size, self.DEFAULT_FETCH_SIZE, 10000)
+        # 每个工作线程导出时除数据连接外还会取一个连接读取表结构，连接池同时被其他请求共用，
+        # 并行度不超过连接池容量的一半，避免工作线程之间互相等待连接超时
+        max_parallelism = min(current_app.config.get('DB_EXPORT_MAX_PARALLELISM', 8),
+                              max((engine_registry.pool_size + engine_registry.max_overflow) // 2, 1))
+        parallelism = self._normalize_batch_size(parallelism, self.DEFAULT_PARALLELISM, max_parallelism)
+
+        if export_id:
+            if not ExportProgress.is_valid_id(export_id):
+                raise APIException('导出任务ID格式不正确', 400)
+            if ExportProgress.load(self.get_spool_root(), export_id):
+                raise APIException('导出任务ID已存在', 400)
+        else:
+            export_id = uuid.uuid4().hex
+
+        engine = engine_registry.acquire(connection_id)
+
+        # 提前确定导出计划（按外键依赖排序），进度中可以看到全部待导出的表
+        inspector = schema_cache.inspector(connection_id, engine)
+        plan = []
+        for db_name, selected_tables in database_tables.items():
+            tables_to_export, message = self.resolve_tables(inspector, db_name, selected_tables)
+            plan.append((db_name, tables_to_export, message))
+
+        spool_root = self.get_spool_root()
+        ExportProgress.cleanup(spool_root, current_app.config.get('DB_EXPORT_PROGRESS_TTL', 86400))
+        progress = ExportProgress(spool_root, export_id, connection_id, parallelism,
+                                  [(db_name, table) for db_name, tables, _ in plan for table in tables])
+        progress.flush(force=True)
+
+        generator = self._generate_databases_sql_parallel(connection_id, engine, database_tables, plan, sql_types,
+                                                          insert_batch_size, fetch_size, parallelism, progress)
+        return export_id, generator
+
+    @staticmethod
+    def get_spool_root():
+        """并行导出临时文件与进度文件的根目录"""
+        return current_app.config.get('DB_EXPORT_SPOOL_DIR') or os.path.join(tempfile.gettempdir(), 'db_export')
+
+    def get_export_progress(self, export_id):
+        """
+        获取并行导出进度
+        :param export_id: 导出任务ID
+        :return: 导出状态及每个表已导出的行数、字节数
+        """
+        if not ExportProgress.is_valid_id(export_id):
+            raise APIException('导出任务ID格式不正确', 400)
+        data = ExportProgress.load(self.get_spool_root(), export_id)
+        if data is None:
+            raise APIException('导出任务不存在或已过期', 404)
+        return data
+
+    def _generate_databases_sql_parallel(self, connection_id, engine, database_tables, plan, sql_types, insert_batch_size,
+                                         fetch_size, parallelism, progress):
+        """并行导出：提交所有表到线程池，按计划顺序等待并输出各表的临时文件"""
+        yield self._build_header(database_tables, sql_types)
+
+        os.makedirs(progress.spool_dir, exist_ok=True)
+        cancel_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='db-export')
+        futures = []
+        try:
+            index = 0
+            for db_name, tables, _ in plan:
+                for table_name in tables:
+                    spool_path = os.path.join(progress.spool_dir, f'{index:05d}.sql')
+                    futures.append(executor.submit(self._spool_table, connection_id, engine, index, db_name, table_name,
+                                                   spool_path, sql_types, insert_batch_size, fetch_size,
+                                                   progress, cancel_event))
+                    index += 1
+
+            index = 0
+            for db_name, tables, message in plan:
+                yield f"\n-- ==================== 数据库: {db_name} ====================\n\n"
+                if message:
+                    yield f"-- {message}\n\n"
+                    continue
+
+                for _ in tables:
+                    spool_path = futures[index].result()
+                    with open(spool_path, 'r', encoding='utf-8') as f:
+                        while True:
+                            chunk = f.read(self.SPOOL_READ_SIZE)
+                            if not chunk:
+                                break
+                            yield chunk
+                    os.remove(spool_path)
+                    index += 1
+
+            progress.finish('finished')
+        except GeneratorExit:
+            # 客户端断开连接，停止剩余的导出任务
+            progress.finish('cancelled')
+            raise
+        except Exception as e:
+            progress.finish('failed', str(e))
+            raise
+        finally:
+            cancel_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(progress.spool_dir, ignore_errors=True)
+
+    def _spool_table(self, connection_id, engine, index, db_name, table_name, spool_path, sql_types, insert_batch_size,
+                     fetch_size, progress, cancel_event):
+        """工作线程：使用独立的池化连接导出单个表到临时文件"""
+        if cancel_event.is_set():
+            progress.update_table(index, status='cancelled')
+            return spool_path
+
+        progress.update_table(index, status='running', started_at=datetime.now().isoformat())
+        try:
+            inspector = schema_cache.inspector(connection_id, engine)
+            with engine.connect() as conn, open(spool_path, 'wb') as f:
+                chunks = self.generate_table_sql(conn, inspector, db_name, table_name, sql_types,
+                                                 insert_batch_size, fetch_size,
+                                                 on_batch=lambda count: progress.update_table(index, rows=count))
+                for chunk in chunks:
+                    if cancel_event.is_set():
+                        progress.update_table(index, status='cancelled')
+                        return spool_path
+                    data = chunk.encode('utf-8')
+                    f.write(data)
+                    progress.update_table(index, bytes_written=len(data))
+        except Exception as e:
+            progress.update_table(index, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+            raise APIException(f'导出表 {db_name}.{table_name} 失败: {str(e)}', 500)
+
+        progress.update_table(index, status='finished', finished_at=datetime.now().isoformat())
+        return spool_path
+
+    @staticmethod
+    def _build_header(database_tables, sql_types):
+        """生成导出文件头"""
+        header = [
+            "-- ==================== 数据库导出SQL ====================",
+            f"-- 导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        ]
+        db_info = []
+        for db_name, tables in database_tables.items():
+            if tables and len(tables) > 0:
+                db_info.append(f"{db_name}({len(tables)}个表)")
+            else:
+                db_info.append(f"{db_name}(所有表)")
+        header.append(f"-- 数据库列表: {', '.join(db_info)}")
+        header.append(f"-- 导出类型: {', '.join(sql_types)}")
+        header.append("")
+        return '\n'.join(header) + '\n'
+
+    @staticmethod
+    def resolve_tables(inspector, db_name, selected_tables):
+        """
+        确定要导出的表，并按外键依赖排序
+        :return: (表列表, 提示信息)，提示信息不为空时表示该库没有可导出的表
+        """
+        all_tables = inspector.get_table_names(schema=db_name)
+        if not all_tables:
+            return [], f"数据库 {db_name} 中没有表"
+
+        # 如果selected_tables为None或空列表，导出所有表；否则只导出选中的表
+        if selected_tables and len(selected_tables) > 0:
+            tables_to_export = [t for t in selected_tables if t in all_tables]
+            if not tables_to_export:
+                return [], f"数据库 {db_name} 中没有选中的表"
+        else:
+            tables_to_export = all_tables
+
+        # 根据外键关系对表进行拓扑排序，优先导出被依赖的表
+        return DatabaseInfoService()._sort_tables_by_foreign_keys(inspector, db_name, tables_to_export), None
+
+    def generate_table_sql(self, conn, inspector, db_name, table_name, sql_types, insert_batch_size, fetch_size,
+                           on_batch=None):
+        """
+        生成单个表的 SQL 文本块（表结构 + 数据），每批数据生成一个文本块
+        :param on_batch: 可选回调，每读取一批数据时以该批行数调用
+        """
+        yield f"\n-- ==================== 表: {table_name} ====================\n\n"
+
+        if 'CREATE' in sql_types:
+            create_row = conn.execute(text(f"SHOW CREATE TABLE `{db_name}`.`{table_name}`")).fetchone()
+            if create_row and len(create_row) >= 2:
+                yield (f"-- CREATE TABLE 语句\n"
+                       f"DROP TABLE IF EXISTS `{db_name}`.`{table_name}`;\n"
+                       f"{create_row[1]};\n\n")
+
+        data_types = [t for t in ('INSERT', 'UPDATE', 'DELETE', 'SELECT') if t in sql_types]
+        if not data_types:
+            return
+
+        # 获取表列信息（按照表定义顺序）
+        # 使用 INFORMATION_SCHEMA 确保字段顺序与 MySQL 存储顺序完全一致
+        result = conn.execute(text("""
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name
+            ORDER BY ORDINAL_POSITION
+        """), {'schema': db_name, 'table_name': table_name})
+        all_columns = [row[0] for row in result]
+        if not all_columns:
+            all_columns = [col['name'] for col in inspector.get_columns(table_name, schema=db_name)]
+
+        pk_info = inspector.get_pk_constraint(table_name, schema=db_name) or {}
+        pk_columns = pk_info.get('constrained_columns') or []
+
+        exported_rows = 0
+        first_batch = True
+        for rows in self.iter_table_batches(conn, db_name, table_name, all_columns, pk_columns, fetch_size):
+            exported_rows += len(rows)
+            if on_batch:
+                on_batch(len(rows))
+            yield self._build_batch_sql(db_name, table_name, all_columns, pk_columns, rows, data_types,
+                                        insert_batch_size, first_batch)
+            first_batch = False
+
+        if 'INSERT' in data_types:
+            yield f"-- 表 {table_name} 共导出 {exported_rows} 条数据\n\n"
+
+    @staticmethod
+    def iter_table_batches(conn, db_name, table_name, all_columns, pk_columns, fetch_size):
+        """
+        分批读取表数据
+        - 有主键时使用键集分页（WHERE (pk) > (上一页最后的主键) ORDER BY pk LIMIT n），每页代价与页码无关
+        - 无主键时使用服务端游标（stream_results）逐批读取，结果集不会一次性加载到内存
+        """
+        columns_sql = ', '.join(f"`{col}`" for col in all_columns)
+        table_sql = f"`{db_name}`.`{table_name}`"
+
+        if pk_columns and all(pk in all_columns for pk in pk_columns):
+            pk_indexes = [all_columns.index(pk) for pk in pk_columns]
+            order_sql = ', '.join(f"`{pk}`" for pk in pk_columns)
+            if len(pk_columns) == 1:
+                keyset_sql = f"`{pk_columns[0]}` > :k0"
+            else:
+                keyset_sql = f"({order_sql}) > ({', '.join(f':k{i}' for i in range(len(pk_columns)))})"
+
+            last_key = None
+            while True:
+                if last_key is None:
+                    query = text(f"SELECT {columns_sql} FROM {table_sql} ORDER BY {order_sql} LIMIT {fetch_size}")
+                    rows = conn.execute(query).fetchall()
+                else:
+                    query = text(f"SELECT {columns_sql} FROM {table_sql} WHERE {keyset_sql} "
+                                 f"ORDER BY {order_sql} LIMIT {fetch_size}")
+                    rows = conn.execute(query, {f'k{i}': v for i, v in enumerate(last_key)}).fetchall()
+                if not rows:
+                    break
+                yield rows
+                if len(rows) < fetch_size:
+                    break
+                last_key = [rows[-1][i] for i in pk_indexes]
+        else:
+            result = conn.execute(text(f"SELECT {columns_sql} FROM {table_sql}"),
+                                  execution_options={'stream_results': True})
+            try:
+                while True:
+                    rows = result.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                result.close()
+
+    def _build_batch_sql(self, db_name, table_name, all_columns, pk_columns, rows, data_types,
+                         insert_batch_size, first_batch):
+        """将一批数据行转换为 SQL 文本"""
+        escape = self.escape_sql_value
+        table_sql = f"`{db_name}`.`{table_name}`"
+        lines = []
+
+        # 生成多行INSERT语句（按照表结构中的字段顺序）
+        if 'INSERT' in data_types:
+            if first_batch:
+                lines.append(f"-- INSERT 语句（表: {table_name}）")
+            columns_str = ', '.join(f"`{col}`" for col in all_columns)
+            now_indexes = {i for i, col in enumerate(all_columns) if col in self.NOW_COLUMNS}
+            for start in range(0, len(rows), insert_batch_size):
+                values_list = []
+                for row in rows[start:start + insert_batch_size]:
+                    values = ['NOW()' if i in now_indexes else escape(val) for i, val in enumerate(row)]
+                    values_list.append(f"({', '.join(values)})")
+                lines.append(f"INSERT INTO {table_sql} ({columns_str}) VALUES\n" + ',\n'.join(values_list) + ';')
+
+        # 生成UPDATE语句
+        if 'UPDATE' in data_types:
+            if first_batch:
+                lines.append("")
+                lines.append(f"-- UPDATE 语句（表: {table_name}）")
+            for row in rows:
+                set_clauses = []
+                where_clauses = []
+                for col, val in zip(all_columns, row):
+                    if col in pk_columns:
+                        where_clauses.append(f"`{col}` = {escape(val)}")
+                    elif col in self.NOW_COLUMNS:
+                        set_clauses.append(f"`{col}` = NOW()")
+                    else:
+                        set_clauses.append(f"`{col}` = {escape(val)}")
+                if set_clauses and where_clauses:
+                    lines.append(f"UPDATE {table_sql} SET {', '.join(set_clauses)} WHERE {' AND '.join(where_clauses)};")
+
+        # 生成DELETE语句
+        if 'DELETE' in data_types:
+            if first_batch:
+                lines.append("")
+                lines.append(f"-- DELETE 语句（表: {table_name}）")
+            for row in rows:
+                where_str = self._build_row_where(all_columns, pk_columns, row)
+                if where_str:
+                    lines.append(f"DELETE FROM {table_sql} WHERE {where_str};")
+
+        # 生成SELECT语句
+        if 'SELECT' in data_types:
+            if first_batch:
+                lines.append("")
+                lines.append(f"-- SELECT 语句（表: {table_name}）")
+            columns_str = ', '.join(f"`{col}`" for col in all_columns)
+            for row in rows:
+                where_str = self._build_row_where(all_columns, pk_columns, row)
+                if where_str:
+                    lines.append(f"SELECT {columns_str} FROM {table_sql} WHERE {where_str};")
+
+        lines.append("")
+        return '\n'.join(lines) + '\n'
+
+    def _build_row_where(self, all_columns, pk_columns, row):
+        """构建定位单行的WHERE条件：优先使用主键，没有主键时使用所有字段"""
+        if pk_columns:
+            clauses = [f"`{col}` = {self.escape_sql_value(val)}" for col, val in zip(all_columns, row) if col in pk_columns]
+        else:
+            clauses = [f"`{col}` = {self.escape_sql_value(val)}" for col, val in zip(all_columns, row)]
+        return ' AND '.join(clauses)
+
+
+class ExportProgress:
+    """
+    并行导出进度
+    进度以 JSON 文件保存在导出临时目录中，通过原子替换写入，
+    同一台机器上的任意 worker 进程都可以读取到导出进度
+    """
+
+    # 两次写入进度文件的最小间隔（秒）
+    FLUSH_INTERVAL = 0.5
+    ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+    def __init__(self, root, export_id, connection_id, parallelism, tables):
+        self.root = root
+        self.path = os.path.join(root, f'{export_id}.json')
+        self.spool_dir = os.path.join(root, export_id)
+        self._lock = threading.Lock()
+        self._last_flush = 0
+        self.data = {
+            'export_id': export_id,
+            'connection_id': connection_id,
+            'status': 'running',
+            'parallelism': parallelism,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'error': None,
+            'tables': [
+                {
+                    'database': db_name,
+                    'table': table_name,
+                    'status': 'pending',
+                    'rows': 0,
+                    'bytes': 0,
+                    'started_at': None,
+                    'finished_at': None,
+                    'error': None
+                }
+                for db_name, table_name in tables
+            ]
+        }
+
+    @classmethod
+    def is_valid_id(cls, export_id):
+        return bool(export_id) and bool(cls.ID_PATTERN.match(str(export_id)))
+
+    def update_table(self, index, rows=0, bytes_written=0, **fields):
+        """累加表的行数、字节数并更新状态字段"""
+        with self._lock:
+            table = self.data['tables'][index]
+            table['rows'] += rows
+            table['bytes'] += bytes_written
+            table.update(fields)
+        self.flush(force='status' in fields)
+
+    def finish(self, status, error=None):
+        with self._lock:
+            self.data['status'] = status
+            self.data['error'] = error
+            self.data['finished_at'] = datetime.now().isoformat()
+        self.flush(force=True)
+
+    def flush(self, force=False):
+        """写入进度文件（限制写入频率）"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_flush < self.FLUSH_INTERVAL:
+                return
+            self._last_flush = now
+            tables = self.data['tables']
+            self.data['total_tables'] = len(tables)
+            self.data['finished_tables'] = sum(1 for t in tables if t['status'] == 'finished')
+            self.data['total_rows'] = sum(t['rows'] for t in tables)
+            self.data['total_bytes'] = sum(t['bytes'] for t in tables)
+            content = json.dumps(self.data, ensure_ascii=False)
+
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f'{self.path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def load(root, export_id):
+        path = os.path.join(root, f'{export_id}.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def cleanup(root, ttl):
+        """清理过期的进度文件和残留的临时目录"""
+        if not os.path.isdir(root):
+            return
+        expire_before = time.time() - ttl
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) >= expire_before:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
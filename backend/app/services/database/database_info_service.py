@@ -7,110 +7,35 @@
 @description  数据库信息服务层
 """
 
-from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.pool import QueuePool
+import base64
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import text
 
 from ...core.exceptions import APIException
-from ...models.database.database_conn_model import DatabaseConnection
+from .column_profile_service import column_profile_service
+from .connection_registry import engine_registry, EngineRegistry
+from .query_stream_service import QueryMetrics, QueryStreamService
+from .schema_metadata_cache import schema_cache
 
 
 class DatabaseInfoService:
     """数据库信息服务类"""
     
-    def __init__(self):
-        self.connection_pool = {}
-    
-    def _get_connection_key(self, connection_id):
-        """获取连接池的键"""
-        return f"conn_{connection_id}"
-    
-    def _get_connection_engine(self, connection_id):
-        """获取或创建数据库连接"""
-        connection_key = self._get_connection_key(connection_id)
-        
-        # 检查连接池中是否已有连接
-        if connection_key in self.connection_pool:
-            try:
-                # 测试连接是否有效
-                engine = self.connection_pool[connection_key]
-                with engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                return engine
-            except Exception:
-                # 连接无效，从池中移除
-                del self.connection_pool[connection_key]
-        
-        # 获取数据库连接信息
-        db_conn = DatabaseConnection.query.filter_by(id=connection_id, is_active=True).first()
-        if not db_conn:
-            raise APIException('数据库连接不存在或已被禁用', 404)
-        
-        try:
-            # 创建连接字符串
-            # 使用 pymysql 作为 MySQL 驱动
-            connection_string = f"mysql+pymysql://{db_conn.username}:{db_conn.password}@{db_conn.host}:{db_conn.port}/{db_conn.database}?charset={db_conn.charset}"
-            
-            # 创建引擎
-            engine = create_engine(
-                connection_string,
-                poolclass=QueuePool,
-                pool_size=5,
-                max_overflow=10,
-                pool_pre_ping=True,  # 连接前测试连接
-                echo=False
-            )
-            
-            # 存储连接
-            self.connection_pool[connection_key] = engine
-            
-            return engine
-        
-        except Exception as e:
-            raise APIException(f'数据库连接失败: {str(e)}', 500)
+    def _get_connection_engine(self, connection_id, variant=EngineRegistry.VARIANT_DEFAULT):
+        """
+        获取数据库连接引擎（从进程级引擎注册表中复用）
+        连接存活由连接池借出时的 pre-ping 保证，连续失败的连接会被熔断并快速失败
+        """
+        return engine_registry.acquire(connection_id, variant)
     
     def _get_connection_engine_without_database(self, connection_id):
         """获取不指定数据库的连接引擎（用于查询数据库列表）"""
-        connection_key = f"conn_{connection_id}_no_db"
-        
-        # 检查连接池中是否已有连接
-        if connection_key in self.connection_pool:
-            try:
-                # 测试连接是否有效
-                engine = self.connection_pool[connection_key]
-                with engine.connect() as conn:
-                    conn.execute(text("SELECT 1"))
-                return engine
-            except Exception:
-                # 连接无效，从池中移除
-                del self.connection_pool[connection_key]
-        
-        # 获取数据库连接信息
-        db_conn = DatabaseConnection.query.filter_by(id=connection_id, is_active=True).first()
-        if not db_conn:
-            raise APIException('数据库连接不存在或已被禁用', 404)
-        
-        try:
-            # 创建连接字符串，不指定数据库（或使用 mysql 系统数据库）
-            # 使用 pymysql 作为 MySQL 驱动
-            connection_string = f"mysql+pymysql://{db_conn.username}:{db_conn.password}@{db_conn.host}:{db_conn.port}/mysql?charset={db_conn.charset}"
-            
-            # 创建引擎
-            engine = create_engine(
-                connection_string,
-                poolclass=QueuePool,
-                pool_size=5,
-                max_overflow=10,
-                pool_pre_ping=True,  # 连接前测试连接
-                echo=False
-            )
-            
-            # 存储连接
-            self.connection_pool[connection_key] = engine
-            
-            return engine
-        
-        except Exception as e:
-            raise APIException(f'数据库连接失败: {str(e)}', 500)
+        return self._get_connection_engine(connection_id, EngineRegistry.VARIANT_NO_DB)
     
     def get_databases(self, connection_id):
         """获取所有数据库列表"""
@@ -135,8 +60,8 @@ class DatabaseInfoService:
         try:
             engine = self._get_connection_engine(connection_id)
             
-            # 使用 inspect 获取表信息
-            inspector = inspect(engine)
+            # 使用带缓存的 Inspector 获取表信息
+            inspector = schema_cache.inspector(connection_id, engine)
             tables = inspector.get_table_names(schema=database_name) if database_name else inspector.get_table_names()
             
             # 关键字模糊过滤（后端安全的小写包含匹配）
@@ -156,7 +81,7 @@ class DatabaseInfoService:
         """获取数据表结构"""
         try:
             engine = self._get_connection_engine(connection_id)
-            inspector = inspect(engine)
+            inspector = schema_cache.inspector(connection_id, engine)
             
             # 获取列信息
             columns = inspector.get_columns(table_name, schema=database_name)
@@ -179,63 +104,53 @@ class DatabaseInfoService:
             raise APIException(f'获取数据表结构失败: {str(e)}', 500)
     
     def get_column_unique_values(self, connection_id, database_name, table_name, column_name, limit=1000):
-        """获取指定列的所有唯一值（用于筛选）"""
+        """
+        获取指定列的所有唯一值（用于筛选）
+        列有索引或表较小时精确查询，否则从主键范围样本中获取（approximate=True），结果按列缓存
+        """
         try:
-            engine = self._get_connection_engine(connection_id)
-            
-            with engine.connect() as conn:
-                # 获取列的类型信息，以确定是否需要检查空字符串
-                inspector = inspect(engine)
-                columns = inspector.get_columns(table_name, schema=database_name)
-                column_info = None
-                for col in columns:
-                    if col['name'] == column_name:
-                        column_info = col
-                        break
-                
-                # 构建WHERE条件
-                # 对于字符串类型（VARCHAR, CHAR, TEXT等），需要检查空字符串
-                # 对于数值、日期时间等类型，只需要检查 IS NOT NULL
-                where_conditions = [f"`{column_name}` IS NOT NULL"]
-                
-                if column_info:
-                    column_type = str(column_info['type']).upper()
-                    # 判断是否为字符串类型
-                    is_string_type = any(
-                        str_type in column_type 
-                        for str_type in ['VARCHAR', 'CHAR', 'TEXT', 'TINYTEXT', 'MEDIUMTEXT', 'LONGTEXT', 'STRING']
-                    )
-                    if is_string_type:
-                        where_conditions.append(f"`{column_name}` != ''")
-                
-                where_clause = " AND ".join(where_conditions)
-                
-                # 查询该列的所有唯一值，限制数量以避免数据过大
-                query = text(f"SELECT DISTINCT `{column_name}` FROM `{database_name}`.`{table_name}` WHERE {where_clause} ORDER BY `{column_name}` LIMIT {limit}")
-                result = conn.execute(query)
-                
-                # 获取所有唯一值，过滤掉空值
-                values = []
-                for row in result.fetchall():
-                    val = row[0]
-                    if val is not None:
-                        # 对于字符串类型，再次过滤空字符串
-                        val_str = str(val).strip()
-                        if val_str:
-                            values.append(val_str)
-                
-                return {
-                    'data': values,
-                    'total': len(values),
-                    'has_more': len(values) >= limit
-                }
+            return column_profile_service.get_unique_values(connection_id, database_name, table_name,
+                                                            column_name, limit)
+        except APIException:
+            raise
         except Exception as e:
             raise APIException(f'获取列唯一值失败: {str(e)}', 500)
     
-    def get_table_data(self, connection_id, database_name, table_name, page=1, per_page=50, search=None, filters=None):
-        """获取数据表数据（支持分页、搜索和筛选）"""
+    def get_column_profile(self, connection_id, database_name, table_name, column_name, top_n=None, refresh=False):
+        """获取列值画像（近似基数、空值比例、Top-N 值）"""
+        try:
+            return column_profile_service.profile_column(connection_id, database_name, table_name, column_name,
+                                                         top_n=top_n, refresh=refresh)
+        except APIException:
+            raise
+        except Exception as e:
+            raise APIException(f'获取列画像失败: {str(e)}', 500)
+    
+    PAGING_OFFSET = 'offset'
+    PAGING_KEYSET = 'keyset'
+    COUNT_EXACT = 'exact'
+    COUNT_ESTIMATED = 'estimated'
+    COUNT_NONE = 'none'
+
+    def get_table_data(self, connection_id, database_name, table_name, page=1, per_page=50, search=None, filters=None,
+                       paging=None, cursor=None, count=None):
+        """
+        获取数据表数据（支持分页、搜索和筛选）
+        :param paging: 分页方式，offset（默认，页码分页）或 keyset（按主键/唯一索引游标分页，深翻页代价恒定）
+        :param cursor: keyset 分页时上一次返回的 next_cursor / prev_cursor，传入时默认使用 keyset 分页
+        :param count: 总数统计方式，exact（精确 COUNT）、estimated（超过阈值时使用估算值）或 none（不统计）
+        """
         try:
             engine = self._get_connection_engine(connection_id)
+            if cursor and not paging:
+                paging = self.PAGING_KEYSET
+            paging = paging or self.PAGING_OFFSET
+            if paging not in (self.PAGING_OFFSET, self.PAGING_KEYSET):
+                raise APIException('不支持的分页方式，仅支持 offset 或 keyset', 400)
+            # keyset 分页用于大表浏览，默认使用估算总数
+            count = count or (self.COUNT_ESTIMATED if paging == self.PAGING_KEYSET else self.COUNT_EXACT)
+            if count not in (self.COUNT_EXACT, self.COUNT_ESTIMATED, self.COUNT_NONE):
+                raise APIException('不支持的总数统计方式，仅支持 exact、estimated 或 none', 400)
             
             with engine.connect() as conn:
                 # 构建WHERE条件
@@ -267,18 +182,27 @@ class DatabaseInfoService:
                     where_clause = "WHERE " + " AND ".join(where_conditions)
                 
                 # 计算总数（应用筛选条件）
-                count_query = text(f"SELECT COUNT(*) as total FROM `{database_name}`.`{table_name}` {where_clause}")
-                count_result = conn.execute(count_query)
-                total = count_result.scalar()
+                total, total_estimated = self._count_table_rows(conn, database_name, table_name, where_clause, count)
+                
+                # 根据数据库主键排序：若存在主键则按主键倒序；否则不指定排序（遵循数据库默认返回顺序）
+                inspector = schema_cache.inspector(connection_id, engine)
+                pk_info = inspector.get_pk_constraint(table_name, schema=database_name) or {}
+                pk_columns = pk_info.get('constrained_columns') or []
+                
+                if paging == self.PAGING_KEYSET:
+                    key_columns = pk_columns or self._find_unique_key_columns(inspector, database_name, table_name)
+                    if key_columns:
+                        result = self._get_table_data_by_keyset(conn, database_name, table_name, where_conditions,
+                                                                key_columns, per_page, cursor)
+                        result.update({'total': total, 'total_estimated': total_estimated})
+                        return result
+                    if cursor:
+                        raise APIException('数据表没有主键或非空唯一索引，无法使用游标分页', 400)
                 
                 # 获取数据
                 # 计算偏移量
                 offset = (page - 1) * per_page
                 
-                # 根据数据库主键排序：若存在主键则按主键倒序；否则不指定排序（遵循数据库默认返回顺序）
-                inspector = inspect(engine)
-                pk_info = inspector.get_pk_constraint(table_name, schema=database_name) or {}
-                pk_columns = pk_info.get('constrained_columns') or []
                 order_by = ""
                 if pk_columns:
                     # 多主键时，全部按倒序以获得稳定分页
@@ -292,25 +216,13 @@ class DatabaseInfoService:
                 columns = result.keys()
                 rows = result.fetchall()
                 
-                # 转换为字典列表，处理时间字段
-                def format_value(val):
-                    from datetime import datetime
-                    if isinstance(val, datetime):
-                        return val.strftime('%Y-%m-%d %H:%M:%S')
-                    return val
-                
-                data = []
-                for row in rows:
-                    row_dict = {}
-                    for col, val in zip(columns, row):
-                        row_dict[col] = format_value(val)
-                    data.append(row_dict)
-                
                 return {
-                    'data': data,
+                    'data': self._rows_to_dicts(columns, rows),
                     'total': total,
+                    'total_estimated': total_estimated,
                     'page': page,
-                    'per_page': per_page
+                    'per_page': per_page,
+                    'paging': self.PAGING_OFFSET
                 }
         
         except APIException:
@@ -318,9 +230,205 @@ class DatabaseInfoService:
         except Exception as e:
             raise APIException(f'获取数据表数据失败: {str(e)}', 500)
     
-    def execute_query(self, connection_id, database_name, query):
-        """执行自定义SQL查询"""
+    @staticmethod
+    def _rows_to_dicts(columns, rows):
+        """转换为字典列表，处理时间字段"""
+        def format_value(val):
+            if isinstance(val, datetime):
+                return val.strftime('%Y-%m-%d %H:%M:%S')
+            return val
+        
+        data = []
+        for row in rows:
+            row_dict = {}
+            for col, val in zip(columns, row):
+                row_dict[col] = format_value(val)
+            data.append(row_dict)
+        return data
+    
+    def _count_table_rows(self, conn, database_name, table_name, where_clause, count):
+        """
+        统计数据表行数
+        estimated 模式下先读取估算值（无筛选条件时使用 information_schema.TABLES.TABLE_ROWS，
+        有筛选条件时使用 EXPLAIN 的扫描行数估算），估算值不超过阈值时仍然返回精确 COUNT
+        :return: (总数, 是否为估算值)
+        """
+        if count == self.COUNT_NONE:
+            return None, False
+        
+        if count == self.COUNT_ESTIMATED:
+            threshold = current_app.config.get('DB_TABLE_DATA_EXACT_COUNT_THRESHOLD', 100000)
+            estimate = self._estimate_table_rows(conn, database_name, table_name, where_clause)
+            if estimate is not None and estimate > threshold:
+                return estimate, True
+        
+        count_query = text(f"SELECT COUNT(*) as total FROM `{database_name}`.`{table_name}` {where_clause}")
+        return conn.execute(count_query).scalar(), False
+    
+    @staticmethod
+    def _estimate_table_rows(conn, database_name, table_name, where_clause):
+        """估算数据表行数（InnoDB 的统计值，误差可能较大，仅用于展示）"""
+        try:
+            if not where_clause:
+                result = conn.execute(text("""
+                    SELECT TABLE_ROWS
+                    FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name
+                """), {'schema': database_name, 'table_name': table_name})
+                value = result.scalar()
+                return int(value) if value is not None else None
+            
+            result = conn.execute(text(f"EXPLAIN SELECT * FROM `{database_name}`.`{table_name}` {where_clause}"))
+            row = result.mappings().first()
+            if row and row.get('rows') is not None:
+                return int(row['rows'])
+        except Exception:
+            # 估算失败时回退到精确统计
+            return None
+        return None
+    
+    @staticmethod
+    def _find_unique_key_columns(inspector, database_name, table_name):
+        """在没有主键时查找可用于游标分页的唯一索引（所有列非空，优先选择列数最少的）"""
+        nullable = {col['name']: col.get('nullable', True) for col in inspector.get_columns(table_name, schema=database_name)}
+        candidates = []
+        for index in inspector.get_indexes(table_name, schema=database_name):
+            if index.get('unique') and index.get('column_names'):
+                candidates.append(index['column_names'])
+        for constraint in inspector.get_unique_constraints(table_name, schema=database_name):
+            if constraint.get('column_names'):
+                candidates.append(constraint['column_names'])
+        
+        candidates = [cols for cols in candidates if all(col in nullable and not nullable[col] for col in cols)]
+        if not candidates:
+            return []
+        return min(candidates, key=len)
+    
+    def _get_table_data_by_keyset(self, conn, database_name, table_name, where_conditions, key_columns, per_page, cursor):
+        """
+        按键集（主键/唯一索引）分页获取数据，排序与页码分页一致（按键倒序）
+        next 方向：WHERE (key) < (当前页最后一行的键) ORDER BY key DESC
+        prev 方向：WHERE (key) > (当前页第一行的键) ORDER BY key ASC，取出后反转
+        """
+        direction = 'next'
+        key_values = None
+        if cursor:
+            cursor_data = self._decode_cursor(cursor)
+            if cursor_data.get('c') != key_columns:
+                raise APIException('游标已失效，请重新查询', 400)
+            direction = cursor_data.get('d', 'next')
+            key_values = cursor_data.get('k')
+        
+        conditions = list(where_conditions)
+        params = {}
+        quoted_keys = [f"`{col}`" for col in key_columns]
+        if key_values is not None:
+            operator = '<' if direction == 'next' else '>'
+            placeholders = [f":k{i}" for i in range(len(key_columns))]
+            if len(key_columns) == 1:
+                conditions.append(f"{quoted_keys[0]} {operator} {placeholders[0]}")
+            else:
+                conditions.append(f"({', '.join(quoted_keys)}) {operator} ({', '.join(placeholders)})")
+            params = {f"k{i}": value for i, value in enumerate(key_values)}
+        
+        where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        order = 'DESC' if direction == 'next' else 'ASC'
+        order_by = ", ".join(f"{col} {order}" for col in quoted_keys)
+        
+        # 多取一行用于判断是否还有更多数据
+        query = text(f"SELECT * FROM `{database_name}`.`{table_name}` {where_clause} ORDER BY {order_by} LIMIT {per_page + 1}")
+        result = conn.execute(query, params)
+        columns = list(result.keys())
+        rows = result.fetchall()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == 'prev':
+            rows = list(reversed(rows))
+        
+        if direction == 'next':
+            has_next, has_prev = has_more, key_values is not None
+        else:
+            has_next, has_prev = True, has_more
+        
+        key_indexes = [columns.index(col) for col in key_columns]
+        next_cursor = prev_cursor = None
+        if rows and has_next:
+            next_cursor = self._encode_cursor(key_columns, [rows[-1][i] for i in key_indexes], 'next')
+        if rows and has_prev:
+            prev_cursor = self._encode_cursor(key_columns, [rows[0][i] for i in key_indexes], 'prev')
+        
+        return {
+            'data': self._rows_to_dicts(columns, rows),
+            'per_page': per_page,
+            'paging': self.PAGING_KEYSET,
+            'key_columns': key_columns,
+            'has_next': has_next,
+            'has_prev': has_prev,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        }
+    
+    @staticmethod
+    def _encode_cursor(key_columns, values, direction):
+        """将键值编码为不透明游标（保留日期、Decimal、二进制等类型）"""
+        encoded = []
+        for value in values:
+            if isinstance(value, datetime):
+                encoded.append({'t': 'dt', 'v': value.isoformat()})
+            elif isinstance(value, date):
+                encoded.append({'t': 'd', 'v': value.isoformat()})
+            elif isinstance(value, Decimal):
+                encoded.append({'t': 'dec', 'v': str(value)})
+            elif isinstance(value, bytes):
+                encoded.append({'t': 'b', 'v': value.hex()})
+            else:
+                encoded.append(value)
+        payload = json.dumps({'c': key_columns, 'k': encoded, 'd': direction}, ensure_ascii=False, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor):
+        """解析游标"""
         try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            decoded = []
+            for value in data['k']:
+                if isinstance(value, dict):
+                    value_type, raw = value['t'], value['v']
+                    if value_type == 'dt':
+                        value = datetime.fromisoformat(raw)
+                    elif value_type == 'd':
+                        value = date.fromisoformat(raw)
+                    elif value_type == 'dec':
+                        value = Decimal(raw)
+                    elif value_type == 'b':
+                        value = bytes.fromhex(raw)
+                decoded.append(value)
+            if data.get('d') not in ('next', 'prev'):
+                raise ValueError('invalid direction')
+            return {'c': data['c'], 'k': decoded, 'd': data['d']}
+        except Exception:
+            raise APIException('游标格式不正确', 400)
+    
+    DDL_KEYWORDS = ('CREATE', 'ALTER', 'DROP', 'RENAME', 'TRUNCATE')
+
+    def execute_query(self, connection_id, database_name, query, limit=None, continuation_token=None):
+        """
+        执行自定义SQL查询
+        SELECT 查询使用服务端游标执行，读取到 limit 行后停止；还有更多数据时返回续页令牌
+        :param limit: 每页行数，默认 1000
+        :param continuation_token: 上一页返回的续页令牌（需携带同一条SQL）
+        """
+        from .sql_service import SQLService
+
+        start_time = time.time()
+        metrics = QueryMetrics()
+        try:
+            limit = QueryStreamService.normalize_limit(limit)
+            offset = 0
+            if continuation_token:
+                offset = QueryStreamService.decode_token(continuation_token, query, connection_id, database_name)
             engine = self._get_connection_engine(connection_id)
             
             with engine.connect() as conn:
@@ -328,58 +436,82 @@ class DatabaseInfoService:
                 if database_name:
                     conn.execute(text(f"USE `{database_name}`"))
                 
-                # 执行查询
-                result = conn.execute(text(query))
-                
                 # 如果是 SELECT 查询，返回结果
                 if query.strip().upper().startswith('SELECT'):
-                    columns = result.keys()
-                    rows = result.fetchall()
-                    
-                    # 处理时间字段
-                    def format_value(val):
-                        from datetime import datetime
-                        if isinstance(val, datetime):
-                            return val.strftime('%Y-%m-%d %H:%M:%S')
-                        return val
+                    with QueryStreamService.stream(conn, query, metrics=metrics, max_rows=offset + limit + 1) as result:
+                        columns = list(result.keys())
+                        rows, has_more = QueryStreamService.fetch_page(result, limit, offset, metrics)
                     
-                    data = []
-                    for row in rows:
-                        row_dict = {}
-                        for col, val in zip(columns, row):
-                            row_dict[col] = format_value(val)
-                        data.append(row_dict)
-                    
-                    return {
+                    response = {
                         'success': True,
-                        'data': data,
-                        'columns': list(columns),
-                        'row_count': len(data)
+                        'data': self._rows_to_dicts(columns, rows),
+                        'columns': columns,
+                        'row_count': len(rows),
+                        'has_more': has_more,
+                        'continuation_token': QueryStreamService.encode_token(
+                            query, connection_id, database_name, offset + len(rows)
+                        ) if has_more else None,
+                        'metrics': metrics.to_dict()
                     }
                 else:
+                    # 执行查询
+                    result = conn.execute(text(query))
+                    metrics.mark_executed()
                     # DML 查询，返回影响行数
                     conn.commit()
-                    return {
+                    metrics.finish()
+                    # DDL 语句会改变表结构，清除该连接的元数据缓存
+                    if query.strip().split(None, 1)[0].upper() in self.DDL_KEYWORDS:
+                        schema_cache.invalidate(connection_id)
+                        column_profile_service.invalidate(connection_id)
+                    response = {
                         'success': True,
                         'message': '查询执行成功',
                         'rowcount': result.rowcount if hasattr(result, 'rowcount') else 0
                     }
+            
+            SQLService.save_history(query, time.time() - start_time, True, connection_id=connection_id,
+                                    database_name=database_name, metrics=metrics)
+            return response
         
         except APIException:
             raise
         except Exception as e:
+            SQLService.save_history(query, time.time() - start_time, False, error_message=str(e),
+                                    connection_id=connection_id, database_name=database_name, metrics=metrics)
             raise APIException(f'执行查询失败: {str(e)}', 500)
     
     def close_connection(self, connection_id):
-        """关闭数据库连接"""
-        connection_key = self._get_connection_key(connection_id)
-        if connection_key in self.connection_pool:
-            engine = self.connection_pool[connection_key] # 获取数据库引擎
-            engine.dispose() # 释放引擎资源
-            del self.connection_pool[connection_key] # 删除连接池中的连接
+        """关闭数据库连接（释放注册表中该连接的所有连接池）"""
+        schema_cache.invalidate(connection_id)
+        column_profile_service.invalidate(connection_id)
+        if engine_registry.invalidate(connection_id):
             return {'message': '数据库连接已关闭'}
         return {'message': '连接不存在'}
     
+    @staticmethod
+    def get_pool_stats():
+        """获取连接池注册表统计信息"""
+        return engine_registry.stats()
+    
+    @staticmethod
+    def get_schema_cache_stats():
+        """获取表结构元数据缓存统计信息（命中、未命中、版本校验续期次数）"""
+        return schema_cache.stats()
+    
+    @staticmethod
+    def refresh_schema_cache(connection_id, database_name=None, table_name=None):
+        """
+        手动刷新表结构元数据缓存
+        :param database_name: 为空时刷新该连接的全部缓存
+        :param table_name: 为空时刷新整个库的缓存
+        """
+        if table_name and not database_name:
+            raise APIException('刷新表缓存时必须指定数据库名', 400)
+        count = schema_cache.invalidate(connection_id, database_name, table_name)
+        column_profile_service.invalidate(connection_id, database_name, table_name)
+        return {'message': '元数据缓存已刷新', 'invalidated': count}
+    
     def _sort_tables_by_foreign_keys(self, inspector, database_name, tables):
         """
         根据外键关系对表进行拓扑排序，优先导出被依赖的表
@@ -457,7 +589,7 @@ class DatabaseInfoService:
                 raise APIException('没有选中任何数据', 400)
             
             engine = self._get_connection_engine(connection_id)
-            inspector = inspect(engine)
+            inspector = schema_cache.inspector(connection_id, engine)
             
             # 获取表结构，特别是主键信息
             pk_info = inspector.get_pk_constraint(table_name, schema=database_name) or {}
@@ -619,249 +751,13 @@ class DatabaseInfoService:
         :param sql_types: SQL类型列表，可选 ['CREATE', 'INSERT', 'UPDATE', 'DELETE', 'SELECT']，默认为全部
         :return: SQL字符串
         """
+        # 大数据量导出请直接使用 DatabaseExportService.export_databases_sql_stream 流式输出
+        from .database_export_service import DatabaseExportService
+
         try:
-            if not database_tables or len(database_tables) == 0:
-                raise APIException('没有选择任何数据库', 400)
-            
-            engine = self._get_connection_engine(connection_id)
-            inspector = inspect(engine)
-            
-            # 默认生成所有类型的SQL
-            if sql_types is None:
-                sql_types = ['CREATE', 'INSERT', 'UPDATE', 'DELETE', 'SELECT']
-            
-            sql_lines = []
-            sql_lines.append(f"-- ==================== 数据库导出SQL ====================")
-            sql_lines.append(f"-- 导出时间: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            # 构建导出信息
-            db_info = []
-            for db_name, tables in database_tables.items():
-                if tables and len(tables) > 0:
-                    db_info.append(f"{db_name}({len(tables)}个表)")
-                else:
-                    db_info.append(f"{db_name}(所有表)")
-            sql_lines.append(f"-- 数据库列表: {', '.join(db_info)}")
-            sql_lines.append(f"-- 导出类型: {', '.join(sql_types)}")
-            sql_lines.append("")
-            
-            # 辅助函数：转义SQL值
-            def escape_sql_value(value):
-                """转义SQL值"""
-                if value is None:
-                    return 'NULL'
-                elif isinstance(value, (int, float)):
-                    return str(value)
-                elif isinstance(value, bool):
-                    return '1' if value else '0'
-                elif isinstance(value, bytes):
-                    return f"0x{value.hex()}"
-                else:
-                    # 字符串类型，转义单引号和反斜杠
-                    value_str = str(value)
-                    value_str = value_str.replace('\\', '\\\\')
-                    value_str = value_str.replace("'", "\\'")
-                    return f"'{value_str}'"
-            
-            with engine.connect() as conn:
-                for db_name, selected_tables in database_tables.items():
-                    sql_lines.append("")
-                    sql_lines.append(f"-- ==================== 数据库: {db_name} ====================")
-                    sql_lines.append("")
-                    
-                    # 获取该数据库的所有表
-                    all_tables = inspector.get_table_names(schema=db_name)
-                    
-                    if not all_tables:
-                        sql_lines.append(f"-- 数据库 {db_name} 中没有表")
-                        sql_lines.append("")
-                        continue
-                    
-                    # 如果selected_tables为None或空列表，导出所有表；否则只导出选中的表
-                    if selected_tables and len(selected_tables) > 0:
-                        tables_to_export = [t for t in selected_tables if t in all_tables]
-                        if not tables_to_export:
-                            sql_lines.append(f"-- 数据库 {db_name} 中没有选中的表")
-                            sql_lines.append("")
-                            continue
-                    else:
-                        tables_to_export = all_tables
-                    
-                    # 根据外键关系对表进行拓扑排序，优先导出被依赖的表
-                    tables_to_export = self._sort_tables_by_foreign_keys(inspector, db_name, tables_to_export)
-                    
-                    for table_name in tables_to_export:
-                        sql_lines.append("")
-                        sql_lines.append(f"-- ==================== 表: {table_name} ====================")
-                        sql_lines.append("")
-                        
-                        # 获取表结构
-                        if 'CREATE' in sql_types:
-                            # 获取CREATE TABLE语句
-                            create_table_result = conn.execute(text(f"SHOW CREATE TABLE `{db_name}`.`{table_name}`"))
-                            create_row = create_table_result.fetchone()
-                            if create_row and len(create_row) >= 2:
-                                create_sql = create_row[1]
-                                sql_lines.append(f"-- CREATE TABLE 语句")
-                                sql_lines.append(f"DROP TABLE IF EXISTS `{db_name}`.`{table_name}`;")
-                                sql_lines.append(f"{create_sql};")
-                                sql_lines.append("")
-                        
-                        # 获取表列信息（按照表定义顺序）
-                        # 使用 INFORMATION_SCHEMA 确保字段顺序与 MySQL 存储顺序完全一致
-                        query = text(f"""
-                            SELECT COLUMN_NAME 
-                            FROM INFORMATION_SCHEMA.COLUMNS 
-                            WHERE TABLE_SCHEMA = :schema AND TABLE_NAME = :table_name 
-                            ORDER BY ORDINAL_POSITION
-                        """)
-                        result = conn.execute(query, {'schema': db_name, 'table_name': table_name})
-                        all_columns = [row[0] for row in result]
-                        
-                        # 如果查询失败，回退到使用 inspector（兼容性处理）
-                        if not all_columns:
-                            columns_info = inspector.get_columns(table_name, schema=db_name)
-                            all_columns = [col['name'] for col in columns_info]
-                        
-                        # 获取主键信息
-                        pk_info = inspector.get_pk_constraint(table_name, schema=db_name) or {}
-                        pk_columns = pk_info.get('constrained_columns', [])
-                        
-                        # 获取表的所有数据（分批获取，避免内存过大）
-                        # 先查询表的总行数
-                        total_rows = 0
-                        if 'INSERT' in sql_types:
-                            count_query = text(f"SELECT COUNT(*) as total FROM `{db_name}`.`{table_name}`")
-                            count_result = conn.execute(count_query)
-                            total_rows = count_result.scalar() or 0
-                        
-                        batch_size = 1000
-                        offset = 0
-                        has_data = True
-                        
-                        while has_data:
-                            query = text(f"SELECT * FROM `{db_name}`.`{table_name}` LIMIT {batch_size} OFFSET {offset}")
-                            result = conn.execute(query)
-                            rows = result.fetchall()
-                            
-                            if not rows:
-                                has_data = False
-                                break
-                            
-                            # 转换为字典列表，处理时间字段
-                            def format_value(val):
-                                from datetime import datetime
-                                if isinstance(val, datetime):
-                                    return val.strftime('%Y-%m-%d %H:%M:%S')
-                                return val
-                            
-                            data = []
-                            for row in rows:
-                                row_dict = {}
-                                for col, val in zip(all_columns, row):
-                                    row_dict[col] = format_value(val)
-                                data.append(row_dict)
-                            
-                            # 生成INSERT语句（按照表结构中的字段顺序）
-                            if 'INSERT' in sql_types and data:
-                                if offset == 0:
-                                    sql_lines.append(f"-- INSERT 语句（表: {table_name}）共导出 {total_rows} 条数据")
-                                for row_data in data:
-                                    columns = []
-                                    values = []
-                                    # 严格按照表结构中的字段顺序遍历，确保导出顺序与MySQL存储顺序一致
-                                    for col in all_columns:
-                                        if col in row_data:
-                                            columns.append(f"`{col}`")
-                                            # created_at 和 updated_at 字段使用 NOW() 函数
-                                            if col in ('created_at', 'updated_at'):
-                                                values.append('NOW()')
-                                            else:
-                                                values.append(escape_sql_value(row_data[col]))
-                                    
-                                    if columns:  # 确保至少有一个字段
-                                        columns_str = ', '.join(columns)
-                                        values_str = ', '.join(values)
-                                        sql_lines.append(f"INSERT INTO `{db_name}`.`{table_name}` ({columns_str}) VALUES ({values_str});")
-                            
-                            # 生成UPDATE语句
-                            if 'UPDATE' in sql_types and data:
-                                if offset == 0:
-                                    sql_lines.append("")
-                                    sql_lines.append(f"-- UPDATE 语句（表: {table_name}）")
-                                for row_data in data:
-                                    set_clauses = []
-                                    where_clauses = []
-                                    
-                                    for col in all_columns:
-                                        if col in row_data:
-                                            if col in pk_columns:
-                                                where_clauses.append(f"`{col}` = {escape_sql_value(row_data[col])}")
-                                            else:
-                                                # created_at 和 updated_at 字段使用 NOW() 函数
-                                                if col in ('created_at', 'updated_at'):
-                                                    set_clauses.append(f"`{col}` = NOW()")
-                                                else:
-                                                    set_clauses.append(f"`{col}` = {escape_sql_value(row_data[col])}")
-                                    
-                                    if set_clauses and where_clauses:
-                                        set_str = ', '.join(set_clauses)
-                                        where_str = ' AND '.join(where_clauses)
-                                        sql_lines.append(f"UPDATE `{db_name}`.`{table_name}` SET {set_str} WHERE {where_str};")
-                            
-                            # 生成DELETE语句
-                            if 'DELETE' in sql_types and data:
-                                if offset == 0:
-                                    sql_lines.append("")
-                                    sql_lines.append(f"-- DELETE 语句（表: {table_name}）")
-                                for row_data in data:
-                                    where_clauses = []
-                                    
-                                    if pk_columns:
-                                        for pk_col in pk_columns:
-                                            if pk_col in row_data:
-                                                where_clauses.append(f"`{pk_col}` = {escape_sql_value(row_data[pk_col])}")
-                                    else:
-                                        for col in all_columns:
-                                            if col in row_data:
-                                                where_clauses.append(f"`{col}` = {escape_sql_value(row_data[col])}")
-                                    
-                                    if where_clauses:
-                                        where_str = ' AND '.join(where_clauses)
-                                        sql_lines.append(f"DELETE FROM `{db_name}`.`{table_name}` WHERE {where_str};")
-                            
-                            # 生成SELECT语句
-                            if 'SELECT' in sql_types and data:
-                                if offset == 0:
-                                    sql_lines.append("")
-                                    sql_lines.append(f"-- SELECT 语句（表: {table_name}）")
-                                # 构建所有列的列表
-                                columns_str = ', '.join([f"`{col}`" for col in all_columns])
-                                for row_data in data:
-                                    where_clauses = []
-                                    
-                                    if pk_columns:
-                                        for pk_col in pk_columns:
-                                            if pk_col in row_data:
-                                                where_clauses.append(f"`{pk_col}` = {escape_sql_value(row_data[pk_col])}")
-                                    else:
-                                        for col in all_columns:
-                                            if col in row_data:
-                                                where_clauses.append(f"`{col}` = {escape_sql_value(row_data[col])}")
-                                    
-                                    if where_clauses:
-                                        where_str = ' AND '.join(where_clauses)
-                                        sql_lines.append(f"SELECT {columns_str} FROM `{db_name}`.`{table_name}` WHERE {where_str};")
-                            
-                            offset += batch_size
-                        
-                        if 'INSERT' in sql_types and total_rows > 0:
-                            sql_lines.append("")
-            
-            return '\n'.join(sql_lines)
-        
+            chunks = DatabaseExportService().export_databases_sql_stream(connection_id, database_tables, sql_types)
+            return ''.join(chunks)
         except APIException:
             raise
         except Exception as e:
             raise APIException(f'导出数据库SQL失败: {str(e)}', 500)
-
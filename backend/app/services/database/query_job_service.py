@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  后台查询任务服务（异步执行、分页获取结果、KILL QUERY 取消与超时）
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from ...core.database import db
+from ...core.exceptions import APIException
+from ...utils.job_util import BackgroundJobRunner, FileJobStore, JobStatus
+from .connection_registry import engine_registry
+from .query_stream_service import QueryMetrics, QueryStreamService
+
+
+class QueryJobCancelled(Exception):
+    """查询任务被取消"""
+
+
+class QueryJobService:
+    """
+    后台查询任务服务
+    - 查询在有界线程池中执行，不占用请求所在的 worker
+    - 执行前记录 MySQL CONNECTION_ID()，取消或超过 max_execution_time 时通过另一个连接执行 KILL QUERY
+    - 结果逐行写入任务目录中的 NDJSON 文件，并记录每 RESULT_INDEX_STEP 行的文件偏移，
+      分页读取时直接定位，不需要重新执行查询；结果在 SQL_JOB_RESULT_TTL 后清理
+    """
+
+    RESULTS_FILE = 'results.ndjson'
+    RESULT_INDEX_STEP = 1000
+    # 执行过程中写入进度的行数间隔
+    PROGRESS_INTERVAL = 5000
+    DEFAULT_MAX_EXECUTION_TIME = 300
+    DEFAULT_MAX_ROWS = 100000
+
+    def __init__(self):
+        self.store = FileJobStore('sql_query')
+        self.runner = BackgroundJobRunner('sql-query', max_workers=4)
+        self.max_execution_time = self.DEFAULT_MAX_EXECUTION_TIME
+        self.max_rows = self.DEFAULT_MAX_ROWS
+
+    def init_app(self, app):
+        spool_dir = app.config.get('SQL_JOB_SPOOL_DIR')
+        if spool_dir:
+            self.store.root = spool_dir
+        self.store.ttl = app.config.get('SQL_JOB_RESULT_TTL', self.store.ttl)
+        self.max_execution_time = app.config.get('SQL_JOB_MAX_EXECUTION_TIME', self.max_execution_time)
+        self.max_rows = app.config.get('SQL_JOB_MAX_ROWS', self.max_rows)
+        self.runner.init_app(app, app.config.get('SQL_JOB_MAX_WORKERS'))
+
+    def submit(self, sql_query, connection_id=None, database_name=None, max_execution_time=None, max_rows=None,
+               current_user=None):
+        """
+        提交查询任务
+        :param max_execution_time: 最长执行时间（秒），超时后执行 KILL QUERY
+        :param max_rows: 最多保存的结果行数
+        :return: 任务状态
+        """
+        from .sql_service import SQLService
+
+        try:
+            SQLService._check_sql_safety(sql_query)
+        except ValueError as e:
+            raise APIException(str(e), 400)
+
+        max_execution_time = self._normalize_int(max_execution_time, self.max_execution_time, 'max_execution_time')
+        max_execution_time = min(max_execution_time, self.max_execution_time)
+        max_rows = min(self._normalize_int(max_rows, self.max_rows, 'max_rows'), self.max_rows)
+
+        # 提交前获取引擎，连接不可用时直接返回错误
+        engine = engine_registry.acquire(connection_id) if connection_id else db.engine
+
+        self.store.cleanup()
+        job = self.store.create({
+            'sql_query': sql_query,
+            'connection_id': connection_id,
+            'database_name': database_name,
+            'max_execution_time': max_execution_time,
+            'max_rows': max_rows,
+            'mysql_connection_id': None,
+            'pid': os.getpid(),
+            'columns': [],
+            'row_count': 0,
+            'truncated': False,
+            'metrics': None,
+            'created_by': current_user.id if current_user else None
+        })
+        self.runner.submit_job(self.store, job['job_id'], self._run, engine,
+                               current_user.id if current_user else None)
+        return job
+
+    def get_status(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('查询任务不存在或结果已过期', 404)
+        job.pop('result_index', None)
+        return job
+
+    def get_results(self, job_id, page=1, per_page=100):
+        """分页读取已完成任务的结果"""
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('查询任务不存在或结果已过期', 404)
+        if job['status'] != JobStatus.FINISHED:
+            raise APIException(f"查询任务尚未完成，当前状态: {job['status']}", 409)
+
+        page = max(1, int(page or 1))
+        per_page = max(1, min(int(per_page or 100), QueryStreamService.MAX_PAGE_SIZE))
+        start = (page - 1) * per_page
+        rows = []
+        if start < job['row_count']:
+            index = job.get('result_index') or [0]
+            slot = min(start // self.RESULT_INDEX_STEP, len(index) - 1)
+            line_no = slot * self.RESULT_INDEX_STEP
+            with open(os.path.join(self.store.job_dir(job_id), self.RESULTS_FILE), 'r', encoding='utf-8') as f:
+                f.seek(index[slot])
+                for line in f:
+                    if line_no >= start:
+                        rows.append(json.loads(line))
+                        if len(rows) >= per_page:
+                            break
+                    line_no += 1
+
+        return {
+            'job_id': job_id,
+            'columns': job['columns'],
+            'data': rows,
+            'page': page,
+            'per_page': per_page,
+            'total': job['row_count'],
+            'truncated': job['truncated']
+        }
+
+    def cancel(self, job_id):
+        """
+        取消查询任务
+        写入取消标记后，若查询已在 MySQL 上执行，立即通过新连接执行 KILL QUERY（任意 worker 进程均可执行）
+        """
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('查询任务不存在或结果已过期', 404)
+        if job['status'] in JobStatus.FINAL_STATUSES:
+            return job
+
+        self.store.request_cancel(job_id)
+        if job.get('mysql_connection_id'):
+            engine = engine_registry.acquire(job['connection_id']) if job.get('connection_id') else db.engine
+            self._kill_query(engine, job['mysql_connection_id'])
+        return self.store.load(job_id)
+
+    def list_jobs(self):
+        jobs = self.store.list()
+        for job in jobs:
+            job.pop('result_index', None)
+        return jobs
+
+    def _run(self, job_id, engine, user_id):
+        """在后台线程中执行查询"""
+        from .sql_service import SQLService
+
+        job = self.store.load(job_id)
+        if self.store.is_cancel_requested(job_id):
+            self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat())
+            return
+
+        sql_query = job['sql_query']
+        metrics = QueryMetrics()
+        start_time = time.time()
+        timed_out = threading.Event()
+        watchdog = None
+        status, error = JobStatus.FINISHED, None
+        self.store.update(job_id, status=JobStatus.RUNNING, started_at=datetime.now().isoformat())
+
+        try:
+            with engine.connect() as conn:
+                is_mysql = conn.dialect.name == 'mysql'
+                if is_mysql:
+                    mysql_connection_id = conn.execute(text("SELECT CONNECTION_ID()")).scalar()
+                    self.store.update(job_id, mysql_connection_id=mysql_connection_id)
+
+                    # 超过最长执行时间后 KILL QUERY
+                    def _on_timeout():
+                        timed_out.set()
+                        self._kill_query(engine, mysql_connection_id)
+
+                    watchdog = threading.Timer(job['max_execution_time'], _on_timeout)
+                    watchdog.daemon = True
+                    watchdog.start()
+
+                if job.get('database_name'):
+                    conn.execute(text(f"USE `{job['database_name']}`"))
+
+                self._fetch_to_file(job_id, conn, sql_query, job['max_rows'], metrics, timed_out)
+        except QueryJobCancelled:
+            status = JobStatus.TIMEOUT if timed_out.is_set() else JobStatus.CANCELLED
+        except Exception as e:
+            if timed_out.is_set():
+                status, error = JobStatus.TIMEOUT, f"查询执行超过 {job['max_execution_time']} 秒，已终止"
+            elif self.store.is_cancel_requested(job_id):
+                status = JobStatus.CANCELLED
+            else:
+                status, error = JobStatus.FAILED, str(e)
+        finally:
+            if watchdog:
+                watchdog.cancel()
+
+        metrics.finish()
+        self.store.update(job_id, status=status, error=error, metrics=metrics.to_dict(),
+                          finished_at=datetime.now().isoformat())
+
+        SQLService.save_history(sql_query, time.time() - start_time, status == JobStatus.FINISHED,
+                                error_message=error or (None if status == JobStatus.FINISHED else status),
+                                connection_id=job.get('connection_id'), database_name=job.get('database_name'),
+                                metrics=metrics, user_id=user_id)
+
+    def _fetch_to_file(self, job_id, conn, sql_query, max_rows, metrics, timed_out):
+        """流式读取结果并写入 NDJSON 文件，记录分页偏移"""
+        path = os.path.join(self.store.job_dir(job_id), self.RESULTS_FILE)
+        result_index = [0]
+        count = 0
+        truncated = False
+
+        with open(path, 'wb') as f:
+            with QueryStreamService.stream(conn, sql_query, metrics=metrics, max_rows=max_rows + 1) as result:
+                if not result.returns_rows:
+                    self.store.update(job_id, row_count=0, affected_rows=result.rowcount)
+                    conn.commit()
+                    return
+
+                columns = list(result.keys())
+                self.store.update(job_id, columns=columns)
+                for row in QueryStreamService.iter_rows(result, metrics=metrics, max_rows=max_rows + 1):
+                    if count >= max_rows:
+                        truncated = True
+                        metrics.discard_row(QueryStreamService.estimate_row_size(row))
+                        break
+                    if count and count % self.RESULT_INDEX_STEP == 0:
+                        result_index.append(f.tell())
+                    f.write((json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                                        default=QueryStreamService.json_default) + '\n').encode('utf-8'))
+                    count += 1
+                    if count % self.PROGRESS_INTERVAL == 0:
+                        if timed_out.is_set() or self.store.is_cancel_requested(job_id):
+                            raise QueryJobCancelled()
+                        self.store.update(job_id, row_count=count)
+
+        self.store.update(job_id, row_count=count, truncated=truncated, result_index=result_index)
+
+    @staticmethod
+    def _kill_query(engine, mysql_connection_id):
+        """通过新连接终止正在执行的查询"""
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(f"KILL QUERY {int(mysql_connection_id)}"))
+        except Exception:
+            # 查询可能已经结束
+            pass
+
+    @staticmethod
+    def _normalize_int(value, default, name):
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise APIException(f'{name} 必须为整数', 400)
+        if value <= 0:
+            raise APIException(f'{name} 必须大于0', 400)
+        return value
+
+
+# 全局服务实例
+query_job_service = QueryJobService()
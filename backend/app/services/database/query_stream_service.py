@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  查询结果流式读取（服务端游标、行数上限、续页令牌、NDJSON 输出）
+"""
+
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import text
+
+from ...core.exceptions import APIException
+
+
+class QueryMetrics:
+    """单次查询的耗时与数据量统计"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.executed_at = None
+        self.first_row_at = None
+        self.finished_at = None
+        self.row_count = 0
+        self.bytes = 0
+
+    def mark_executed(self):
+        self.executed_at = time.perf_counter()
+
+    def add_rows(self, rows, size):
+        if rows and self.first_row_at is None:
+            self.first_row_at = time.perf_counter()
+        self.row_count += rows
+        self.bytes += size
+
+    def discard_row(self, size):
+        """撤销一行统计（用于判断是否还有更多数据而多读取的行）"""
+        self.row_count -= 1
+        self.bytes -= size
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_row(self):
+        """从开始执行到读取到第一行的耗时（秒）"""
+        if self.first_row_at is None:
+            return None
+        return round(self.first_row_at - self.started_at, 6)
+
+    @property
+    def fetch_time(self):
+        """读取结果集的耗时（秒），不含语句执行前的等待"""
+        if self.executed_at is None:
+            return None
+        end = self.finished_at or time.perf_counter()
+        return round(end - self.executed_at, 6)
+
+    def to_dict(self):
+        return {
+            'time_to_first_row': self.time_to_first_row,
+            'fetch_time': self.fetch_time,
+            'row_count': self.row_count,
+            'bytes': self.bytes
+        }
+
+
+class QueryStreamService:
+    """查询结果流式读取服务"""
+
+    DEFAULT_PAGE_SIZE = 1000
+    MAX_PAGE_SIZE = 10000
+    # 每次从服务端游标读取的行数
+    FETCH_CHUNK_SIZE = 500
+    TOKEN_SALT = 'query-continuation'
+
+    @staticmethod
+    @contextmanager
+    def stream(conn, sql, metrics=None, max_rows=None):
+        """
+        使用服务端游标（stream_results / SSCursor）执行查询
+        MySQL 下通过会话变量 sql_select_limit 让服务端在 max_rows 行后停止返回数据，
+        提前关闭游标时不需要再读完剩余结果集；语句自带 LIMIT 时以语句为准
+        """
+        limit_rows = bool(max_rows) and conn.dialect.name == 'mysql'
+        if limit_rows:
+            conn.execute(text(f"SET SESSION sql_select_limit = {int(max_rows)}"))
+        try:
+            result = conn.execute(text(sql), execution_options={'stream_results': True})
+            if metrics:
+                metrics.mark_executed()
+            try:
+                yield result
+            finally:
+                result.close()
+        finally:
+            if limit_rows:
+                try:
+                    conn.execute(text("SET SESSION sql_select_limit = DEFAULT"))
+                except Exception:
+                    # 无法恢复会话变量时丢弃该连接，避免影响连接池中的其他查询
+                    conn.invalidate()
+
+    @classmethod
+    def iter_rows(cls, result, metrics=None, offset=0, max_rows=None):
+        """按块读取结果行，跳过 offset 行，最多返回 max_rows 行"""
+        skipped = 0
+        returned = 0
+        while max_rows is None or returned < max_rows:
+            chunk = result.fetchmany(cls.FETCH_CHUNK_SIZE)
+            if not chunk:
+                break
+            if skipped < offset:
+                skip = min(offset - skipped, len(chunk))
+                skipped += skip
+                chunk = chunk[skip:]
+                if not chunk:
+                    continue
+            if max_rows is not None:
+                chunk = chunk[:max_rows - returned]
+            returned += len(chunk)
+            if metrics:
+                metrics.add_rows(len(chunk), sum(cls.estimate_row_size(row) for row in chunk))
+            yield from chunk
+
+    @classmethod
+    def fetch_page(cls, result, limit, offset=0, metrics=None):
+        """
+        读取一页数据（多读取一行用于判断是否还有更多数据）
+        :return: (行列表, 是否还有更多数据)
+        """
+        rows = list(cls.iter_rows(result, metrics=metrics, offset=offset, max_rows=limit + 1))
+        has_more = len(rows) > limit
+        if has_more:
+            extra = rows.pop()
+            if metrics:
+                metrics.discard_row(cls.estimate_row_size(extra))
+        if metrics:
+            metrics.finish()
+        return rows, has_more
+
+    @staticmethod
+    def estimate_row_size(row):
+        """估算一行数据的字节数（按值的文本长度计算）"""
+        size = 0
+        for value in row:
+            if value is None:
+                size += 4
+            elif isinstance(value, (bytes, bytearray)):
+                size += len(value)
+            else:
+                size += len(str(value))
+        return size
+
+    @classmethod
+    def normalize_limit(cls, limit):
+        try:
+            limit = int(limit) if limit is not None else cls.DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            limit = cls.DEFAULT_PAGE_SIZE
+        return max(1, min(limit, cls.MAX_PAGE_SIZE))
+
+    @classmethod
+    def _serializer(cls):
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=cls.TOKEN_SALT)
+
+    @staticmethod
+    def _query_fingerprint(sql, connection_id, database_name):
+        raw = f"{connection_id}|{database_name or ''}|{sql.strip()}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def encode_token(cls, sql, connection_id, database_name, offset):
+        """生成续页令牌：记录查询指纹和下一页的起始位置，客户端需携带同一条 SQL 请求下一页"""
+        return cls._serializer().dumps({
+            'q': cls._query_fingerprint(sql, connection_id, database_name),
+            'o': offset
+        })
+
+    @classmethod
+    def decode_token(cls, token, sql, connection_id, database_name):
+        """解析续页令牌，返回下一页的起始位置"""
+        try:
+            data = cls._serializer().loads(token)
+        except BadSignature:
+            raise APIException('续页令牌无效', 400)
+        if data.get('q') != cls._query_fingerprint(sql, connection_id, database_name):
+            raise APIException('续页令牌与当前查询不匹配', 400)
+        return int(data.get('o', 0))
+
+    @staticmethod
+    def json_default(value):
+        """NDJSON 序列化时处理数据库特有类型"""
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, (date, timedelta)):
+            return str(value)
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, (bytes, bytearray)):
+            return value.hex()
+        return str(value)
+
+    @classmethod
+    def iter_ndjson(cls, conn, sql, metrics, max_rows=None):
+        """
+        以 NDJSON 格式逐行输出查询结果
+        第一行为列信息 {"type": "columns"}，之后每行一条 {"type": "row"}，最后一行为统计信息 {"type": "end"}
+        """
+        with cls.stream(conn, sql, metrics=metrics, max_rows=max_rows + 1 if max_rows else None) as result:
+            columns = list(result.keys())
+            yield json.dumps({'type': 'columns', 'columns': columns}, ensure_ascii=False) + '\n'
+
+            truncated = False
+            count = 0
+            for row in cls.iter_rows(result, metrics=metrics, max_rows=max_rows + 1 if max_rows else None):
+                if max_rows is not None and count >= max_rows:
+                    # 多读取的一行仅用于判断结果是否被截断
+                    truncated = True
+                    metrics.discard_row(cls.estimate_row_size(row))
+                    break
+                line = json.dumps({'type': 'row', 'data': dict(zip(columns, row))},
+                                  ensure_ascii=False, default=cls.json_default) + '\n'
+                count += 1
+                yield line
+            metrics.finish()
+
+        summary = metrics.to_dict()
+        summary.update({'type': 'end', 'row_count': count, 'truncated': truncated})
+        yield json.dumps(summary, ensure_ascii=False) + '\n'
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Redis 键空间分析服务（按前缀统计内存、TTL 分布与大 key，结果持久化便于对比）
+"""
+
+import heapq
+import json
+import os
+import random
+import socket
+import time
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from ...core.database import db, datetime, tz_beijing
+from ...core.exceptions import APIException
+from ...models.database.redis_model import RedisKeyspaceReport
+from ...utils.job_util import BackgroundJobRunner, JobStatus, is_process_alive
+from .connection_registry import redis_pool_registry
+
+
+class PrefixStats:
+    """单个前缀的聚合统计（内存分位数基于蓄水池抽样，内存占用有上限）"""
+
+    RESERVOIR_SIZE = 2000
+
+    def __init__(self):
+        self.count = 0
+        self.memory = 0
+        self.types = {}
+        self.ttl = {}
+        self._sizes = []
+
+    def add(self, key_type, memory, ttl_bucket):
+        self.count += 1
+        self.memory += memory
+        self.types[key_type] = self.types.get(key_type, 0) + 1
+        self.ttl[ttl_bucket] = self.ttl.get(ttl_bucket, 0) + 1
+        if len(self._sizes) < self.RESERVOIR_SIZE:
+            self._sizes.append(memory)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.RESERVOIR_SIZE:
+                self._sizes[slot] = memory
+
+    def to_dict(self, scale=1.0):
+        sizes = sorted(self._sizes)
+        return {
+            'count': self.count,
+            'memory': self.memory,
+            'estimated_count': int(round(self.count * scale)),
+            'estimated_memory': int(round(self.memory * scale)),
+            'avg_memory': round(self.memory / self.count, 1) if self.count else 0,
+            'p50_memory': RedisKeyspaceAnalyzer.percentile(sizes, 50),
+            'p90_memory': RedisKeyspaceAnalyzer.percentile(sizes, 90),
+            'p99_memory': RedisKeyspaceAnalyzer.percentile(sizes, 99),
+            'max_memory': sizes[-1] if sizes else 0,
+            'types': self.types,
+            'ttl_distribution': self.ttl
+        }
+
+
+class RedisKeyspaceAnalyzer:
+    """
+    Redis 键空间分析服务
+    - scan 模式用 SCAN 遍历匹配的全部 key；sample 模式对 * 使用 RANDOMKEY 抽样，其他模式扫描到样本数量为止，
+      计数和内存按 DBSIZE / 样本数推算
+    - 每批 key 通过一次非事务 pipeline 获取 TYPE、MEMORY USAGE、TTL，批次之间休眠 batch_interval 秒，避免影响线上延迟
+    - 按分隔符切分的前缀聚合数量、内存合计与分位数、TTL 分布，并记录内存最大的 top_n 个 key
+    - 分析任务与结果保存在 redis_keyspace_reports 表中，多个 worker 进程都可以查询进度、取消和对比历史报告
+    """
+
+    DEFAULT_BATCH_SIZE = 500
+    DEFAULT_BATCH_INTERVAL = 0.05
+    DEFAULT_TOP_N = 50
+    MAX_TOP_N = 500
+    MAX_PREFIXES = 2000
+    OTHER_PREFIX = '(其他)'
+    NO_PREFIX = '(无前缀)'
+    # 进度写入数据库的最小间隔（秒）
+    PROGRESS_INTERVAL = 1.0
+    DEFAULT_LEASE_TIMEOUT = 120
+
+    TTL_BUCKETS = (
+        (3600, '<1h'),
+        (86400, '1h-1d'),
+        (7 * 86400, '1d-7d'),
+        (30 * 86400, '7d-30d')
+    )
+
+    def __init__(self):
+        self.runner = BackgroundJobRunner('redis-analyze', max_workers=2)
+        self.batch_size = self.DEFAULT_BATCH_SIZE
+        self.batch_interval = self.DEFAULT_BATCH_INTERVAL
+        self.lease_timeout = self.DEFAULT_LEASE_TIMEOUT
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('REDIS_ANALYZE_BATCH_SIZE', self.batch_size)
+        self.batch_interval = app.config.get('REDIS_ANALYZE_BATCH_INTERVAL', self.batch_interval)
+        self.lease_timeout = app.config.get('REDIS_ANALYZE_LEASE_TIMEOUT', self.lease_timeout)
+        self.runner.init_app(app, app.config.get('REDIS_ANALYZE_MAX_WORKERS'))
+
+    @property
+    def owner(self):
+        """当前进程标识，作为租约持有者"""
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def submit(self, connection_id, pattern='*', delimiter=':', prefix_depth=1, sample_size=None, top_n=None,
+               current_user=None):
+        """
+        提交键空间分析任务
+        :param delimiter: 前缀分隔符
+        :param prefix_depth: 取前几段作为前缀
+        :param sample_size: 抽样数量，为空时全量扫描
+        :param top_n: 记录内存最大的 key 数量
+        :return: 分析报告（任务状态）
+        """
+        pattern = pattern or '*'
+        delimiter = delimiter or ':'
+        prefix_depth = self._normalize_int(prefix_depth, 1, 'prefix_depth')
+        top_n = min(self._normalize_int(top_n, self.DEFAULT_TOP_N, 'top_n'), self.MAX_TOP_N)
+        sample_size = self._normalize_int(sample_size, None, 'sample_size')
+
+        # 提交前获取连接池，连接不存在或类型不对时直接返回错误
+        redis_pool_registry.acquire(connection_id)
+
+        report = RedisKeyspaceReport(
+            connection_id=connection_id,
+            status=JobStatus.QUEUED,
+            mode='sample' if sample_size else 'scan',
+            pattern=pattern,
+            delimiter=delimiter,
+            prefix_depth=prefix_depth,
+            sample_size=sample_size,
+            lease_owner=self.owner,
+            lease_expires_at=self._lease_deadline(),
+            created_by=current_user.id if current_user else None
+        )
+        db.session.add(report)
+        db.session.commit()
+
+        self.runner.submit(self._run, report.id, top_n)
+        return report.to_dict()
+
+    def get_report(self, report_id):
+        report = RedisKeyspaceReport.query.filter_by(id=report_id, is_active=True).first()
+        if not report:
+            raise APIException('分析报告不存在', 404)
+        self._expire_stale([report])
+        return report
+
+    def list_reports(self, connection_id, limit=20):
+        """按时间倒序列出连接的历史分析报告（不含明细）"""
+        reports = (RedisKeyspaceReport.query
+                   .filter_by(connection_id=connection_id, is_active=True)
+                   .order_by(RedisKeyspaceReport.created_at.desc())
+                   .limit(limit)
+                   .all())
+        self._expire_stale(reports)
+        return [report.to_dict(include_summary=False) for report in reports]
+
+    def cancel(self, report_id):
+        """请求取消分析任务，执行任务的进程在下一批次时停止"""
+        report = self.get_report(report_id)
+        if report.status not in JobStatus.FINAL_STATUSES:
+            report.cancel_requested = True
+            db.session.commit()
+        return report.to_dict(include_summary=False)
+
+    def compare(self, report_id, base_report_id):
+        """对比两次分析结果，按前缀返回数量与内存变化（抽样报告使用推算值）"""
+        report = self.get_report(report_id)
+        base = self.get_report(base_report_id)
+        if report.status != JobStatus.FINISHED or base.status != JobStatus.FINISHED:
+            raise APIException('只能对比已完成的分析报告', 409)
+
+        current_prefixes = json.loads(report.summary or '{}').get('prefixes', {})
+        base_prefixes = json.loads(base.summary or '{}').get('prefixes', {})
+        rows = []
+        for prefix in set(current_prefixes) | set(base_prefixes):
+            cur = current_prefixes.get(prefix, {})
+            old = base_prefixes.get(prefix, {})
+            rows.append({
+                'prefix': prefix,
+                'count': cur.get('estimated_count', 0),
+                'base_count': old.get('estimated_count', 0),
+                'count_delta': cur.get('estimated_count', 0) - old.get('estimated_count', 0),
+                'memory': cur.get('estimated_memory', 0),
+                'base_memory': old.get('estimated_memory', 0),
+                'memory_delta': cur.get('estimated_memory', 0) - old.get('estimated_memory', 0)
+            })
+        rows.sort(key=lambda row: abs(row['memory_delta']), reverse=True)
+        return {
+            'report_id': report.id,
+            'base_report_id': base.id,
+            'total_memory_delta': (report.estimated_total_memory or 0) - (base.estimated_total_memory or 0),
+            'prefixes': rows
+        }
+
+    def _run(self, report_id, top_n):
+        """在后台线程中执行分析"""
+        report = db.session.get(RedisKeyspaceReport, report_id)
+        if report is None or report.status in JobStatus.FINAL_STATUSES:
+            return
+        if report.cancel_requested:
+            self._finish(report, JobStatus.CANCELLED)
+            return
+
+        start_time = time.time()
+        report.status = JobStatus.RUNNING
+        report.started_at = datetime.now(tz_beijing)
+        report.lease_owner = self.owner
+        report.lease_expires_at = self._lease_deadline()
+        db.session.commit()
+
+        prefixes = {}
+        ttl_distribution = {}
+        types = {}
+        top_keys = []
+        scanned = 0
+        total_memory = 0
+        last_progress = time.time()
+
+        try:
+            client = redis_pool_registry.client(report.connection_id)
+            report.db_size = client.dbsize()
+            db.session.commit()
+
+            for keys in self._iter_key_batches(client, report):
+                for key, key_type, memory, ttl in self._inspect_batch(client, keys):
+                    ttl_bucket = self._ttl_bucket(ttl)
+                    prefix = self._prefix(key, report.delimiter, report.prefix_depth)
+                    if prefix not in prefixes and len(prefixes) >= self.MAX_PREFIXES:
+                        prefix = self.OTHER_PREFIX
+                    prefixes.setdefault(prefix, PrefixStats()).add(key_type, memory, ttl_bucket)
+                    ttl_distribution[ttl_bucket] = ttl_distribution.get(ttl_bucket, 0) + 1
+                    types[key_type] = types.get(key_type, 0) + 1
+                    entry = (memory, key, key_type, ttl)
+                    if len(top_keys) < top_n:
+                        heapq.heappush(top_keys, entry)
+                    elif memory > top_keys[0][0]:
+                        heapq.heapreplace(top_keys, entry)
+                    scanned += 1
+                    total_memory += memory
+
+                if time.time() - last_progress >= self.PROGRESS_INTERVAL:
+                    last_progress = time.time()
+                    report.scanned_keys = scanned
+                    report.total_memory = total_memory
+                    db.session.commit()
+                    self._renew_leases()
+                    db.session.refresh(report)
+                    if report.status in JobStatus.FINAL_STATUSES:
+                        # 租约曾过期已被标记为失败，不再继续执行
+                        return
+                    if report.cancel_requested:
+                        report.duration = round(time.time() - start_time, 3)
+                        self._finish(report, JobStatus.CANCELLED)
+                        return
+
+                if self.batch_interval:
+                    time.sleep(self.batch_interval)
+        except Exception as e:
+            db.session.rollback()
+            report.scanned_keys = scanned
+            report.duration = round(time.time() - start_time, 3)
+            report.error_message = str(e)
+            self._finish(report, JobStatus.FAILED)
+            return
+
+        # 抽样时按 DBSIZE / 样本数推算整体数量和内存（指定 pattern 时只能代表扫描到的部分）
+        scale = 1.0
+        if report.mode == 'sample' and scanned and report.pattern == '*' and report.db_size:
+            scale = report.db_size / scanned
+
+        try:
+            report.scanned_keys = scanned
+            report.total_memory = total_memory
+            report.estimated_total_memory = int(round(total_memory * scale))
+            report.duration = round(time.time() - start_time, 3)
+            report.summary = json.dumps({
+                'scale': round(scale, 4),
+                'types': types,
+                'ttl_distribution': ttl_distribution,
+                'prefixes': {prefix: stats.to_dict(scale) for prefix, stats in
+                             sorted(prefixes.items(), key=lambda item: item[1].memory, reverse=True)},
+                'top_keys': [{'key': key, 'type': key_type, 'memory': memory, 'ttl': ttl}
+                             for memory, key, key_type, ttl in sorted(top_keys, reverse=True)]
+            }, ensure_ascii=False)
+            self._finish(report, JobStatus.FINISHED)
+        except Exception as e:
+            # 保存结果失败时报告标记为失败，避免一直停留在执行中
+            db.session.rollback()
+            report = db.session.get(RedisKeyspaceReport, report_id)
+            report.scanned_keys = scanned
+            report.duration = round(time.time() - start_time, 3)
+            report.error_message = f'保存分析结果失败: {str(e)}'
+            self._finish(report, JobStatus.FAILED)
+
+    def _iter_key_batches(self, client, report):
+        """按批返回待分析的 key"""
+        if report.mode == 'sample' and report.pattern == '*':
+            # RANDOMKEY 抽样（有放回，重复的 key 只统计一次）
+            seen = set()
+            attempts = 0
+            max_attempts = report.sample_size * 3
+            while len(seen) < report.sample_size and attempts < max_attempts:
+                size = min(self.batch_size, report.sample_size - len(seen))
+                pipe = client.pipeline(transaction=False)
+                for _ in range(size):
+                    pipe.randomkey()
+                batch = []
+                for key in pipe.execute():
+                    if key is not None and key not in seen:
+                        seen.add(key)
+                        batch.append(key)
+                attempts += size
+                if not batch and client.dbsize() == 0:
+                    return
+                if batch:
+                    yield batch
+            return
+
+        limit = report.sample_size if report.mode == 'sample' else None
+        count = 0
+        cursor = 0
+        while True:
+            cursor, keys = client.scan(cursor=cursor, match=report.pattern, count=self.batch_size)
+            if limit is not None:
+                keys = keys[:limit - count]
+            if keys:
+                count += len(keys)
+                yield keys
+            if cursor == 0 or (limit is not None and count >= limit):
+                return
+
+    @staticmethod
+    def _inspect_batch(client, keys):
+        """一次 pipeline 获取一批 key 的 TYPE、MEMORY USAGE、TTL，已过期或删除的 key 被跳过"""
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.memory_usage(key)
+            pipe.ttl(key)
+        results = pipe.execute(raise_on_error=False)
+        for index, key in enumerate(keys):
+            key_type, memory, ttl = results[index * 3:index * 3 + 3]
+            if isinstance(key_type, Exception):
+                continue
+            key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else str(key_type)
+            if key_type == 'none':
+                continue
+            memory = memory if isinstance(memory, int) else 0
+            ttl = ttl if isinstance(ttl, int) else None
+            key = key.decode('utf-8', errors='replace') if isinstance(key, bytes) else str(key)
+            yield key, key_type, memory, ttl
+
+    @classmethod
+    def _ttl_bucket(cls, ttl):
+        if ttl is None or ttl < 0:
+            return 'no_expire'
+        for limit, name in cls.TTL_BUCKETS:
+            if ttl < limit:
+                return name
+        return '>30d'
+
+    @classmethod
+    def _prefix(cls, key, delimiter, depth):
+        parts = key.split(delimiter)
+        if len(parts) <= 1:
+            return cls.NO_PREFIX
+        return delimiter.join(parts[:min(depth, len(parts) - 1)])
+
+    @staticmethod
+    def percentile(sorted_values, percent):
+        if not sorted_values:
+            return 0
+        index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+        return sorted_values[index]
+
+    def _finish(self, report, status):
+        """结束任务；租约已过期被标记为失败的报告（不再由当前进程持有）不会被改回"""
+        db.session.commit()
+        db.session.execute(
+            update(RedisKeyspaceReport)
+            .where(RedisKeyspaceReport.id == report.id,
+                   RedisKeyspaceReport.status.in_((JobStatus.QUEUED, JobStatus.RUNNING)),
+                   RedisKeyspaceReport.lease_owner == self.owner)
+            .values(status=status, finished_at=self._now(), lease_expires_at=None)
+        )
+        db.session.commit()
+
+    def _renew_leases(self):
+        """续约当前进程持有的排队中和执行中的报告（排队的报告在同一线程池中等待当前任务）"""
+        db.session.execute(
+            update(RedisKeyspaceReport)
+            .where(RedisKeyspaceReport.status.in_((JobStatus.QUEUED, JobStatus.RUNNING)),
+                   RedisKeyspaceReport.lease_owner == self.owner)
+            .values(lease_expires_at=self._lease_deadline())
+        )
+        db.session.commit()
+
+    def _expire_stale(self, reports):
+        """
+        未结束的报告在租约过期或执行进程（同一主机）已退出时标记为失败，
+        避免 worker 重启后报告一直停留在排队中/执行中
+        """
+        now = self._now()
+        hostname = socket.gethostname()
+        stale = []
+        for report in reports:
+            if report.status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+                continue
+            host, _, pid = (report.lease_owner or '').rpartition(':')
+            if report.lease_expires_at is not None and report.lease_expires_at < now:
+                stale.append(report)
+            elif host == hostname and pid and not is_process_alive(pid):
+                stale.append(report)
+            elif report.lease_owner is None and report.status == JobStatus.RUNNING:
+                # 升级前启动的任务没有租约，按开始时间判断
+                started_at = report.started_at.replace(tzinfo=None) if report.started_at else None
+                if started_at is None or started_at + timedelta(seconds=self.lease_timeout) < now:
+                    stale.append(report)
+        if not stale:
+            return
+        for report in stale:
+            # 只有读取之后没有被续约或结束的报告才会被标记
+            db.session.execute(
+                update(RedisKeyspaceReport)
+                .where(RedisKeyspaceReport.id == report.id, RedisKeyspaceReport.status == report.status,
+                       db.or_(RedisKeyspaceReport.lease_expires_at.is_(None),
+                              RedisKeyspaceReport.lease_expires_at == report.lease_expires_at))
+                .values(status=JobStatus.FAILED, finished_at=now, lease_owner=None, lease_expires_at=None,
+                        error_message='执行分析的进程已退出，任务中断')
+            )
+        db.session.commit()
+        for report in stale:
+            db.session.refresh(report)
+
+    def _lease_deadline(self):
+        return self._now() + timedelta(seconds=self.lease_timeout)
+
+    @staticmethod
+    def _now():
+        # 与 BaseModel 时间字段一致使用北京时间，去掉时区后用于数据库比较
+        return datetime.now(tz_beijing).replace(tzinfo=None)
+
+    @staticmethod
+    def _normalize_int(value, default, name):
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise APIException(f'{name} 必须为整数', 400)
+        if value <= 0:
+            raise APIException(f'{name} 必须大于0', 400)
+        return value
+
+
+# 全局服务实例
+redis_keyspace_analyzer = RedisKeyspaceAnalyzer()
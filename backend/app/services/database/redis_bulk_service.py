@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Redis 批量操作服务（按模式删除、设置/移除过期时间、重命名前缀，后台执行并限速）
+"""
+
+import re
+import time
+from datetime import datetime
+
+from ...core.exceptions import APIException
+from ...utils.job_util import BackgroundJobRunner, FileJobStore, JobStatus
+from .connection_registry import redis_pool_registry
+
+
+class RedisBulkOperationService:
+    """
+    Redis 批量操作服务
+    - SCAN 按批读取匹配的 key，每批通过一次非事务 pipeline 执行 UNLINK / EXPIRE / PERSIST / RENAMENX，
+      key 不需要全部拉取到平台
+    - 重命名前缀使用 RENAMENX，目标 key 已存在时不覆盖，计入 conflicts
+    - dry_run 只统计匹配数量（重命名前缀时同时统计已存在的目标 key 数量），不修改数据
+    - rate_limit 限制每秒处理的 key 数量，避免影响线上实例
+    - 进度（扫描/处理数量、吞吐量、当前游标）写入任务状态文件，任意 worker 进程都可以查询和取消
+    """
+
+    OPERATION_DELETE = 'delete'
+    OPERATION_EXPIRE = 'expire'
+    OPERATION_PERSIST = 'persist'
+    OPERATION_RENAME_PREFIX = 'rename_prefix'
+    OPERATIONS = (OPERATION_DELETE, OPERATION_EXPIRE, OPERATION_PERSIST, OPERATION_RENAME_PREFIX)
+
+    DEFAULT_BATCH_SIZE = 500
+    MAX_BATCH_SIZE = 5000
+    # 进度写入的最小间隔（秒）
+    PROGRESS_INTERVAL = 1.0
+    GLOB_SPECIAL = re.compile(r'([*?\[\]\\])')
+
+    def __init__(self):
+        self.store = FileJobStore('redis_bulk', ttl=86400)
+        self.runner = BackgroundJobRunner('redis-bulk', max_workers=2)
+        self.default_rate_limit = 0
+
+    def init_app(self, app):
+        self.store.ttl = app.config.get('REDIS_BULK_RESULT_TTL', self.store.ttl)
+        self.default_rate_limit = app.config.get('REDIS_BULK_DEFAULT_RATE_LIMIT', self.default_rate_limit)
+        self.runner.init_app(app, app.config.get('REDIS_BULK_MAX_WORKERS'))
+
+    def submit(self, connection_id, operation, pattern=None, ttl=None, prefix=None, new_prefix=None,
+               dry_run=False, rate_limit=None, batch_size=None, current_user=None):
+        """
+        提交批量操作任务
+        :param operation: delete、expire、persist 或 rename_prefix
+        :param pattern: key 匹配模式（rename_prefix 使用 prefix 生成）
+        :param ttl: expire 操作的过期秒数
+        :param prefix: rename_prefix 操作的原前缀
+        :param new_prefix: rename_prefix 操作的新前缀
+        :param dry_run: 只统计匹配数量
+        :param rate_limit: 每秒最多处理的 key 数量，0 表示不限速
+        :return: 任务状态
+        """
+        if operation not in self.OPERATIONS:
+            raise APIException(f'不支持的操作: {operation}', 400)
+
+        if operation == self.OPERATION_RENAME_PREFIX:
+            if not prefix or new_prefix is None:
+                raise APIException('重命名前缀需要提供 prefix 和 new_prefix', 400)
+            if new_prefix.startswith(prefix) or prefix.startswith(new_prefix):
+                # 两个前缀互为前缀时，重命名后的 key 可能再次被 SCAN 匹配到并被重复重命名
+                # （如 prefix=a:b:、new_prefix=a: 时 a:b:b:1 -> a:b:1 -> a:1）
+                raise APIException('prefix 和 new_prefix 不能互为前缀（new_prefix 也不能为空）', 400)
+            pattern = self.GLOB_SPECIAL.sub(r'\\\1', prefix) + '*'
+        elif not pattern:
+            raise APIException('请提供 key 匹配模式', 400)
+
+        if operation == self.OPERATION_DELETE and pattern.strip('*') == '' and not dry_run:
+            raise APIException('出于安全考虑，不允许按 * 删除全部 key，请使用更具体的匹配模式', 403)
+        if operation == self.OPERATION_EXPIRE:
+            ttl = self._normalize_int(ttl, None, 'ttl')
+            if ttl is None:
+                raise APIException('设置过期时间需要提供 ttl', 400)
+
+        batch_size = min(self._normalize_int(batch_size, self.DEFAULT_BATCH_SIZE, 'batch_size'), self.MAX_BATCH_SIZE)
+        rate_limit = self._normalize_int(rate_limit, self.default_rate_limit, 'rate_limit', allow_zero=True)
+
+        # 提交前获取连接池，连接不存在或类型不对时直接返回错误
+        redis_pool_registry.acquire(connection_id)
+
+        self.store.cleanup()
+        job = self.store.create({
+            'connection_id': connection_id,
+            'operation': operation,
+            'pattern': pattern,
+            'ttl': ttl,
+            'prefix': prefix,
+            'new_prefix': new_prefix,
+            'dry_run': bool(dry_run),
+            'rate_limit': rate_limit,
+            'batch_size': batch_size,
+            'cursor': 0,
+            'scanned': 0,
+            'affected': 0,
+            'conflicts': 0,
+            'batches': 0,
+            'elapsed': 0,
+            'throughput': 0,
+            'created_by': current_user.id if current_user else None
+        })
+        self.runner.submit_job(self.store, job['job_id'], self._run)
+        return job
+
+    def get_job(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('批量操作任务不存在或已过期', 404)
+        return job
+
+    def list_jobs(self, connection_id):
+        return [job for job in self.store.list() if job.get('connection_id') == connection_id]
+
+    def cancel(self, job_id):
+        job = self.get_job(job_id)
+        if job['status'] not in JobStatus.FINAL_STATUSES:
+            self.store.request_cancel(job_id)
+        return self.store.load(job_id)
+
+    def _run(self, job_id):
+        """在后台线程中执行批量操作"""
+        job = self.store.load(job_id)
+        if self.store.is_cancel_requested(job_id):
+            self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat())
+            return
+
+        start_time = time.time()
+        self.store.update(job_id, status=JobStatus.RUNNING, started_at=datetime.now().isoformat())
+        progress = {'cursor': 0, 'scanned': 0, 'affected': 0, 'conflicts': 0, 'batches': 0}
+        last_progress = time.time()
+
+        def _progress_fields():
+            elapsed = time.time() - start_time
+            return dict(progress, elapsed=round(elapsed, 3),
+                        throughput=round(progress['scanned'] / elapsed, 1) if elapsed > 0 else 0)
+
+        try:
+            client = redis_pool_registry.client(job['connection_id'])
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor=cursor, match=job['pattern'], count=job['batch_size'])
+                progress['cursor'] = cursor
+                if keys:
+                    progress['scanned'] += len(keys)
+                    progress['batches'] += 1
+                    if job['dry_run']:
+                        if job['operation'] == self.OPERATION_RENAME_PREFIX:
+                            progress['conflicts'] += self._count_existing_targets(client, job, keys)
+                    else:
+                        affected, conflicts = self._apply(client, job, keys)
+                        progress['affected'] += affected
+                        progress['conflicts'] += conflicts
+                    self._throttle(start_time, progress['scanned'], job['rate_limit'])
+
+                if cursor == 0:
+                    break
+                if time.time() - last_progress >= self.PROGRESS_INTERVAL:
+                    last_progress = time.time()
+                    if self.store.is_cancel_requested(job_id):
+                        self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat(),
+                                          **_progress_fields())
+                        return
+                    self.store.update(job_id, **_progress_fields())
+        except Exception as e:
+            self.store.update(job_id, status=JobStatus.FAILED, error=str(e), finished_at=datetime.now().isoformat(),
+                              **_progress_fields())
+            return
+
+        self.store.update(job_id, status=JobStatus.FINISHED, finished_at=datetime.now().isoformat(),
+                          **_progress_fields())
+
+    @staticmethod
+    def _target_key(job, key):
+        prefix = job['prefix'].encode('utf-8')
+        return job['new_prefix'].encode('utf-8') + key[len(prefix):]
+
+    def _count_existing_targets(self, client, job, keys):
+        """重命名前缀试运行：统计已存在的目标 key 数量"""
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(self._target_key(job, key))
+        return sum(int(result) for result in pipe.execute(raise_on_error=False) if not isinstance(result, Exception))
+
+    def _apply(self, client, job, keys):
+        """通过一次 pipeline 对一批 key 执行操作，返回 (成功处理的数量, 目标 key 已存在的数量)"""
+        pipe = client.pipeline(transaction=False)
+        operation = job['operation']
+        for key in keys:
+            if operation == self.OPERATION_DELETE:
+                pipe.unlink(key)
+            elif operation == self.OPERATION_EXPIRE:
+                pipe.expire(key, job['ttl'])
+            elif operation == self.OPERATION_PERSIST:
+                pipe.persist(key)
+            else:
+                # RENAMENX 不覆盖已存在的目标 key
+                pipe.renamenx(key, self._target_key(job, key))
+
+        affected = 0
+        conflicts = 0
+        for result in pipe.execute(raise_on_error=False):
+            # UNLINK 返回删除数量，EXPIRE/PERSIST 返回布尔值，RENAMENX 成功返回 True、目标已存在返回 False；
+            # key 已被删除时返回 0 或错误
+            if isinstance(result, Exception):
+                continue
+            if operation == self.OPERATION_RENAME_PREFIX and not result:
+                conflicts += 1
+                continue
+            affected += int(result)
+        return affected, conflicts
+
+    @staticmethod
+    def _throttle(start_time, processed, rate_limit):
+        """按每秒处理数量限速：处理进度超前于限额时休眠"""
+        if not rate_limit:
+            return
+        ahead = processed / rate_limit - (time.time() - start_time)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    @staticmethod
+    def _normalize_int(value, default, name, allow_zero=False):
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise APIException(f'{name} 必须为整数', 400)
+        if value < 0 or (value == 0 and not allow_zero):
+            raise APIException(f'{name} 必须大于0', 400)
+        return value
+
+
+# 全局服务实例
+redis_bulk_service = RedisBulkOperationService()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Redis key 数量统计服务（抽样估算 + 后台精确统计，结果按连接和模式缓存）
+"""
+
+import hashlib
+import math
+import os
+import re
+import time
+from datetime import datetime
+
+from ...core.exceptions import APIException
+from ...utils.job_util import BackgroundJobRunner, FileJobStore, JobStatus
+from .connection_registry import redis_pool_registry
+
+
+class RedisKeyCountService:
+    """
+    Redis key 数量统计服务
+    - pattern 为 * 时直接返回 DBSIZE
+    - 估算：通过 pipeline 批量执行 RANDOMKEY 抽样，计算匹配比例后按 DBSIZE 推算，并给出 Wilson 置信区间
+    - 精确统计：在后台任务中 SCAN 全部 key，任务 ID 由连接ID和模式决定，
+      同一模式的统计结果在 REDIS_KEY_COUNT_CACHE_TTL 秒内直接复用，正在执行的任务不会重复提交
+    """
+
+    DEFAULT_SAMPLE_SIZE = 1000
+    MAX_SAMPLE_SIZE = 10000
+    SAMPLE_BATCH_SIZE = 500
+    SCAN_COUNT = 1000
+    # 精确统计时写入进度的 SCAN 次数间隔
+    PROGRESS_INTERVAL = 50
+    # 95% 置信水平对应的 z 值
+    Z_95 = 1.96
+
+    def __init__(self):
+        self.store = FileJobStore('redis_key_count', ttl=600)
+        self.runner = BackgroundJobRunner('redis-key-count', max_workers=2)
+        self.sample_size = self.DEFAULT_SAMPLE_SIZE
+
+    def init_app(self, app):
+        self.store.ttl = app.config.get('REDIS_KEY_COUNT_CACHE_TTL', self.store.ttl)
+        self.sample_size = app.config.get('REDIS_KEY_COUNT_SAMPLE_SIZE', self.sample_size)
+        self.runner.init_app(app, app.config.get('REDIS_KEY_COUNT_MAX_WORKERS'))
+
+    def count(self, connection_id, pattern='*', mode='estimate', sample_size=None):
+        """
+        统计匹配模式的 key 数量
+        :param mode: estimate（抽样估算，默认）或 exact（提交后台精确统计任务）
+        :return: (结果, 是否已得到结果)；exact 模式任务未完成时返回任务状态
+        """
+        pattern = pattern or '*'
+        if mode not in ('estimate', 'exact'):
+            raise APIException('不支持的统计方式，仅支持 estimate 或 exact', 400)
+
+        client = redis_pool_registry.client(connection_id)
+        if pattern == '*':
+            return {'count': client.dbsize(), 'pattern': pattern, 'estimated': False, 'method': 'dbsize'}, True
+
+        job = self._load_fresh_job(connection_id, pattern)
+        if job and job['status'] == JobStatus.FINISHED:
+            return self._job_result(job), True
+
+        if mode == 'exact':
+            if job is None or job['status'] in JobStatus.FINAL_STATUSES:
+                job = self._submit(connection_id, pattern)
+            return job, False
+
+        result = self._estimate(client, pattern, sample_size)
+        result['exact_job'] = job
+        return result, True
+
+    def get_job(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('统计任务不存在或结果已过期', 404)
+        return job
+
+    def cancel(self, job_id):
+        job = self.get_job(job_id)
+        if job['status'] not in JobStatus.FINAL_STATUSES:
+            self.store.request_cancel(job_id)
+        return self.store.load(job_id)
+
+    def _estimate(self, client, pattern, sample_size=None):
+        """RANDOMKEY 抽样估算匹配数量（RANDOMKEY 按哈希槽随机，近似均匀抽样）"""
+        try:
+            sample_size = int(sample_size or self.sample_size)
+        except (TypeError, ValueError):
+            raise APIException('sample_size 必须为整数', 400)
+        sample_size = max(1, min(sample_size, self.MAX_SAMPLE_SIZE))
+
+        db_size = client.dbsize()
+        matcher = self.compile_pattern(pattern)
+        matched = 0
+        sampled = 0
+        if db_size:
+            while sampled < sample_size:
+                pipe = client.pipeline(transaction=False)
+                for _ in range(min(self.SAMPLE_BATCH_SIZE, sample_size - sampled)):
+                    pipe.randomkey()
+                for key in pipe.execute():
+                    if key is None:
+                        continue
+                    sampled += 1
+                    key = key.decode('utf-8', errors='replace') if isinstance(key, bytes) else str(key)
+                    if matcher.fullmatch(key):
+                        matched += 1
+                if not sampled:
+                    break
+
+        low, high = self._wilson_interval(matched, sampled)
+        return {
+            'count': int(round(matched / sampled * db_size)) if sampled else 0,
+            'pattern': pattern,
+            'estimated': True,
+            'method': 'sample',
+            'db_size': db_size,
+            'sample_size': sampled,
+            'matched': matched,
+            'confidence': 0.95,
+            'confidence_interval': [int(math.floor(low * db_size)), int(math.ceil(high * db_size))]
+        }
+
+    @staticmethod
+    def compile_pattern(pattern):
+        """
+        按 Redis 的 glob 规则（与 SCAN MATCH 一致）将模式转换为正则表达式：
+        * 任意字符串，? 任意单个字符，[abc] / [a-z] 字符集合，[^a] 取反，\\x 转义
+        """
+        parts = []
+        index = 0
+        length = len(pattern)
+        while index < length:
+            char = pattern[index]
+            if char == '*':
+                parts.append('.*')
+            elif char == '?':
+                parts.append('.')
+            elif char == '\\' and index + 1 < length:
+                index += 1
+                parts.append(re.escape(pattern[index]))
+            elif char == '[':
+                index += 1
+                negate = index < length and pattern[index] == '^'
+                if negate:
+                    index += 1
+                items = []
+                while index < length and pattern[index] != ']':
+                    if pattern[index] == '\\' and index + 1 < length:
+                        index += 1
+                        items.append(re.escape(pattern[index]))
+                    elif index + 2 < length and pattern[index + 1] == '-' and pattern[index + 2] != ']':
+                        start, end = sorted((pattern[index], pattern[index + 2]))
+                        items.append(f'{re.escape(start)}-{re.escape(end)}')
+                        index += 2
+                    else:
+                        items.append(re.escape(pattern[index]))
+                    index += 1
+                if items:
+                    parts.append(f'[{"^" if negate else ""}{"".join(items)}]')
+                else:
+                    # 空集合：[] 不匹配任何字符，[^] 匹配任意单个字符
+                    parts.append('.' if negate else '(?!)')
+            else:
+                parts.append(re.escape(char))
+            index += 1
+        return re.compile(''.join(parts), re.DOTALL)
+
+    @classmethod
+    def _wilson_interval(cls, matched, sampled):
+        """匹配比例的 Wilson 置信区间（样本中匹配数为 0 或很小时仍给出合理的上界）"""
+        if not sampled:
+            return 0.0, 1.0
+        z = cls.Z_95
+        p = matched / sampled
+        denominator = 1 + z * z / sampled
+        center = (p + z * z / (2 * sampled)) / denominator
+        margin = z * math.sqrt(p * (1 - p) / sampled + z * z / (4 * sampled * sampled)) / denominator
+        return max(0.0, center - margin), min(1.0, center + margin)
+
+    @staticmethod
+    def _job_id(connection_id, pattern):
+        return hashlib.sha1(f'{connection_id}|{pattern}'.encode('utf-8')).hexdigest()
+
+    def _load_fresh_job(self, connection_id, pattern):
+        """
+        读取该模式的统计任务，已结束且超过缓存时间的视为不存在
+        执行进程已退出的任务在读取时被标记为失败（见 FileJobStore.load），精确统计时会重新提交
+        """
+        job = self.store.load(self._job_id(connection_id, pattern))
+        if job is None:
+            return None
+        if job['status'] in JobStatus.FINAL_STATUSES:
+            finished_at = job.get('finished_at')
+            if not finished_at or (datetime.now() - datetime.fromisoformat(finished_at)).total_seconds() > self.store.ttl:
+                return None
+        return job
+
+    @staticmethod
+    def _job_result(job):
+        return {
+            'count': job['count'],
+            'pattern': job['pattern'],
+            'estimated': False,
+            'method': 'scan',
+            'cached': True,
+            'counted_at': job['finished_at'],
+            'job_id': job['job_id']
+        }
+
+    def _submit(self, connection_id, pattern):
+        self.store.cleanup()
+        job_id = self._job_id(connection_id, pattern)
+        # 任务ID固定，重新统计前清除上一次任务的取消标记
+        try:
+            os.remove(os.path.join(self.store.job_dir(job_id), FileJobStore.CANCEL_FILE))
+        except OSError:
+            pass
+        job = self.store.create({
+            'connection_id': connection_id,
+            'pattern': pattern,
+            'count': 0,
+            'scan_calls': 0
+        }, job_id=job_id)
+        self.runner.submit_job(self.store, job_id, self._run)
+        return job
+
+    def _run(self, job_id):
+        """在后台线程中 SCAN 统计匹配的 key 数量"""
+        job = self.store.load(job_id)
+        start_time = time.time()
+        self.store.update(job_id, status=JobStatus.RUNNING, started_at=datetime.now().isoformat())
+        count = 0
+        calls = 0
+        try:
+            client = redis_pool_registry.client(job['connection_id'])
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor=cursor, match=job['pattern'], count=self.SCAN_COUNT)
+                count += len(keys)
+                calls += 1
+                if cursor == 0:
+                    break
+                if calls % self.PROGRESS_INTERVAL == 0:
+                    if self.store.is_cancel_requested(job_id):
+                        self.store.update(job_id, status=JobStatus.CANCELLED, count=count, scan_calls=calls,
+                                          finished_at=datetime.now().isoformat())
+                        return
+                    self.store.update(job_id, count=count, scan_calls=calls)
+        except Exception as e:
+            self.store.update(job_id, status=JobStatus.FAILED, error=str(e), count=count, scan_calls=calls,
+                              finished_at=datetime.now().isoformat())
+            return
+
+        self.store.update(job_id, status=JobStatus.FINISHED, count=count, scan_calls=calls,
+                          duration=round(time.time() - start_time, 3), finished_at=datetime.now().isoformat())
+
+
+# 全局服务实例
+redis_key_count_service = RedisKeyCountService()
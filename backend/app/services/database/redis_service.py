@@ -11,66 +11,19 @@ import redis
 from typing import List, Dict, Any, Optional
 
 from ...core.exceptions import APIException
-from ...models.database.database_conn_model import DatabaseConnection
+from .connection_registry import redis_pool_registry
+from .redis_key_count_service import redis_key_count_service
 
 
 class RedisService:
     """Redis 数据库服务类"""
     
-    def __init__(self):
-        self.connection_pool = {}
-    
-    def _get_connection_key(self, connection_id):
-        """获取连接池的键"""
-        return f"redis_{connection_id}"
-    
     def _get_redis_client(self, connection_id):
-        """获取或创建 Redis 连接"""
-        connection_key = self._get_connection_key(connection_id)
-        
-        # 检查连接池中是否已有连接
-        if connection_key in self.connection_pool:
-            try:
-                client = self.connection_pool[connection_key]
-                client.ping()
-                return client
-            except Exception:
-                # 连接无效，从池中移除
-                del self.connection_pool[connection_key]
-        
-        # 获取数据库连接信息
-        db_conn = DatabaseConnection.query.filter_by(id=connection_id, is_active=True).first()
-        
-        if not db_conn:
-            raise APIException('数据库连接不存在或已被禁用', 404)
-        
-        if db_conn.driver.lower() != 'redis':
-            raise APIException('该连接不是 Redis 类型', 400)
-        
-        try:
-            # 构建 Redis 连接参数
-            redis_url = db_conn.get_connection_string()
-            
-            # 创建 Redis 客户端
-            client = redis.from_url(
-                redis_url,
-                decode_responses=False,  # 不自动解码，保持原始字节
-                socket_connect_timeout=5,
-                socket_timeout=5
-            )
-            
-            # 测试连接
-            client.ping()
-            
-            # 存储连接
-            self.connection_pool[connection_key] = client
-            
-            return client
-        
-        except ImportError:
-            raise APIException('Redis 连接失败: 请先安装 redis 库 (pip install redis)', 500)
-        except Exception as e:
-            raise APIException(f'Redis 连接失败: {str(e)}', 500)
+        """
+        获取 Redis 客户端（使用进程级共享连接池）
+        连接失效时由连接池在下次借出前检测并重连，无需每次调用前发送 PING
+        """
+        return redis_pool_registry.client(connection_id)
     
     def get_keys(self, connection_id, pattern='*', cursor=0, count=100):
         """获取 Redis keys（支持分页）"""
@@ -106,49 +59,140 @@ class RedisService:
         except Exception as e:
             raise APIException(f'获取 Redis keys 失败: {str(e)}', 500)
     
-    def get_key_info(self, connection_id, key: str):
-        """获取 key 的详细信息（类型、TTL、值等）"""
+    # 批量获取 key 元信息时一次最多处理的 key 数量
+    MAX_META_KEYS = 1000
+    
+    # 按类型返回长度的 Lua 脚本，使长度可以和 TYPE/TTL 等命令放在同一个 pipeline 中
+    LENGTH_SCRIPT = """
+local t = redis.call('TYPE', KEYS[1])['ok']
+if t == 'string' then return redis.call('STRLEN', KEYS[1])
+elseif t == 'list' then return redis.call('LLEN', KEYS[1])
+elseif t == 'set' then return redis.call('SCARD', KEYS[1])
+elseif t == 'zset' then return redis.call('ZCARD', KEYS[1])
+elseif t == 'hash' then return redis.call('HLEN', KEYS[1])
+elseif t == 'stream' then return redis.call('XLEN', KEYS[1])
+end
+return -1
+"""
+    
+    # 服务端禁用脚本时按类型使用的长度命令
+    LENGTH_COMMANDS = {
+        'string': 'STRLEN',
+        'list': 'LLEN',
+        'set': 'SCARD',
+        'zset': 'ZCARD',
+        'hash': 'HLEN',
+        'stream': 'XLEN'
+    }
+    
+    def _fetch_keys_meta(self, client, keys):
+        """
+        通过一次非事务 pipeline 获取多个 key 的类型、TTL、编码、长度和内存占用
+        长度脚本注册后在 pipeline 中以 EVALSHA 调用，不再每个 key 发送一次脚本内容；
+        不存在的 key 类型为 none；服务端不支持脚本时再用一次 pipeline 按类型补充长度
+        """
+        length_script = client.register_script(self.LENGTH_SCRIPT)
+        try:
+            results = self._execute_meta_pipeline(client, keys, length_script)
+        except redis.ResponseError:
+            # 服务端禁用脚本时 pipeline 执行前加载脚本失败，不带长度脚本重新获取
+            results = self._execute_meta_pipeline(client, keys, None)
+        
+        metas = []
+        for index, key in enumerate(keys):
+            key_type, ttl, encoding, memory, length = results[index * 5:index * 5 + 5]
+            key_type = self._decode(key_type) if not isinstance(key_type, Exception) else None
+            metas.append({
+                'key': key,
+                'exists': key_type not in (None, 'none'),
+                'type': key_type,
+                'ttl': ttl if not isinstance(ttl, Exception) else None,
+                'encoding': self._decode(encoding) if encoding is not None and not isinstance(encoding, Exception) else None,
+                'memory_usage': memory if not isinstance(memory, Exception) else None,
+                'length': length if not isinstance(length, Exception) and length != -1 else None
+            })
+        
+        missing = [meta for meta in metas if meta['length'] is None and meta['type'] in self.LENGTH_COMMANDS]
+        if missing:
+            pipe = client.pipeline(transaction=False)
+            for meta in missing:
+                pipe.execute_command(self.LENGTH_COMMANDS[meta['type']], meta['key'])
+            for meta, length in zip(missing, pipe.execute(raise_on_error=False)):
+                meta['length'] = length if not isinstance(length, Exception) else None
+        return metas
+    
+    @staticmethod
+    def _execute_meta_pipeline(client, keys, length_script):
+        """每个 key 依次返回 类型、TTL、编码、内存占用、长度（不使用长度脚本时长度为 None）"""
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+            pipe.ttl(key)
+            pipe.object('encoding', key)
+            pipe.memory_usage(key)
+            if length_script:
+                length_script(keys=[key], client=pipe)
+        results = pipe.execute(raise_on_error=False)
+        if length_script:
+            return results
+        padded = []
+        for index in range(len(keys)):
+            padded.extend(results[index * 4:index * 4 + 4])
+            padded.append(None)
+        return padded
+    
+    @staticmethod
+    def _decode(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+    
+    def get_keys_meta(self, connection_id, keys: List[str]):
+        """批量获取 key 的元信息（类型、TTL、编码、长度、内存占用），一次网络往返"""
+        if not keys:
+            raise APIException('请提供要查询的 keys', 400)
+        if len(keys) > self.MAX_META_KEYS:
+            raise APIException(f'一次最多查询 {self.MAX_META_KEYS} 个 key', 400)
+        try:
+            client = self._get_redis_client(connection_id)
+            metas = self._fetch_keys_meta(client, keys)
+            return {'keys': metas, 'count': len(metas)}
+        except APIException:
+            raise
+        except Exception as e:
+            raise APIException(f'获取 key 元信息失败: {str(e)}', 500)
+    
+    # 集合类值每页默认/最大读取的元素数量
+    DEFAULT_VALUE_PAGE_SIZE = 100
+    MAX_VALUE_PAGE_SIZE = 1000
+    
+    def get_key_info(self, connection_id, key: str, cursor=None, count=None):
+        """
+        获取 key 的详细信息（类型、TTL、值等）
+        类型、TTL、编码、长度通过一次 pipeline 获取，再按类型读取值；
+        集合类值按游标分页读取（HSCAN/SSCAN/ZSCAN、LRANGE/XRANGE 窗口），返回 next_cursor 用于读取下一页
+        :param cursor: 上一页返回的 next_cursor，为空时从头读取
+        :param count: 每页元素数量，默认 100，最大 1000
+        """
+        try:
+            count = max(1, min(int(count or self.DEFAULT_VALUE_PAGE_SIZE), self.MAX_VALUE_PAGE_SIZE))
+        except (TypeError, ValueError):
+            raise APIException('count 必须为整数', 400)
+        
         try:
             client = self._get_redis_client(connection_id)
             
-            # 检查 key 是否存在
-            if not client.exists(key):
+            meta = self._fetch_keys_meta(client, [key])[0]
+            if not meta['exists']:
                 raise APIException(f'Key "{key}" 不存在', 404)
             
-            # 获取 key 类型
-            key_type_raw = client.type(key)
-            key_type = key_type_raw.decode('utf-8') if isinstance(key_type_raw, bytes) else str(key_type_raw)
-            
-            # 获取 TTL
-            ttl = client.ttl(key)
+            key_type = meta['type']
+            size = meta['length'] or 0
             
             # 获取值（根据类型）
-            value = None
-            size = 0
-            
+            next_cursor = None
             if key_type == 'string':
                 value = client.get(key)
-                size = len(value) if value else 0
-            elif key_type == 'list':
-                length = client.llen(key)
-                value = client.lrange(key, 0, min(100, length - 1))  # 最多返回前100个元素
-                size = length
-            elif key_type == 'set':
-                length = client.scard(key)
-                value = list(client.smembers(key))[:100]  # 最多返回前100个元素
-                size = length
-            elif key_type == 'zset':
-                length = client.zcard(key)
-                value = client.zrange(key, 0, min(100, length - 1), withscores=True)  # 最多返回前100个元素
-                size = length
-            elif key_type == 'hash':
-                length = client.hlen(key)
-                value = client.hgetall(key)
-                size = length
-            elif key_type == 'stream':
-                length = client.xlen(key)
-                value = client.xrange(key, count=100)  # 最多返回前100个消息
-                size = length
+            else:
+                value, next_cursor = self._read_value_page(client, key, key_type, size, cursor, count)
             
             # 格式化值用于显示
             formatted_value = self._format_value(value, key_type)
@@ -159,16 +203,75 @@ class RedisService:
             return {
                 'key': key,
                 'type': key_type,
-                'ttl': ttl,
+                'ttl': meta['ttl'],
                 'size': size,
+                'encoding': meta['encoding'],
+                'memory_usage': meta['memory_usage'],
                 'value': formatted_value,
-                'raw_value': raw_value_formatted
+                'raw_value': raw_value_formatted,
+                'cursor': cursor,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         except APIException:
             raise
         except Exception as e:
             raise APIException(f'获取 key 信息失败: {str(e)}', 500)
     
+    def _read_value_page(self, client, key, key_type, size, cursor, count):
+        """
+        按游标读取集合类值的一页
+        - hash/set/zset 使用 HSCAN/SSCAN/ZSCAN，游标为 Redis 返回的游标（COUNT 只是提示，单页数量可能略有浮动）
+        - list 使用 LRANGE 窗口，游标为下一页起始下标
+        - stream 使用 XRANGE 窗口，游标为下一页起始消息 ID
+        :return: (值, 下一页游标)，没有更多数据时游标为 None
+        """
+        if key_type == 'list':
+            start = self._parse_int_cursor(cursor)
+            value = client.lrange(key, start, start + count - 1)
+            end = start + len(value)
+            return value, str(end) if end < size else None
+        
+        if key_type == 'stream':
+            # 多读取一条消息，其 ID 作为下一页的起始位置
+            messages = client.xrange(key, min=cursor or '-', max='+', count=count + 1)
+            if len(messages) > count:
+                return messages[:count], self._decode(messages[count][0])
+            return messages, None
+        
+        scan = {
+            'hash': client.hscan,
+            'set': client.sscan,
+            'zset': client.zscan
+        }.get(key_type)
+        if scan is None:
+            return None, None
+        
+        scan_cursor = self._parse_int_cursor(cursor)
+        items = {} if key_type == 'hash' else []
+        # 单次 SCAN 可能返回空结果但游标未结束，继续读取直到凑够一页或遍历结束
+        while True:
+            scan_cursor, batch = scan(key, cursor=scan_cursor, count=count)
+            if key_type == 'hash':
+                items.update(batch)
+            else:
+                items.extend(batch)
+            if scan_cursor == 0 or len(items) >= count:
+                break
+        return items, str(scan_cursor) if scan_cursor != 0 else None
+    
+    @staticmethod
+    def _parse_int_cursor(cursor):
+        if cursor in (None, ''):
+            return 0
+        try:
+            value = int(cursor)
+        except (TypeError, ValueError):
+            raise APIException('cursor 无效', 400)
+        if value < 0:
+            raise APIException('cursor 无效', 400)
+        return value
+    
     def _format_value(self, value, key_type: str):
         """格式化值用于显示"""
         if value is None:
@@ -338,26 +441,17 @@ class RedisService:
         except Exception as e:
             raise APIException(f'更新 key 失败: {str(e)}', 500)
     
-    def get_key_count(self, connection_id, pattern='*'):
-        """获取 key 的数量（估算）"""
+    def get_key_count(self, connection_id, pattern='*', mode='estimate', sample_size=None):
+        """
+        获取 key 的数量
+        pattern 为 * 时使用 DBSIZE；其他模式默认抽样估算（附置信区间），
+        mode=exact 时提交后台 SCAN 统计任务，结果按连接和模式缓存
+        :return: (结果, 是否已得到结果)
+        """
         try:
-            client = self._get_redis_client(connection_id)
-            
-            # 使用 DBSIZE 获取总 key 数（如果 pattern 是 *）
-            if pattern == '*':
-                count = client.dbsize()
-            else:
-                # 对于特定 pattern，使用 SCAN 估算
-                count = 0
-                cursor = 0
-                while True:
-                    cursor_result = client.scan(cursor=cursor, match=pattern, count=1000)
-                    cursor, keys = cursor_result
-                    count += len(keys)
-                    if cursor == 0:
-                        break
-            
-            return {'count': count}
+            return redis_key_count_service.count(connection_id, pattern, mode, sample_size)
+        except APIException:
+            raise
         except Exception as e:
             raise APIException(f'获取 key 数量失败: {str(e)}', 500)
     
@@ -434,16 +528,12 @@ class RedisService:
         return result
     
     def close_connection(self, connection_id):
-        """关闭 Redis 连接"""
-        connection_key = self._get_connection_key(connection_id)
-        if connection_key in self.connection_pool:
-            try:
-                client = self.connection_pool[connection_key]
-                client.close()
-            except Exception:
-                pass
-            finally:
-                del self.connection_pool[connection_key]
-        
-        return {'message': '连接已关闭'}
-
+        """关闭 Redis 连接（释放注册表中该连接的连接池）"""
+        if redis_pool_registry.invalidate(connection_id):
+            return {'message': '连接已关闭'}
+        return {'message': '连接不存在'}
+    
+    @staticmethod
+    def get_pool_stats():
+        """获取 Redis 连接池注册表统计信息"""
+        return redis_pool_registry.stats()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Redis 数据迁移服务（DUMP/RESTORE 流式复制、导出为文件、从文件导入，支持断点续传）
+"""
+
+import os
+import struct
+import time
+from datetime import datetime
+
+from ...core.exceptions import APIException
+from ...utils.job_util import BackgroundJobRunner, FileJobStore, JobStatus
+from .connection_registry import redis_pool_registry
+
+
+class RedisTransferService:
+    """
+    Redis 数据迁移服务
+    - copy：SCAN 源连接，每批通过一次 pipeline 执行 DUMP + PTTL，再通过一次 pipeline 在目标连接执行 RESTORE ... REPLACE
+    - export：同样读取 DUMP + PTTL，写入紧凑的二进制文件（文件头 + 每个 key 一条记录），可下载后再导入
+    - import：按批读取导出文件中的记录，通过 pipeline RESTORE 到目标连接
+    - 每处理完一批记录都会保存 SCAN 游标（导入时为文件偏移），任务失败或取消后可从该位置继续；内存占用只与批大小相关
+    """
+
+    TYPE_COPY = 'copy'
+    TYPE_EXPORT = 'export'
+    TYPE_IMPORT = 'import'
+
+    DUMP_FILE = 'keys.rdump'
+    # 文件格式：MAGIC，之后每条记录为 >IqI（key 长度、PTTL 毫秒（-1 表示不过期）、DUMP 数据长度）+ key + DUMP 数据
+    MAGIC = b'TPRDUMP1'
+    RECORD_HEADER = struct.Struct('>IqI')
+
+    DEFAULT_BATCH_SIZE = 200
+    MAX_BATCH_SIZE = 2000
+    # 最多记录的错误明细条数
+    MAX_ERRORS = 20
+
+    def __init__(self):
+        self.store = FileJobStore('redis_transfer', ttl=7 * 86400)
+        self.runner = BackgroundJobRunner('redis-transfer', max_workers=2)
+
+    def init_app(self, app):
+        spool_dir = app.config.get('REDIS_TRANSFER_SPOOL_DIR')
+        if spool_dir:
+            self.store.root = spool_dir
+        self.store.ttl = app.config.get('REDIS_TRANSFER_RESULT_TTL', self.store.ttl)
+        self.runner.init_app(app, app.config.get('REDIS_TRANSFER_MAX_WORKERS'))
+
+    def submit_copy(self, source_connection_id, target_connection_id, pattern='*', replace=True, batch_size=None,
+                    current_user=None):
+        """提交复制任务：从源连接复制匹配的 key 到目标连接"""
+        if source_connection_id == target_connection_id:
+            raise APIException('源连接和目标连接不能相同', 400)
+        redis_pool_registry.acquire(source_connection_id)
+        redis_pool_registry.acquire(target_connection_id)
+        return self._create_job(self.TYPE_COPY, current_user, source_connection_id=source_connection_id,
+                                target_connection_id=target_connection_id, pattern=pattern or '*',
+                                replace=replace, batch_size=batch_size)
+
+    def submit_export(self, source_connection_id, pattern='*', batch_size=None, current_user=None):
+        """提交导出任务：将匹配的 key 导出为文件"""
+        redis_pool_registry.acquire(source_connection_id)
+        return self._create_job(self.TYPE_EXPORT, current_user, source_connection_id=source_connection_id,
+                                pattern=pattern or '*', batch_size=batch_size)
+
+    def submit_import(self, target_connection_id, export_job_id=None, file_storage=None, replace=True,
+                      batch_size=None, current_user=None):
+        """
+        提交导入任务
+        :param export_job_id: 已完成的导出任务ID，使用其导出文件
+        :param file_storage: 上传的导出文件（werkzeug FileStorage）
+        """
+        redis_pool_registry.acquire(target_connection_id)
+        if not export_job_id and file_storage is None:
+            raise APIException('请提供导出任务ID或上传导出文件', 400)
+
+        source_path = None
+        if export_job_id:
+            export_job = self.get_job(export_job_id)
+            if export_job['type'] != self.TYPE_EXPORT or export_job['status'] != JobStatus.FINISHED:
+                raise APIException('只能导入已完成的导出任务', 409)
+            source_path = os.path.join(self.store.job_dir(export_job_id), self.DUMP_FILE)
+
+        job = self._create_job(self.TYPE_IMPORT, current_user, target_connection_id=target_connection_id,
+                               export_job_id=export_job_id, replace=replace, batch_size=batch_size,
+                               offset=len(self.MAGIC), start=False)
+        if file_storage is not None:
+            source_path = os.path.join(self.store.job_dir(job['job_id']), self.DUMP_FILE)
+            file_storage.save(source_path)
+        with open(source_path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                self.store.update(job['job_id'], status=JobStatus.FAILED, error='文件格式不正确',
+                                  finished_at=datetime.now().isoformat())
+                raise APIException('文件格式不正确，请上传平台导出的 Redis 数据文件', 400)
+
+        job = self.store.update(job['job_id'], source_path=source_path)
+        self.runner.submit_job(self.store, job['job_id'], self._run)
+        return job
+
+    def get_job(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            raise APIException('迁移任务不存在或已过期', 404)
+        return job
+
+    def list_jobs(self):
+        return self.store.list()
+
+    def cancel(self, job_id):
+        job = self.get_job(job_id)
+        if job['status'] not in JobStatus.FINAL_STATUSES:
+            self.store.request_cancel(job_id)
+        return self.store.load(job_id)
+
+    def resume(self, job_id):
+        """
+        从上次保存的位置继续失败或已取消的任务
+        执行进程异常退出的任务在读取时已被标记为失败（见 FileJobStore.load），可以直接继续
+        """
+        job = self.get_job(job_id)
+        if job['status'] not in (JobStatus.FAILED, JobStatus.CANCELLED):
+            raise APIException(f"只能继续失败或已取消的任务，当前状态: {job['status']}", 409)
+        try:
+            os.remove(os.path.join(self.store.job_dir(job_id), FileJobStore.CANCEL_FILE))
+        except OSError:
+            pass
+        job = self.store.update(job_id, status=JobStatus.QUEUED, error=None, finished_at=None,
+                                resumed=job.get('resumed', 0) + 1)
+        self.runner.submit_job(self.store, job_id, self._run)
+        return job
+
+    def get_export_file(self, job_id):
+        """返回已完成导出任务的文件路径"""
+        job = self.get_job(job_id)
+        if job['type'] != self.TYPE_EXPORT or job['status'] != JobStatus.FINISHED:
+            raise APIException('导出任务尚未完成', 409)
+        return os.path.join(self.store.job_dir(job_id), self.DUMP_FILE)
+
+    def _create_job(self, job_type, current_user, batch_size=None, start=True, **fields):
+        batch_size = self._normalize_batch_size(batch_size)
+        self.store.cleanup()
+        job = self.store.create(dict(fields, **{
+            'type': job_type,
+            'batch_size': batch_size,
+            'cursor': 0,
+            'keys_read': 0,
+            'keys_written': 0,
+            'keys_skipped': 0,
+            'keys_failed': 0,
+            'bytes': 0,
+            'errors': [],
+            'resumed': 0,
+            'created_by': current_user.id if current_user else None
+        }))
+        if start:
+            self.runner.submit_job(self.store, job['job_id'], self._run)
+        return job
+
+    def _run(self, job_id):
+        """在后台线程中执行迁移任务"""
+        job = self.store.load(job_id)
+        if self.store.is_cancel_requested(job_id):
+            self.store.update(job_id, status=JobStatus.CANCELLED, finished_at=datetime.now().isoformat())
+            return
+
+        self.store.update(job_id, status=JobStatus.RUNNING, started_at=job.get('started_at') or datetime.now().isoformat())
+        start_time = time.time()
+        try:
+            if job['type'] == self.TYPE_IMPORT:
+                completed = self._run_import(job)
+            else:
+                completed = self._run_scan(job)
+        except Exception as e:
+            self.store.update(job_id, status=JobStatus.FAILED, error=str(e), finished_at=datetime.now().isoformat(),
+                              elapsed=round(job.get('elapsed', 0) + time.time() - start_time, 3))
+            return
+
+        self.store.update(job_id, status=JobStatus.FINISHED if completed else JobStatus.CANCELLED,
+                          finished_at=datetime.now().isoformat(),
+                          elapsed=round(job.get('elapsed', 0) + time.time() - start_time, 3))
+
+    def _run_scan(self, job):
+        """复制或导出：从保存的游标继续 SCAN，返回是否全部完成（被取消时返回 False）"""
+        job_id = job['job_id']
+        source = redis_pool_registry.client(job['source_connection_id'])
+        target = redis_pool_registry.client(job['target_connection_id']) if job['type'] == self.TYPE_COPY else None
+        stats = {name: job[name] for name in ('keys_read', 'keys_written', 'keys_skipped', 'keys_failed', 'bytes')}
+        errors = job['errors']
+
+        out = None
+        if job['type'] == self.TYPE_EXPORT:
+            path = os.path.join(self.store.job_dir(job_id), self.DUMP_FILE)
+            if job['cursor'] == 0 and job['keys_read'] == 0:
+                out = open(path, 'wb')
+                out.write(self.MAGIC)
+                stats['bytes'] = len(self.MAGIC)
+            else:
+                # 截断到最后一次保存进度时的位置，丢弃未完成批次写入的数据
+                out = open(path, 'r+b')
+                out.truncate(stats['bytes'])
+                out.seek(stats['bytes'])
+
+        try:
+            cursor = job['cursor']
+            started = cursor != 0
+            while cursor != 0 or not started:
+                started = True
+                cursor, keys = source.scan(cursor=cursor, match=job['pattern'], count=job['batch_size'])
+                if keys:
+                    records = self._dump_batch(source, keys)
+                    stats['keys_read'] += len(keys)
+                    stats['keys_skipped'] += len(keys) - len(records)
+                    if out is not None:
+                        for key, pttl, payload in records:
+                            stats['bytes'] += out.write(self.RECORD_HEADER.pack(len(key), pttl, len(payload)))
+                            stats['bytes'] += out.write(key)
+                            stats['bytes'] += out.write(payload)
+                        out.flush()
+                        stats['keys_written'] += len(records)
+                    else:
+                        written, failed = self._restore_batch(target, records, job['replace'], errors)
+                        stats['keys_written'] += written
+                        stats['keys_failed'] += failed
+                        stats['bytes'] += sum(len(payload) for _, _, payload in records)
+
+                # 每批完成后保存游标，任务中断后从这里继续
+                self.store.update(job_id, cursor=cursor, errors=errors, **stats)
+                if cursor != 0 and self.store.is_cancel_requested(job_id):
+                    return False
+            return True
+        finally:
+            if out is not None:
+                out.close()
+
+    def _run_import(self, job):
+        """从导出文件导入：从保存的文件偏移继续，返回是否全部完成"""
+        job_id = job['job_id']
+        target = redis_pool_registry.client(job['target_connection_id'])
+        stats = {name: job[name] for name in ('keys_read', 'keys_written', 'keys_failed', 'bytes')}
+        errors = job['errors']
+        offset = job['offset']
+
+        with open(job['source_path'], 'rb') as f:
+            f.seek(offset)
+            while True:
+                records = []
+                while len(records) < job['batch_size']:
+                    header = f.read(self.RECORD_HEADER.size)
+                    if not header:
+                        break
+                    if len(header) < self.RECORD_HEADER.size:
+                        raise ValueError('导出文件不完整')
+                    key_length, pttl, payload_length = self.RECORD_HEADER.unpack(header)
+                    key = f.read(key_length)
+                    payload = f.read(payload_length)
+                    if len(key) < key_length or len(payload) < payload_length:
+                        raise ValueError('导出文件不完整')
+                    records.append((key, pttl, payload))
+                if not records:
+                    return True
+
+                written, failed = self._restore_batch(target, records, job['replace'], errors)
+                offset = f.tell()
+                stats['keys_read'] += len(records)
+                stats['keys_written'] += written
+                stats['keys_failed'] += failed
+                stats['bytes'] += sum(len(payload) for _, _, payload in records)
+                self.store.update(job_id, offset=offset, errors=errors, **stats)
+                if self.store.is_cancel_requested(job_id):
+                    return False
+
+    @staticmethod
+    def _dump_batch(client, keys):
+        """一次 pipeline 获取一批 key 的 DUMP 和 PTTL，跳过已被删除的 key"""
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        results = pipe.execute(raise_on_error=False)
+        records = []
+        for index, key in enumerate(keys):
+            payload, pttl = results[index * 2], results[index * 2 + 1]
+            if payload is None or isinstance(payload, Exception) or isinstance(pttl, Exception) or pttl == -2:
+                continue
+            records.append((key, pttl if pttl > 0 else -1, payload))
+        return records
+
+    def _restore_batch(self, client, records, replace, errors):
+        """一次 pipeline 执行一批 RESTORE，返回 (成功数, 失败数)"""
+        if not records:
+            return 0, 0
+        pipe = client.pipeline(transaction=False)
+        for key, pttl, payload in records:
+            pipe.restore(key, pttl if pttl > 0 else 0, payload, replace=replace)
+        written = failed = 0
+        for (key, _, _), result in zip(records, pipe.execute(raise_on_error=False)):
+            if isinstance(result, Exception):
+                failed += 1
+                if len(errors) < self.MAX_ERRORS:
+                    errors.append({'key': key.decode('utf-8', errors='replace'), 'error': str(result)})
+            else:
+                written += 1
+        return written, failed
+
+    def _normalize_batch_size(self, batch_size):
+        if batch_size in (None, ''):
+            return self.DEFAULT_BATCH_SIZE
+        try:
+            batch_size = int(batch_size)
+        except (TypeError, ValueError):
+            raise APIException('batch_size 必须为整数', 400)
+        if batch_size <= 0:
+            raise APIException('batch_size 必须大于0', 400)
+        return min(batch_size, self.MAX_BATCH_SIZE)
+
+
+# 全局服务实例
+redis_transfer_service = RedisTransferService()
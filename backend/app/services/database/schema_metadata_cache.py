@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  外部数据库表结构元数据缓存（进程级共享，TTL + 版本校验失效）
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect, text
+
+
+class SchemaMetadataCache:
+    """
+    表结构元数据缓存
+    - 按 (连接ID, 库名, 表名, 元数据类型) 缓存表列表、列、主键、外键、索引、唯一约束
+    - TTL 内直接命中；超过 TTL 后读取 information_schema.TABLES 的 CREATE_TIME / UPDATE_TIME 作为版本号，
+      版本未变化则续期（revalidation），变化则重新反射
+    - 同一库的版本信息一次查询获取，并在 VERSION_CHECK_INTERVAL 内复用，避免每个表单独查询
+    """
+
+    KIND_TABLES = 'tables'
+    KIND_COLUMNS = 'columns'
+    KIND_PK = 'pk'
+    KIND_FOREIGN_KEYS = 'foreign_keys'
+    KIND_INDEXES = 'indexes'
+    KIND_UNIQUE = 'unique_constraints'
+
+    def __init__(self, ttl=300, max_entries=20000, version_check_interval=5):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_check_interval = version_check_interval
+        self._lock = threading.RLock()
+        # (connection_id, schema, table, kind) -> {'value', 'version', 'loaded_at'}
+        self._entries = OrderedDict()
+        # (connection_id, schema) -> (版本映射 {table: (create_time, update_time)}, checked_at)
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DB_SCHEMA_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('DB_SCHEMA_CACHE_MAX_ENTRIES', self.max_entries)
+        self.version_check_interval = app.config.get('DB_SCHEMA_CACHE_VERSION_CHECK_INTERVAL',
+                                                     self.version_check_interval)
+
+    def inspector(self, connection_id, engine):
+        """获取带缓存的 Inspector，接口与 SQLAlchemy Inspector 的常用反射方法一致"""
+        return CachedInspector(self, connection_id, engine)
+
+    def get(self, connection_id, engine, schema, table, kind, loader):
+        """
+        获取元数据，未命中或版本变化时调用 loader 重新加载
+        :param loader: 无参函数，返回最新的元数据
+        """
+        key = (connection_id, schema, table, kind)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry['loaded_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_value(entry['value'])
+
+        if entry:
+            version = self._get_version(connection_id, engine, schema, table)
+            if version is not None and version == entry['version']:
+                with self._lock:
+                    entry['loaded_at'] = now
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.revalidations += 1
+                return _copy_value(entry['value'])
+        else:
+            version = None
+
+        value = loader()
+        if version is None:
+            version = self._get_version(connection_id, engine, schema, table)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = {'value': value, 'version': version, 'loaded_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return _copy_value(value)
+
+    def invalidate(self, connection_id, schema=None, table=None):
+        """
+        使缓存失效
+        :param schema: 为空时清除该连接的全部缓存
+        :param table: 为空时清除整个库的缓存
+        :return: 清除的条目数
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[0] == connection_id
+                and (schema is None or key[1] == schema)
+                and (table is None or key[2] in (table, None))
+            ]
+            for key in keys:
+                del self._entries[key]
+            for version_key in list(self._versions):
+                if version_key[0] == connection_id and (schema is None or version_key[1] == schema):
+                    del self._versions[version_key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._versions.clear()
+            self.invalidations += count
+            return count
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total, 4) if total else 0
+            }
+
+    def _get_version(self, connection_id, engine, schema, table):
+        """
+        获取表（或整个库的表列表）的版本号
+        表的版本为 (CREATE_TIME, UPDATE_TIME)；库的版本为所有表名及其 CREATE_TIME
+        """
+        version_key = (connection_id, schema)
+        now = time.time()
+        with self._lock:
+            cached = self._versions.get(version_key)
+        if cached and now - cached[1] < self.version_check_interval:
+            versions = cached[0]
+        else:
+            versions = self._load_versions(engine, schema)
+            if versions is None:
+                return None
+            with self._lock:
+                self._versions[version_key] = (versions, now)
+
+        if table is None:
+            return tuple(sorted((name, str(times[0])) for name, times in versions.items()))
+        times = versions.get(table)
+        return (str(times[0]), str(times[1])) if times else ('missing',)
+
+    @staticmethod
+    def _load_versions(engine, schema):
+        if schema is None:
+            return None
+        try:
+            with engine.connect() as conn:
+                result = conn.execute(text("""
+                    SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME
+                    FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = :schema
+                """), {'schema': schema})
+                return {row[0]: (row[1], row[2]) for row in result}
+        except Exception:
+            # 无法读取版本信息时（非 MySQL 或权限不足）仅依赖 TTL
+            return None
+
+
+class CachedInspector:
+    """带缓存的 Inspector，仅实现本项目使用到的反射方法"""
+
+    def __init__(self, cache, connection_id, engine):
+        self._cache = cache
+        self._connection_id = connection_id
+        self._engine = engine
+        self._inspector = None
+
+    @property
+    def inspector(self):
+        if self._inspector is None:
+            self._inspector = inspect(self._engine)
+        return self._inspector
+
+    def _get(self, schema, table, kind, loader):
+        return self._cache.get(self._connection_id, self._engine, schema, table, kind, loader)
+
+    def get_table_names(self, schema=None):
+        return self._get(schema, None, SchemaMetadataCache.KIND_TABLES,
+                         lambda: self.inspector.get_table_names(schema=schema))
+
+    def get_columns(self, table_name, schema=None):
+        return self._get(schema, table_name, SchemaMetadataCache.KIND_COLUMNS,
+                         lambda: self.inspector.get_columns(table_name, schema=schema))
+
+    def get_pk_constraint(self, table_name, schema=None):
+        return self._get(schema, table_name, SchemaMetadataCache.KIND_PK,
+                         lambda: self.inspector.get_pk_constraint(table_name, schema=schema))
+
+    def get_foreign_keys(self, table_name, schema=None):
+        return self._get(schema, table_name, SchemaMetadataCache.KIND_FOREIGN_KEYS,
+                         lambda: self.inspector.get_foreign_keys(table_name, schema=schema))
+
+    def get_indexes(self, table_name, schema=None):
+        return self._get(schema, table_name, SchemaMetadataCache.KIND_INDEXES,
+                         lambda: self.inspector.get_indexes(table_name, schema=schema))
+
+    def get_unique_constraints(self, table_name, schema=None):
+        return self._get(schema, table_name, SchemaMetadataCache.KIND_UNIQUE,
+                         lambda: self.inspector.get_unique_constraints(table_name, schema=schema))
+
+
+def _copy_value(value):
+    """返回缓存值的浅拷贝，避免调用方修改缓存内容"""
+    if isinstance(value, list):
+        return [_copy_value(item) if isinstance(item, (dict, list)) else item for item in value]
+    if isinstance(value, dict):
+        return {k: (_copy_value(v) if isinstance(v, (dict, list)) else v) for k, v in value.items()}
+    return value
+
+
+# 进程级单例
+schema_cache = SchemaMetadataCache()
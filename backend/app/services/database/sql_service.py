@@ -7,6 +7,7 @@
 @description
 """
 
+import json
 import time
 
 import pandas as pd
@@ -17,39 +18,59 @@ from ...core.database import db
 from ...core.exceptions import APIException
 from ...models.database.sql_model import SQLTemplate, QueryHistory
 from .database_info_service import DatabaseInfoService
+from .query_stream_service import QueryMetrics, QueryStreamService
 
 
 class SQLService:
+    # 允许的查询类型
+    ALLOWED_QUERIES = ['SELECT', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN']
+    # 返回结果集的查询类型
+    QUERY_TYPES_WITH_RESULTS = ['SELECT', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN']
+
+    @staticmethod
+    def _check_sql_safety(sql_query):
+        """安全检查：防止DROP、DELETE等危险操作"""
+        dangerous_keywords = ['DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE TABLE', 'INSERT', 'UPDATE']
+        sql_upper = sql_query.upper().strip()
+
+        # 检查是否以允许的查询类型开头
+        is_allowed_query = any(sql_upper.startswith(query) for query in SQLService.ALLOWED_QUERIES)
+
+        if not is_allowed_query:
+            # 对于非查询语句，检查是否包含危险关键字
+            for keyword in dangerous_keywords:
+                if keyword in sql_upper:
+                    raise ValueError(f"出于安全考虑，不允许执行包含 {keyword} 的SQL语句")
+        return sql_upper
+
+    @staticmethod
+    def _is_result_query(sql_upper):
+        return any(sql_upper.startswith(query) for query in SQLService.QUERY_TYPES_WITH_RESULTS)
+
     @staticmethod
-    def execute_sql(sql_query, limit=1000, connection_id=None, database_name=None, current_user=None):
+    def execute_sql(sql_query, limit=1000, connection_id=None, database_name=None, current_user=None,
+                    continuation_token=None):
         """
         执行SQL查询并返回结果
         支持 SELECT, SHOW, DESCRIBE, EXPLAIN 等查询语句
+        查询使用服务端游标执行，读取到 limit 行后即停止，不会把整个结果集加载到内存
         
         Args:
             sql_query: SQL查询语句
-            limit: 结果限制条数
+            limit: 结果限制条数（每页行数）
             connection_id: 数据库连接ID（可选，如果不提供则使用默认连接）
             database_name: 数据库名称（可选，仅在指定connection_id时有效）
             current_user: 当前用户对象
+            continuation_token: 续页令牌（可选，上一页返回的 continuation_token，需携带同一条SQL）
         """
         start_time = time.time()
+        metrics = QueryMetrics()
         try:
-            # 安全检查：防止DROP、DELETE等危险操作
-            dangerous_keywords = ['DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE TABLE', 'INSERT', 'UPDATE']
-            sql_upper = sql_query.upper().strip()
-
-            # 允许的查询类型
-            allowed_queries = ['SELECT', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN']
-
-            # 检查是否以允许的查询类型开头
-            is_allowed_query = any(sql_upper.startswith(query) for query in allowed_queries)
-
-            if not is_allowed_query:
-                # 对于非查询语句，检查是否包含危险关键字
-                for keyword in dangerous_keywords:
-                    if keyword in sql_upper:
-                        raise ValueError(f"出于安全考虑，不允许执行包含 {keyword} 的SQL语句")
+            sql_upper = SQLService._check_sql_safety(sql_query)
+            limit = QueryStreamService.normalize_limit(limit)
+            offset = 0
+            if continuation_token:
+                offset = QueryStreamService.decode_token(continuation_token, sql_query, connection_id, database_name)
 
             # 根据是否指定连接ID选择执行方式
             if connection_id:
@@ -63,42 +84,56 @@ class SQLService:
                         conn.execute(text(f"USE `{database_name}`"))
                     
                     # 执行查询
-                    result = conn.execute(text(sql_query))
-                    
-                    return SQLService._process_query_result(
-                        result, sql_upper, limit, sql_query, start_time, 
-                        connection_id=connection_id, database_name=database_name, current_user=current_user
+                    response = SQLService._run_query(
+                        conn, sql_query, sql_upper, limit, offset, start_time, metrics,
+                        connection_id=connection_id, database_name=database_name
                     )
             else:
                 # 使用默认数据库连接
-                result = db.session.execute(text(sql_query))
-                
-                return SQLService._process_query_result(
-                    result, sql_upper, limit, sql_query, start_time, current_user=current_user
+                response = SQLService._run_query(
+                    db.session.connection(), sql_query, sql_upper, limit, offset, start_time, metrics
                 )
 
+            # 保存查询历史（结果集关闭后再写入，避免与未读完的服务端游标冲突）
+            SQLService.save_history(sql_query, response['execution_time'], True, connection_id=connection_id,
+                                    database_name=database_name, metrics=metrics, current_user=current_user)
+            return response
+
         except APIException:
             raise
         except Exception as e:
             execution_time = time.time() - start_time
 
-            # 保存错误历史（只在使用默认连接时保存）
+            # 保存错误历史
             if not connection_id:
-                try:
-                    history = QueryHistory(sql_query=sql_query, execution_time=execution_time, success=False,
-                        error_message=str(e))
-                    if current_user:
-                        history.created_by = current_user.id
-                        history.updated_by = current_user.id
-                    db.session.add(history)
-                    db.session.commit()
-                except Exception as save_error:
-                    current_app.logger.warning(f"保存错误历史失败: {str(save_error)}")
+                db.session.rollback()
+            SQLService.save_history(sql_query, execution_time, False, error_message=str(e),
+                                    connection_id=connection_id, database_name=database_name,
+                                    metrics=metrics, current_user=current_user)
 
             return {'success': False, 'error': str(e), 'execution_time': execution_time}
 
     @staticmethod
-    def _process_query_result(result, sql_upper, limit, sql_query, start_time, connection_id=None, database_name=None, current_user=None):
+    def _run_query(conn, sql_query, sql_upper, limit, offset, start_time, metrics, connection_id=None,
+                   database_name=None):
+        """执行查询：返回结果集的语句使用服务端游标，最多读取 offset + limit + 1 行"""
+        if SQLService._is_result_query(sql_upper):
+            with QueryStreamService.stream(conn, sql_query, metrics=metrics, max_rows=offset + limit + 1) as result:
+                return SQLService._process_query_result(
+                    result, sql_upper, limit, sql_query, start_time,
+                    connection_id=connection_id, database_name=database_name, offset=offset, metrics=metrics
+                )
+
+        result = conn.execute(text(sql_query))
+        metrics.mark_executed()
+        return SQLService._process_query_result(
+            result, sql_upper, limit, sql_query, start_time,
+            connection_id=connection_id, database_name=database_name, offset=offset, metrics=metrics
+        )
+
+    @staticmethod
+    def _process_query_result(result, sql_upper, limit, sql_query, start_time, connection_id=None, database_name=None,
+                              offset=0, metrics=None):
         """
         处理查询结果
         
@@ -110,11 +145,12 @@ class SQLService:
             start_time: 开始时间
             connection_id: 连接ID（可选）
             database_name: 数据库名称（可选）
-            current_user: 当前用户对象
+            offset: 跳过的行数（续页时使用）
+            metrics: 查询统计对象
         """
-        # 判断是否为返回结果的查询类型
-        query_types_with_results = ['SELECT', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN']
-        is_result_query = any(sql_upper.startswith(query) for query in query_types_with_results)
+        metrics = metrics or QueryMetrics()
+        is_result_query = SQLService._is_result_query(sql_upper)
+        has_more = False
 
         if is_result_query:
             # 获取列名和数据
@@ -123,7 +159,7 @@ class SQLService:
             # 对于SHOW语句等，可能需要特殊处理
             if sql_upper.startswith('SHOW DATABASES'):
                 # SHOW DATABASES 的特殊处理
-                data = result.fetchall()
+                data = list(QueryStreamService.iter_rows(result, metrics=metrics))
                 # 确保数据格式正确
                 if data and len(data[0]) == 1:
                     # 如果返回的是单列元组，转换为字典格式
@@ -133,7 +169,7 @@ class SQLService:
                     'query_type': 'SHOW_DATABASES'}
             elif sql_upper.startswith('SHOW TABLES'):
                 # SHOW TABLES 的特殊处理
-                data = result.fetchall()
+                data = list(QueryStreamService.iter_rows(result, metrics=metrics))
                 if data and len(data[0]) == 1:
                     data = [{'Tables_in_database': row[0]} for row in data]
                     columns = ['Tables_in_database']
@@ -141,15 +177,15 @@ class SQLService:
                     'query_type': 'SHOW_TABLES'}
             elif sql_upper.startswith('SHOW'):
                 # 其他SHOW语句
-                data = result.fetchmany(limit)
+                data, has_more = QueryStreamService.fetch_page(result, limit, offset, metrics)
                 result_data = {'columns': columns, 'data': data, 'row_count': len(data), 'query_type': 'SHOW'}
             elif sql_upper.startswith('DESCRIBE') or sql_upper.startswith('DESC'):
                 # DESCRIBE 表结构查询
-                data = result.fetchall()
+                data = list(QueryStreamService.iter_rows(result, metrics=metrics))
                 result_data = {'columns': columns, 'data': data, 'row_count': len(data), 'query_type': 'DESCRIBE'}
             else:
-                # SELECT 和其他查询
-                data = result.fetchmany(limit)
+                # SELECT 和其他查询：只读取当前页，达到 limit 后停止
+                data, has_more = QueryStreamService.fetch_page(result, limit, offset, metrics)
                 # 转换为字典格式以便前端显示
                 try:
                     df = pd.DataFrame(data, columns=columns)
@@ -161,28 +197,23 @@ class SQLService:
 
                 result_data = {'columns': columns, 'data': data_dict, 'row_count': len(data),
                     'query_type': 'SELECT'}
+
+            result_data['has_more'] = has_more
+            result_data['continuation_token'] = QueryStreamService.encode_token(
+                sql_query, connection_id, database_name, offset + result_data['row_count']
+            ) if has_more else None
         else:
             # 非查询语句（如 SET, USE 等）
             result_data = {'message': '执行成功', 'affected_rows': result.rowcount, 'query_type': 'NON_QUERY'}
 
+        metrics.finish()
         execution_time = time.time() - start_time
 
-        # 保存查询历史（只在使用默认连接时保存到历史）
-        if not connection_id:
-            try:
-                history = QueryHistory(sql_query=sql_query, execution_time=execution_time, success=True)
-                if current_user:
-                    history.created_by = current_user.id
-                    history.updated_by = current_user.id
-                db.session.add(history)
-                db.session.commit()
-            except Exception as e:
-                current_app.logger.warning(f"保存查询历史失败: {str(e)}")
-
         response = {
             'success': True, 
             'data': result_data, 
             'execution_time': execution_time,
+            'metrics': metrics.to_dict(),
             'sql_type': 'QUERY' if is_result_query else 'NON_QUERY'
         }
         
@@ -193,6 +224,90 @@ class SQLService:
             
         return response
 
+    @staticmethod
+    def stream_sql_ndjson(sql_query, max_rows=None, connection_id=None, database_name=None, current_user=None):
+        """
+        以 NDJSON 格式流式返回查询结果（用于大结果集导出）
+        
+        Args:
+            sql_query: SQL查询语句（仅支持返回结果集的查询）
+            max_rows: 最多返回的行数，不超过 SQL_STREAM_MAX_ROWS
+            connection_id: 数据库连接ID（可选，如果不提供则使用默认连接）
+            database_name: 数据库名称（可选，仅在指定connection_id时有效）
+            current_user: 当前用户对象
+        Returns:
+            生成 NDJSON 文本行的生成器
+        """
+        try:
+            sql_upper = SQLService._check_sql_safety(sql_query)
+        except ValueError as e:
+            raise APIException(str(e), 400)
+        if not SQLService._is_result_query(sql_upper):
+            raise APIException('流式输出仅支持 SELECT、SHOW 等返回结果集的查询', 400)
+
+        max_allowed = current_app.config.get('SQL_STREAM_MAX_ROWS', 1000000)
+        try:
+            max_rows = int(max_rows) if max_rows else max_allowed
+        except (TypeError, ValueError):
+            raise APIException('max_rows 必须为整数', 400)
+        max_rows = max(1, min(max_rows, max_allowed))
+
+        # 在生成器开始之前获取引擎，连接错误可以在响应开始前返回
+        engine = DatabaseInfoService()._get_connection_engine(connection_id) if connection_id else None
+
+        def generate():
+            start_time = time.time()
+            metrics = QueryMetrics()
+            error_message = None
+            try:
+                if engine is not None:
+                    with engine.connect() as conn:
+                        if database_name:
+                            conn.execute(text(f"USE `{database_name}`"))
+                        yield from QueryStreamService.iter_ndjson(conn, sql_query, metrics, max_rows)
+                else:
+                    yield from QueryStreamService.iter_ndjson(db.session.connection(), sql_query, metrics, max_rows)
+            except GeneratorExit:
+                error_message = '客户端已断开连接'
+                raise
+            except Exception as e:
+                error_message = str(e)
+                yield json.dumps({'type': 'error', 'error': error_message}, ensure_ascii=False) + '\n'
+            finally:
+                metrics.finish()
+                if engine is None:
+                    db.session.rollback()
+                SQLService.save_history(sql_query, time.time() - start_time, error_message is None,
+                                        error_message=error_message, connection_id=connection_id,
+                                        database_name=database_name, metrics=metrics, current_user=current_user)
+
+        return generate()
+
+    @staticmethod
+    def save_history(sql_query, execution_time, success, error_message=None, connection_id=None, database_name=None,
+                     metrics=None, current_user=None, user_id=None):
+        """
+        保存查询历史（包含首行耗时、读取耗时、行数和数据量）
+        后台任务中没有当前用户对象时，可以通过 user_id 指定创建人
+        """
+        try:
+            history = QueryHistory(sql_query=sql_query, execution_time=execution_time, success=success,
+                error_message=error_message, connection_id=connection_id, database_name=database_name)
+            if metrics:
+                history.time_to_first_row = metrics.time_to_first_row
+                history.fetch_time = metrics.fetch_time
+                history.row_count = metrics.row_count
+                history.bytes_fetched = metrics.bytes
+            user_id = current_user.id if current_user else user_id
+            if user_id:
+                history.created_by = user_id
+                history.updated_by = user_id
+            db.session.add(history)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"保存查询历史失败: {str(e)}")
+
     @staticmethod
     def get_database_info():
         """
@@ -21,6 +21,10 @@ from ...models.environment.environment_model import Environment
 from ...models.mock.mock_model import Mock
 from ...models.database.sql_model import SQLTemplate
 from ...models.database.database_conn_model import DatabaseConnection
+from ...models.database.redis_model import RedisKeyspaceReport
+from ...models.test.pytest_job_model import PytestJob
+from ...models.test.test_case_result_model import TestCaseResult
+from ...models.test.test_rerun_policy_model import TestRerunPolicy
 from ...models.tool.linux_info_model import LinuxInfo
 from ...models.tool.script_management_model import ScriptManagement
 from ...models.api_docs.api_endpoint_model import ApiEndpoint
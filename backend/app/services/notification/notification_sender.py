@@ -110,6 +110,7 @@ class NotificationSender:
         passed = test_result.get('passed_tests', 0)
         failed = test_result.get('failed_tests', 0)
         skipped = test_result.get('skipped_tests', 0)
+        flaky = test_result.get('flaky_tests', 0)
         duration = test_result.get('duration', 0)
         success = test_result.get('success', False)
         report_url = test_result.get('report_url', '')
@@ -117,6 +118,8 @@ class NotificationSender:
         # 构建消息内容
         status_emoji = '✅' if success else '❌'
         status_text = '成功' if success else '失败'
+        # 首次失败、重跑后通过的用例数，没有时不显示
+        flaky_line = f'\n- 重跑后通过：{flaky} 🔁' if flaky else ''
         
         content = f"""
 **{title}**
@@ -130,7 +133,7 @@ class NotificationSender:
 - 总用例数：{total}
 - 通过：{passed} ✅
 - 失败：{failed} ❌
-- 跳过：{skipped} ⏭️
+- 跳过：{skipped} ⏭️{flaky_line}
 - 执行时长：{duration:.2f}秒
 
 **状态：** {status_emoji} {status_text}
@@ -148,6 +151,7 @@ class NotificationSender:
             'passed': passed,
             'failed': failed,
             'skipped': skipped,
+            'flaky': flaky,
             'duration': duration,
             'report_url': report_url
         }
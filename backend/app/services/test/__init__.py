@@ -11,7 +11,10 @@ from .test_case_service import TestCaseService
 from .test_environment_service import TestEnvironmentService
 from .test_report_service import TestReportService
 from .pytest_executor_service import PytestExecutorService
+from .pytest_code_cache_service import PytestCodeCacheService, pytest_code_cache
+from .pytest_job_service import PytestJobService, pytest_job_service
 
-__all__ = ['TestCaseService', 'TestEnvironmentService', 'TestReportService', 'PytestExecutorService']
+__all__ = ['TestCaseService', 'TestEnvironmentService', 'TestReportService', 'PytestExecutorService',
+           'PytestCodeCacheService', 'pytest_code_cache', 'PytestJobService', 'pytest_job_service']
 
 
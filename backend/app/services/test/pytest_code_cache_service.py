@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 生成代码缓存服务（按用例内容哈希复用已生成的测试文件，定期清理不再使用的文件）
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+from ...autotest.test_case_generator import GENERATOR_VERSION, generate_pytest_code_from_test_cases
+
+
+class PytestCodeCacheService:
+    """
+    Pytest 生成代码缓存服务
+    - 缓存键为 (用例主键 + 更新时间、组件、模块、环境名称、环境配置、生成器版本) 的 SHA-256，
+      用例被修改、环境配置变化或生成逻辑升级（GENERATOR_VERSION）后自然生成新的文件
+    - 文件名中包含缓存键（test_auto_<哈希>_组件_模块_环境.py），命中时直接复用，
+      文件内容和修改时间不变，pytest 断言重写产生的 __pycache__ 也能继续使用
+    - 命中时只更新文件的访问时间作为最近使用时间（修改时间用于校验 pyc，不能改动）
+    - 清理：超过 PYTEST_CODE_CACHE_TTL 未使用的生成文件（包括旧的按时间戳命名的文件）删除，
+      剩余文件数超过 PYTEST_CODE_CACHE_MAX_FILES 时按最近使用时间淘汰；
+      最近 PROTECT_SECONDS 内使用过的文件可能仍在执行，不会被删除
+    """
+
+    FILE_PREFIX = 'test_auto_'
+    KEY_LENGTH = 16
+    DEFAULT_TTL = 7 * 86400
+    DEFAULT_MAX_FILES = 500
+    DEFAULT_CLEANUP_INTERVAL = 3600
+    # 与 pytest 执行超时一致，期间使用过的文件不清理
+    PROTECT_SECONDS = 3600
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = self.DEFAULT_TTL
+        self.max_files = self.DEFAULT_MAX_FILES
+        self.cleanup_interval = self.DEFAULT_CLEANUP_INTERVAL
+        self._last_cleanup = 0
+        self._cleanup_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PYTEST_CODE_CACHE_ENABLED', self.enabled)
+        self.ttl = app.config.get('PYTEST_CODE_CACHE_TTL', self.ttl)
+        self.max_files = app.config.get('PYTEST_CODE_CACHE_MAX_FILES', self.max_files)
+        self.cleanup_interval = app.config.get('PYTEST_CODE_CACHE_CLEANUP_INTERVAL', self.cleanup_interval)
+
+    @staticmethod
+    def compute_key(test_cases, component_name, module_name, environment_name, env_config):
+        """计算生成代码的缓存键"""
+        payload = {
+            'cases': [[case.id, str(case.updated_at)] for case in test_cases],
+            'component': component_name or '',
+            'module': module_name or '',
+            'environment': environment_name or '',
+            'env_config': env_config or {},
+            'generator': GENERATOR_VERSION
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def build_file_name(cls, key, component_name, module_name, environment_name):
+        component_suffix = f"_{component_name.replace(' ', '_').replace('/', '_')}" if component_name else ''
+        module_suffix = f"_{module_name.replace(' ', '_').replace('/', '_')}" if module_name else ''
+        env_suffix = f'_{environment_name}' if environment_name else ''
+        return f'{cls.FILE_PREFIX}{key[:cls.KEY_LENGTH]}{component_suffix}{module_suffix}{env_suffix}.py'
+
+    def get_or_generate(self, test_cases, component_name, module_name, environment_name, env_config, output_dir,
+                        name_suffix=''):
+        """
+        获取测试文件，缓存未命中时生成
+        :return: (测试文件路径, 是否命中缓存)
+        """
+        if not self.enabled:
+            test_file_path = generate_pytest_code_from_test_cases(
+                test_cases=test_cases, component_name=component_name, module_name=module_name,
+                environment_name=environment_name, env_config=env_config, output_dir=output_dir,
+                name_suffix=name_suffix)
+            return test_file_path, False
+
+        key = self.compute_key(test_cases, component_name, module_name, environment_name, env_config)
+        file_name = self.build_file_name(key, component_name, module_name, environment_name)
+        test_file_path = os.path.join(output_dir, file_name)
+        if self._touch(test_file_path):
+            return test_file_path, True
+
+        # 先写入临时文件再原子替换，并发生成同一个文件时其他进程不会读到写了一半的代码
+        tmp_name = f'.{file_name}.{os.getpid()}.{threading.get_ident()}.tmp'
+        tmp_path = generate_pytest_code_from_test_cases(
+            test_cases=test_cases, component_name=component_name, module_name=module_name,
+            environment_name=environment_name, env_config=env_config, output_dir=output_dir,
+            file_name=tmp_name)
+        os.replace(tmp_path, test_file_path)
+        return test_file_path, False
+
+    @staticmethod
+    def _touch(path):
+        """更新访问时间（保留修改时间），文件不存在时返回 False"""
+        try:
+            stat = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def maybe_cleanup(self, output_dir):
+        """距离上次清理超过 PYTEST_CODE_CACHE_CLEANUP_INTERVAL 时执行清理"""
+        if time.time() - self._last_cleanup < self.cleanup_interval:
+            return 0
+        return self.cleanup(output_dir)
+
+    def cleanup(self, output_dir):
+        """
+        清理不再使用的生成测试文件及其 pyc
+        :return: 删除的文件数
+        """
+        with self._cleanup_lock:
+            self._last_cleanup = time.time()
+            if not os.path.isdir(output_dir):
+                return 0
+
+            now = time.time()
+            entries = []
+            for name in os.listdir(output_dir):
+                path = os.path.join(output_dir, name)
+                if name.startswith(f'.{self.FILE_PREFIX}') and name.endswith('.tmp'):
+                    # 生成过程中进程退出遗留的临时文件
+                    entries.append((name, path, self._last_used(path), True))
+                elif name.startswith(self.FILE_PREFIX) and name.endswith('.py'):
+                    entries.append((name, path, self._last_used(path), False))
+
+            expired = []
+            kept = []
+            for name, path, last_used, is_tmp in entries:
+                if last_used is None:
+                    continue
+                if now - last_used < self.PROTECT_SECONDS:
+                    kept.append((name, path, last_used))
+                elif is_tmp or now - last_used > self.ttl:
+                    expired.append(path)
+                else:
+                    kept.append((name, path, last_used))
+
+            # 剩余文件超过上限时，淘汰最久未使用的缓存文件
+            overflow = len(kept) - self.max_files
+            if overflow > 0:
+                candidates = sorted((item for item in kept if now - item[2] >= self.PROTECT_SECONDS),
+                                    key=lambda item: item[2])
+                expired.extend(path for _, path, _ in candidates[:overflow])
+
+            removed = 0
+            for path in expired:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+                self._remove_pyc(path)
+            return removed
+
+    @staticmethod
+    def _last_used(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return max(stat.st_atime, stat.st_mtime)
+
+    @staticmethod
+    def _remove_pyc(path):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        pattern = os.path.join(os.path.dirname(path), '__pycache__', f'{glob.escape(stem)}.*.pyc')
+        for pyc_path in glob.glob(pattern):
+            try:
+                os.remove(pyc_path)
+            except FileNotFoundError:
+                pass
+
+
+pytest_code_cache = PytestCodeCacheService()
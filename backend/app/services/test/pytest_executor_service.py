@@ -11,23 +11,47 @@ import os
 import sys
 import subprocess
 import json
+import shutil
+import time
 import yaml
 from datetime import datetime
+from flask import current_app
 from sqlalchemy import or_
 
 from ...core.database import db
 from ...core.exceptions import APIException
-from ...autotest.test_case_generator import generate_pytest_code_from_test_cases
+from ...autotest import pytest_live_plugin
 from ...models.test.test_case_model import TestCase
+from .pytest_code_cache_service import pytest_code_cache
+from .pytest_rerun_service import PytestRerunService
+from .pytest_live_service import PytestEventReader, PytestLiveService
+from .pytest_runner_pool import pytest_runner_pool
+from .pytest_selection_service import PytestSelectionService
+from .pytest_shard_service import PytestShardService
 from .test_environment_service import TestEnvironmentService
 from .test_report_service import TestReportService
 from ...utils.path_util import PathUtils
 from ...services.notification.notification_sender import NotificationSender
 
 
+class PytestExecutionCancelled(Exception):
+    """Pytest执行被取消"""
+
+
 class PytestExecutorService:
     """Pytest执行服务类"""
 
+    # pytest 执行超时时间（秒）
+    PYTEST_TIMEOUT = 3600
+    # 等待 pytest 进程时检查取消请求的间隔（秒）
+    CANCEL_CHECK_INTERVAL = 2
+    # 等待 pytest 进程时读取实时事件的间隔（秒）
+    EVENT_POLL_INTERVAL = 0.5
+    # 执行结果中保留的输出末尾字节数，完整输出在执行目录的日志文件中
+    OUTPUT_TAIL_BYTES = 64 * 1024
+    # 失败重跑的用例结果（实时事件中的 outcome）
+    RERUN_OUTCOMES = ('failed', 'error')
+
     @staticmethod
     def _get_autotest_dir():
         """获取autotest目录路径"""
@@ -61,13 +85,45 @@ class PytestExecutorService:
         return os.path.join(app_dir, 'autotest', 'config', 'config.yaml')
 
     @staticmethod
-    def execute_pytest(component_name=None, module_name=None, environment_name=None, current_user=None):
-        """执行Pytest测试并生成Allure报告"""
+    def execute_pytest(component_name=None, module_name=None, environment_name=None, current_user=None,
+                       progress_callback=None, cancel_check=None, shards=None, execution_timestamp=None,
+                       selection=None, rerun=None):
+        """
+        执行Pytest测试并生成Allure报告
+        :param shards: 分片数量，大于1时按历史耗时将用例分到多个pytest进程并行执行
+        :param selection: 用例选择参数 {'mode', 'last_runs', 'budget_minutes'}，见 PytestSelectionService
+        :param rerun: 失败重跑参数 {'enabled', 'max_reruns', 'backoff_seconds'}，用例/模块配置的重跑策略优先，见 PytestRerunService
+        :param execution_timestamp: 执行目录名，为空时使用当前时间戳（后台任务预先指定，便于实时读取输出）
+        :param progress_callback: 进度回调 progress_callback(phase, progress)，后台任务用于更新执行阶段
+        :param cancel_check: 取消检查函数，返回 True 时终止 pytest 进程并抛出 PytestExecutionCancelled
+        """
+        def _progress(phase, progress):
+            if progress_callback:
+                progress_callback(phase, progress)
+
+        # pytest 执行阶段的进度按已结束用例数占收集到的用例数计算（20% ~ 80%）
+        live = {'collected': 0, 'finished': 0, 'progress': 20}
+
+        def _on_events(events):
+            for _, event in events:
+                if event.get('event') == 'collected':
+                    live['collected'] += event.get('count', 0)
+                elif event.get('event') == 'finished':
+                    live['finished'] += 1
+            if live['collected']:
+                progress = 20 + int(60 * min(live['finished'], live['collected']) / live['collected'])
+                if progress > live['progress']:
+                    live['progress'] = progress
+                    _progress('running', progress)
+
         try:
             # 生成执行时间戳，用于区分不同的测试执行
-            execution_timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            execution_timestamp = execution_timestamp or datetime.now().strftime('%Y%m%d%H%M%S')
             
             # 1. 筛选测试用例
+            _progress('selecting', 5)
+            selection = PytestSelectionService.normalize(selection)
+            rerun = PytestRerunService.normalize(rerun)
             print(f'开始筛选测试用例 - component_name: {component_name}, module_name: {module_name}, environment_name: {environment_name}')
             test_cases = PytestExecutorService._get_test_cases_by_filter(component_name, module_name, environment_name)
             if not test_cases:
@@ -79,17 +135,53 @@ class PytestExecutorService:
                 if environment_name:
                     error_msg += f' 环境名称={environment_name}'
                 raise APIException(error_msg, 400)
+            test_cases, selection_summary = PytestSelectionService.select(test_cases, selection)
+            if not test_cases:
+                raise APIException(f'没有符合用例选择模式 {selection["mode"]} 的测试用例', 400, selection_summary)
 
             # 2. 生成测试代码
-            test_file_path = PytestExecutorService._generate_test_code(test_cases, component_name, module_name, environment_name)
+            _progress('generating', 10)
+            shard_count = PytestExecutorService._normalize_shards(shards)
+            shard_plan = PytestShardService.plan(test_cases, shard_count) if shard_count > 1 else []
+            if len(shard_plan) > 1:
+                shard_files = [
+                    PytestExecutorService._generate_test_code(shard['cases'], component_name, module_name,
+                                                              environment_name, name_suffix=f'_shard{index}')
+                    for index, shard in enumerate(shard_plan, start=1)
+                ]
+                test_file_path = shard_files[0]
+            else:
+                shard_files = []
+                test_file_path = PytestExecutorService._generate_test_code(test_cases, component_name, module_name, environment_name)
 
             # 3. 执行pytest，使用时间戳创建独立的allure结果目录
-            result = PytestExecutorService._run_pytest(test_file_path, environment_name, execution_timestamp)
+            _progress('running', 20)
+            if shard_files:
+                result = PytestExecutorService._run_pytest_shards(shard_files, execution_timestamp,
+                                                                  cancel_check=cancel_check, event_callback=_on_events)
+                for shard, shard_result in zip(shard_plan, result['shards']):
+                    shard_result['cases_count'] = len(shard['cases'])
+                    shard_result['estimated_duration'] = shard['estimated_duration']
+            else:
+                result = PytestExecutorService._run_pytest(test_file_path, environment_name, execution_timestamp,
+                                                           cancel_check=cancel_check, event_callback=_on_events)
+
+            # 3.1 失败重跑：pytest 正常结束且有用例失败（返回码 1）时，按重跑策略在同一个执行目录中重跑失败的用例
+            rerun_summary = None
+            if result.get('returncode') == 1:
+                _progress('rerunning', live['progress'])
+                rerun_summary = PytestExecutorService._rerun_failed_cases(
+                    test_cases, execution_timestamp, rerun, cancel_check=cancel_check, event_callback=_on_events)
+                if rerun_summary:
+                    result['rerun'] = rerun_summary
+                    result['success'] = rerun_summary['completed'] and rerun_summary['still_failed'] == 0
 
             # 4. 生成allure报告，使用时间戳创建独立的报告目录
+            _progress('reporting', 80)
             allure_report_path = PytestExecutorService._generate_allure_report(execution_timestamp)
 
-            # 5. 立即创建测试报告记录（不解析详细数据）
+            # 5. 读取 allure-results 中的用例结果，在同一个事务中创建测试报告和用例执行结果
+            _progress('saving', 90)
             report_id = None
             # 将test_file_path转换为相对路径（相对于app目录）
             # 使用基于当前文件位置的路径计算
@@ -124,11 +216,27 @@ class PytestExecutorService:
                             'returncode': result.get('returncode', -1),
                             'test_cases_count': len(test_cases)
                         }
+                        if selection_summary['mode'] != 'all':
+                            simplified_result['selection'] = selection_summary
+                        if rerun_summary:
+                            simplified_result['rerun'] = rerun_summary
+                        if result.get('log_files'):
+                            simplified_result['log_files'] = result['log_files']
+                        if result.get('shards'):
+                            simplified_result['shards'] = result['shards']
                         pytest_result_json = json.dumps(simplified_result, ensure_ascii=False)
                     except:
                         pass
                 
-                # 创建测试报告记录（状态为pending，等待解析）
+                # 解析allure结果（pytest异常退出没有结果时统计为0，报告状态为失败）
+                report_data = TestReportService.collect_allure_results(allure_results_dir)
+                report_data['module'] = module_name or report_data['module'] or ''
+                report_data['environment'] = environment_name or report_data['environment'] or ''
+                summary = report_data['summary']
+                success = bool(result and result.get('success')) and summary['total'] > 0 \
+                    and summary['failed'] == 0 and summary['error'] == 0
+
+                # 创建测试报告记录
                 test_report = TestReport(
                     report_name=report_name,
                     report_path=relative_allure_results_dir,
@@ -136,21 +244,23 @@ class PytestExecutorService:
                     execution_module=module_name or '',
                     execution_component=component_name or '',
                     execution_environment=environment_name or '',
-                    total_tests=len(test_cases),
-                    passed_tests=0,
-                    failed_tests=0,
-                    skipped_tests=0,
-                    error_tests=0,
-                    duration=0.0,
-                    report_data=None,  # 暂不解析详细数据
+                    total_tests=summary['total'],
+                    passed_tests=summary['passed'],
+                    failed_tests=summary['failed'],
+                    skipped_tests=summary['skipped'],
+                    error_tests=summary['error'],
+                    duration=summary['duration'],
+                    report_data=json.dumps(report_data, ensure_ascii=False),
                     pytest_result=pytest_result_json,  # 保存Pytest执行结果
-                    status='pending',  # 状态为pending，等待解析
+                    status='success' if success else 'failed',
                     test_file_path=relative_test_file_path,
                     test_file_name=os.path.basename(test_file_path),
                     created_by=current_user.id if current_user else None,
                     updated_by=current_user.id if current_user else None
                 )
                 db.session.add(test_report)
+                db.session.flush()
+                TestReportService.save_case_results(test_report, report_data['cases'], test_cases)
                 db.session.commit()
                 report_id = test_report.id
                 print(f'成功创建测试报告记录，report_id: {report_id}, report_name: {report_name}')
@@ -164,43 +274,22 @@ class PytestExecutorService:
                 raise APIException(error_msg, 500, {'error': error_trace})
 
             # 6. 发送测试结果通知（异步发送，不阻塞主流程）
+            _progress('notifying', 95)
             try:
-                # 解析测试结果，获取通过/失败数量
-                passed_tests = 0
-                failed_tests = 0
-                skipped_tests = 0
-                total_tests = len(test_cases)
-                
-                # 从pytest结果中解析（如果可能）
-                if result and result.get('stdout'):
-                    stdout = result.get('stdout', '')
-                    # 尝试从stdout中解析测试结果
-                    # pytest输出格式示例: "3 passed, 1 failed, 1 skipped"
-                    import re
-                    passed_match = re.search(r'(\d+)\s+passed', stdout)
-                    failed_match = re.search(r'(\d+)\s+failed', stdout)
-                    skipped_match = re.search(r'(\d+)\s+skipped', stdout)
-                    
-                    if passed_match:
-                        passed_tests = int(passed_match.group(1))
-                    if failed_match:
-                        failed_tests = int(failed_match.group(1))
-                    if skipped_match:
-                        skipped_tests = int(skipped_match.group(1))
-                
                 # 构建测试结果数据
                 test_result_data = {
                     'title': 'Pytest测试执行完成',
                     'component_name': component_name or '',
                     'module_name': module_name or '',
                     'environment_name': environment_name or '',
-                    'total_tests': total_tests,
-                    'passed_tests': passed_tests,
-                    'failed_tests': failed_tests,
-                    'skipped_tests': skipped_tests,
-                    'error_tests': 0,
-                    'duration': 0.0,  # 可以从报告中解析
-                    'success': result.get('success', False) if result else False,
+                    'total_tests': test_report.total_tests,
+                    'passed_tests': test_report.passed_tests,
+                    'failed_tests': test_report.failed_tests,
+                    'skipped_tests': test_report.skipped_tests,
+                    'error_tests': test_report.error_tests,
+                    'flaky_tests': summary.get('flaky', 0),
+                    'duration': test_report.duration,
+                    'success': test_report.status == 'success',
                     'report_id': report_id,
                     'report_url': f'/api/test-reports/{report_id}/allure/index.html' if report_id else ''
                 }
@@ -222,17 +311,32 @@ class PytestExecutorService:
                     'test_file_path': relative_test_file_path,
                     'pytest_result': result,
                     'allure_report_path': allure_report_path,
-                    'report_id': report_id
+                    'report_id': report_id,
+                    'selection': selection_summary,
+                    'rerun': rerun_summary
                 }
             }
 
-        except APIException:
+        except (APIException, PytestExecutionCancelled):
             raise
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
             raise APIException(f'执行失败: {str(e)}', 500, {'error': error_trace})
 
+    @staticmethod
+    def _normalize_shards(shards):
+        """校验分片数量，不超过 PYTEST_MAX_SHARDS"""
+        if shards in (None, ''):
+            return 1
+        try:
+            shards = int(shards)
+        except (TypeError, ValueError):
+            raise APIException('shards 必须为整数', 400)
+        if shards < 1:
+            raise APIException('shards 必须大于0', 400)
+        return min(shards, current_app.config.get('PYTEST_MAX_SHARDS', 8))
+
     @staticmethod
     def _get_test_cases_by_filter(component_name=None, module_name=None, environment_name=None):
         """根据模块名称、组件名称和环境筛选测试用例"""
@@ -261,8 +365,8 @@ class PytestExecutorService:
         return test_cases
 
     @staticmethod
-    def _generate_test_code(test_cases, component_name, module_name, environment_name):
-        """生成Pytest测试代码"""
+    def _generate_test_code(test_cases, component_name, module_name, environment_name, name_suffix=''):
+        """生成Pytest测试代码（相同用例和环境配置复用已生成的文件）"""
         # 确保testcase目录存在
         testcase_dir = PytestExecutorService._get_testcase_dir()
         os.makedirs(testcase_dir, exist_ok=True)
@@ -272,50 +376,48 @@ class PytestExecutorService:
         if environment_name:
             env_config = TestEnvironmentService.get_environment_config(environment_name)
 
-        # 调用 test_case_generator 生成测试代码
-        test_file_path = generate_pytest_code_from_test_cases(
+        # 调用 test_case_generator 生成测试代码，缓存命中时直接返回已有文件
+        test_file_path, cache_hit = pytest_code_cache.get_or_generate(
             test_cases=test_cases,
             component_name=component_name or '',
             module_name=module_name or '',
             environment_name=environment_name or '',
             env_config=env_config or {},
-            output_dir=testcase_dir
+            output_dir=testcase_dir,
+            name_suffix=name_suffix
         )
+        if cache_hit:
+            print(f'复用已生成的测试文件: {test_file_path}')
 
         return test_file_path
 
     @staticmethod
-    def _run_pytest(test_file_path, environment_name, execution_timestamp):
-        """执行Pytest测试"""
-        autotest_dir = PytestExecutorService._get_autotest_dir()
-        testcase_dir = PytestExecutorService._get_testcase_dir()
-        # 测试报告写到 backend/app/autotest/report 目录下
+    def _get_allure_results_dir(execution_timestamp):
+        """获取本次执行的 allure-results 目录（测试报告写到 backend/app/autotest/report/<时间戳> 下）"""
         report_dir = PytestExecutorService._get_report_dir()
-        # 使用时间戳创建独立的报告目录，下面包含 allure-results
         timestamp_dir = os.path.join(report_dir, execution_timestamp)
         allure_results_dir = os.path.join(timestamp_dir, 'allure-results')
         os.makedirs(allure_results_dir, exist_ok=True)
+        return allure_results_dir
+
+    @staticmethod
+    def _build_pytest_command(test_file_path, allure_results_dir, clean_alluredir=True, events_path=None,
+                              shard_index=None):
+        """
+        构建pytest命令，返回 (命令, 环境变量, 工作目录)
+        :param test_file_path: 测试文件路径，或要执行的用例列表（绝对路径的 nodeid，失败重跑时使用）
+        :param events_path: 实时事件文件路径，指定时加载 pytest_live_plugin 插件
+        :param shard_index: 分片序号，写入事件中用于区分分片
+        """
+        autotest_dir = PytestExecutorService._get_autotest_dir()
+        testcase_dir = PytestExecutorService._get_testcase_dir()
 
         # 执行pytest - 使用当前test-platform项目的Python解释器（sys.executable）
         python_cmd = sys.executable
-        
-        # 验证Python解释器是否可用
-        try:
-            # 检查Python版本
-            version_result = subprocess.run(
-                [python_cmd, '--version'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if version_result.returncode != 0:
-                raise FileNotFoundError(f'Python解释器不可用: {python_cmd}')
-        except FileNotFoundError as e:
-            raise APIException(f'未找到可用的Python解释器: {str(e)}', 500)
-        
+
         # 确保测试文件路径是绝对路径
-        if not os.path.isabs(test_file_path):
-            test_file_path = os.path.join(testcase_dir, test_file_path)
+        targets = list(test_file_path) if isinstance(test_file_path, (list, tuple)) else [test_file_path]
+        targets = [target if os.path.isabs(target) else os.path.join(testcase_dir, target) for target in targets]
         
         pytest_ini_path = os.path.join(autotest_dir, 'pytest.ini')
         if not os.path.exists(pytest_ini_path):
@@ -338,12 +440,11 @@ class PytestExecutorService:
                 python_cmd,
                 '-m',
                 'pytest',
-                test_file_path,
+                *targets,
                 f'--rootdir={autotest_dir}',  # 明确指定根目录
                 '--import-mode=importlib',  # 使用 importlib 模式，避免路径冲突
                 '-c', pytest_ini_path,  # 明确指定配置文件
                 f'--alluredir={allure_results_dir}',
-                '--clean-alluredir',
                 '-v',
                 '-s'
             ]
@@ -364,41 +465,199 @@ class PytestExecutorService:
                 python_cmd,
                 '-m',
                 'pytest',
-                test_file_path,
+                *targets,
                 f'--rootdir={autotest_dir}',
                 '-c', pytest_ini_path,
                 f'--alluredir={allure_results_dir}',
-                '--clean-alluredir',
                 '-v',
                 '-s'
             ]
             env = dict(os.environ, PYTEST_CURRENT_TEST='')
             cwd = autotest_dir
 
-        try:
-            result = subprocess.run(
-                pytest_cmd,
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                timeout=3600,  # 1小时超时
-                env=env  # 使用配置好的环境变量
-            )
+        if clean_alluredir:
+            pytest_cmd.insert(pytest_cmd.index('-v'), '--clean-alluredir')
+        if events_path:
+            # 插件所在目录加入 PYTHONPATH，通过 -p 按模块名加载
+            plugin_dir = os.path.dirname(os.path.abspath(pytest_live_plugin.__file__))
+            pythonpath = env.get('PYTHONPATH', '')
+            env['PYTHONPATH'] = f'{pythonpath}{os.pathsep}{plugin_dir}' if pythonpath else plugin_dir
+            env[pytest_live_plugin.EVENTS_FILE_ENV] = events_path
+            if shard_index:
+                env[pytest_live_plugin.SHARD_INDEX_ENV] = str(shard_index)
+            pytest_cmd.insert(pytest_cmd.index('-v'), '-p')
+            pytest_cmd.insert(pytest_cmd.index('-v'), 'pytest_live_plugin')
+        return pytest_cmd, env, cwd
 
-            return {
-                'returncode': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'success': result.returncode == 0
-            }
-        except subprocess.TimeoutExpired:
-            return {
-                'returncode': -1,
-                'stdout': '',
-                'stderr': '测试执行超时',
-                'success': False
-            }
+    @staticmethod
+    def _run_pytest(test_file_path, environment_name, execution_timestamp, cancel_check=None, event_callback=None):
+        """执行Pytest测试（cancel_check 返回 True 时终止进程）"""
+        result = PytestExecutorService._run_pytest_processes([test_file_path], execution_timestamp,
+                                                             cancel_check=cancel_check, event_callback=event_callback)
+        result.pop('shards', None)
+        return result
+
+    @staticmethod
+    def _run_pytest_shards(shard_files, execution_timestamp, cancel_check=None, event_callback=None):
+        """并行执行多个分片的Pytest测试，返回合并后的结果"""
+        return PytestExecutorService._run_pytest_processes(shard_files, execution_timestamp,
+                                                           cancel_check=cancel_check, event_callback=event_callback)
+
+    @staticmethod
+    def _read_case_outcomes(events_path):
+        """读取事件文件中每个用例最后一次执行的结果，返回 {allure 标题: (nodeid, 结果)}"""
+        reader = PytestEventReader(events_path)
+        outcomes = {}
+        while True:
+            events = reader.read()
+            if not events:
+                break
+            for _, event in events:
+                if event.get('event') == 'finished' and event.get('title'):
+                    outcomes[event['title']] = (event['nodeid'], event['outcome'])
+        return outcomes
+
+    @staticmethod
+    def _rerun_failed_cases(test_cases, execution_timestamp, rerun, cancel_check=None, event_callback=None):
+        """
+        失败重跑：首轮执行结束后按用例的重跑策略，在同一个执行目录中逐轮重跑失败（failed/error）的用例
+        - 第 N 轮只重跑仍然失败、且重跑策略允许至少 N 次重跑的用例；有顺序依赖的模块整体重跑，保持原有执行顺序
+        - 每轮开始前退避等待 退避秒数 * 2^(N-1)（取本轮用例中最大的退避秒数），等待期间响应取消请求
+        - 重跑结果追加写入同一个 allure-results，入库时按用例合并多次执行结果（见 TestReportService.merge_attempts）
+        :return: 重跑摘要，没有需要重跑的用例时返回 None
+        """
+        policies = PytestRerunService.resolve(test_cases, rerun)
+        if not policies:
+            return None
+        output_dir = os.path.dirname(PytestExecutorService._get_allure_results_dir(execution_timestamp))
+        events_path = os.path.join(output_dir, PytestLiveService.EVENTS_FILE)
+        autotest_dir = PytestExecutorService._get_autotest_dir()
+        dependent_modules = {case.test_module_name for case in test_cases
+                             if PytestShardService.is_order_dependent(case)}
+
+        def _failed_cases():
+            return [case for case in test_cases
+                    if outcomes.get(PytestShardService.case_key(case), (None, None))[1]
+                    in PytestExecutorService.RERUN_OUTCOMES]
+
+        outcomes = PytestExecutorService._read_case_outcomes(events_path)
+        initially_failed = _failed_cases()
+        passes = []
+        completed = True
+        for attempt in range(1, max(max_reruns for max_reruns, _ in policies.values()) + 1):
+            candidates = [case for case in _failed_cases() if policies.get(case.id, (0, 0))[0] >= attempt]
+            if not candidates:
+                break
+            candidate_ids = {case.id for case in candidates}
+            modules = {case.test_module_name for case in candidates if case.test_module_name in dependent_modules}
+            keys = [PytestShardService.case_key(case) for case in test_cases
+                    if case.id in candidate_ids or case.test_module_name in modules]
+            targets = [os.path.join(autotest_dir, outcomes[key][0]) for key in keys if key in outcomes]
+
+            backoff = max(policies[case.id][1] for case in candidates) * 2 ** (attempt - 1)
+            print(f'第 {attempt} 轮失败重跑: {len(candidates)} 个失败用例，共执行 {len(targets)} 个用例，退避 {backoff} 秒')
+            PytestExecutorService._wait_backoff(backoff, cancel_check)
+            result = PytestExecutorService._run_pytest_processes([targets], execution_timestamp,
+                                                                 cancel_check=cancel_check,
+                                                                 event_callback=event_callback,
+                                                                 rerun_attempt=attempt)
+            outcomes = PytestExecutorService._read_case_outcomes(events_path)
+            recovered = [case for case in candidates
+                         if outcomes.get(PytestShardService.case_key(case), (None, None))[1] == 'passed']
+            passes.append({
+                'attempt': attempt,
+                'cases_count': len(targets),
+                'failed_before': len(candidates),
+                'recovered': len(recovered),
+                'backoff_seconds': backoff,
+                'returncode': result.get('returncode'),
+                'log_file': (result.get('log_files') or [None])[0]
+            })
+            if result.get('returncode') not in (0, 1):
+                # 重跑进程异常退出或超时，不再继续重跑
+                completed = False
+                break
+
+        still_failed = _failed_cases()
+        still_failed_ids = {case.id for case in still_failed}
+        return {
+            'initially_failed': len(initially_failed),
+            'recovered': sum(1 for case in initially_failed if case.id not in still_failed_ids),
+            'still_failed': len(still_failed),
+            'completed': completed,
+            'passes': passes
+        }
+
+    @staticmethod
+    def _wait_backoff(seconds, cancel_check=None):
+        """重跑前的退避等待，每隔 CANCEL_CHECK_INTERVAL 秒检查一次取消请求"""
+        deadline = time.time() + seconds
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, PytestExecutorService.CANCEL_CHECK_INTERVAL))
+            if cancel_check and cancel_check():
+                raise PytestExecutionCancelled('测试执行已取消')
+
+    @staticmethod
+    def _run_pytest_processes(test_files, execution_timestamp, cancel_check=None, event_callback=None,
+                              rerun_attempt=None):
+        """
+        启动一个或多个pytest进程并等待结束
+        - test_files 的每一项为一个进程执行的测试文件路径，或用例 nodeid 列表（失败重跑）
+        - rerun_attempt 为失败重跑的轮次，此时保留已有的 allure-results 和 events.jsonl，只读取本轮新增的事件，
+          输出写入 rerun-N.log / rerun-N.err
+        - 所有进程写入同一个 allure-results 目录（执行前清空一次，命令不再带 --clean-alluredir）
+        - 输出直接写入执行目录下的 pytest.log / pytest.err（分片为 shard-N.log / shard-N.err），不在内存中保留完整输出，
+          返回结果中只包含输出末尾 OUTPUT_TAIL_BYTES 字节
+        - 启用 PYTEST_RUNNER_POOL_ENABLED 时在常驻进程池中执行（进程内 pytest.main），否则启动 python -m pytest 子进程
+        - pytest_live_plugin 把用例事件写入 events.jsonl，等待期间增量读取并交给 event_callback(events)
+        - summary 为实时事件中各结果（passed/failed/skipped/error）的用例数合计，分片各自的计数在 shards 中
+        """
+        allure_results_dir = PytestExecutorService._get_allure_results_dir(execution_timestamp)
+        output_dir = os.path.dirname(allure_results_dir)
+        events_path = os.path.join(output_dir, PytestLiveService.EVENTS_FILE)
+        events_offset = 0
+        if rerun_attempt:
+            events_offset = os.path.getsize(events_path) if os.path.exists(events_path) else 0
+        else:
+            shutil.rmtree(allure_results_dir, ignore_errors=True)
+            os.makedirs(allure_results_dir, exist_ok=True)
+            if os.path.exists(events_path):
+                os.remove(events_path)
+
+        sharded = len(test_files) > 1
+        processes = []
+        try:
+            for index, test_file_path in enumerate(test_files, start=1):
+                pytest_cmd, env, cwd = PytestExecutorService._build_pytest_command(
+                    test_file_path, allure_results_dir, clean_alluredir=False, events_path=events_path,
+                    shard_index=index if sharded else None)
+                if rerun_attempt:
+                    name = f'rerun-{rerun_attempt}'
+                else:
+                    name = f'shard-{index}' if sharded else 'pytest'
+                stdout_path = os.path.join(output_dir, f'{name}.log')
+                stderr_path = os.path.join(output_dir, f'{name}.err')
+                with open(stdout_path, 'w', encoding='utf-8') as stdout_file, \
+                        open(stderr_path, 'w', encoding='utf-8') as stderr_file:
+                    if pytest_runner_pool.enabled:
+                        # 常驻进程以追加方式写入这里创建的日志文件，命令中去掉 python -m pytest
+                        process = pytest_runner_pool.run(pytest_cmd[3:], env, cwd, stdout_path, stderr_path,
+                                                         PytestExecutorService._target_files(test_file_path))
+                    else:
+                        process = subprocess.Popen(pytest_cmd, cwd=cwd, stdout=stdout_file, stderr=stderr_file,
+                                                   text=True, env=env)
+                processes.append({'index': index, 'test_file_path': test_file_path, 'process': process,
+                                  'stdout_path': stdout_path, 'stderr_path': stderr_path, 'started': time.time()})
+        except APIException:
+            PytestExecutorService._kill_processes(processes)
+            PytestExecutorService._release_processes(processes)
+            raise
         except Exception as e:
+            PytestExecutorService._kill_processes(processes)
+            PytestExecutorService._release_processes(processes)
             return {
                 'returncode': -1,
                 'stdout': '',
@@ -406,6 +665,118 @@ class PytestExecutorService:
                 'success': False
             }
 
+        # 等待所有进程结束，期间读取实时事件、检查取消请求和超时
+        reader = PytestEventReader(events_path, events_offset)
+        shard_summaries = {}
+        started = time.time()
+        last_cancel_check = started
+        timed_out = False
+        try:
+            while True:
+                running = False
+                for item in processes:
+                    if item['process'].poll() is None:
+                        running = True
+                    elif 'duration' not in item:
+                        item['duration'] = round(time.time() - item['started'], 3)
+
+                events = reader.read()
+                for _, event in events:
+                    if event.get('event') == 'finished':
+                        counts = shard_summaries.setdefault(event.get('shard') or 1, {})
+                        counts[event['outcome']] = counts.get(event['outcome'], 0) + 1
+                if events and event_callback:
+                    event_callback(events)
+                if not running:
+                    break
+
+                now = time.time()
+                if cancel_check and now - last_cancel_check >= PytestExecutorService.CANCEL_CHECK_INTERVAL:
+                    last_cancel_check = now
+                    if cancel_check():
+                        PytestExecutorService._kill_processes(processes)
+                        raise PytestExecutionCancelled('测试执行已取消')
+                if now - started > PytestExecutorService.PYTEST_TIMEOUT:
+                    PytestExecutorService._kill_processes(processes)
+                    timed_out = True
+                    break
+                time.sleep(PytestExecutorService.EVENT_POLL_INTERVAL)
+        finally:
+            PytestExecutorService._release_processes(processes)
+
+        tail_bytes = PytestExecutorService.OUTPUT_TAIL_BYTES // len(processes)
+        stdout_parts = []
+        stderr_parts = []
+        summary = {}
+        shard_results = []
+        for item in processes:
+            stdout = PytestLiveService.read_tail(item['stdout_path'], tail_bytes)
+            stderr = PytestLiveService.read_tail(item['stderr_path'], tail_bytes)
+            if sharded:
+                header = f'===== 分片 {item["index"]}/{len(processes)}: {PytestExecutorService._target_name(item["test_file_path"])} ====='
+                stdout = f'{header}\n{stdout}'
+                stderr = f'{header}\n{stderr}' if stderr else ''
+            stdout_parts.append(stdout)
+            if stderr:
+                stderr_parts.append(stderr)
+            process_summary = shard_summaries.get(item['index'], {})
+            for outcome, count in process_summary.items():
+                summary[outcome] = summary.get(outcome, 0) + count
+            shard_results.append({
+                'index': item['index'],
+                'test_file_name': PytestExecutorService._target_name(item['test_file_path']),
+                'log_file': os.path.basename(item['stdout_path']),
+                'returncode': item['process'].returncode,
+                'duration': item.get('duration'),
+                'summary': process_summary
+            })
+
+        returncodes = [item['returncode'] for item in shard_results]
+        if sharded:
+            summary_line = ', '.join(f'{count} {outcome}' for outcome, count in summary.items())
+            stdout_parts.append(f'===== 合并结果: {summary_line or "无结果"} in {round(time.time() - started, 2)}s =====')
+        if timed_out:
+            stderr_parts.append('测试执行超时')
+        return {
+            'returncode': -1 if timed_out else max(returncodes, key=abs),
+            'stdout': '\n'.join(stdout_parts),
+            'stderr': '\n'.join(stderr_parts),
+            'success': not timed_out and all(code == 0 for code in returncodes),
+            'summary': summary,
+            'log_files': [item['log_file'] for item in shard_results],
+            'shards': shard_results
+        }
+
+    @staticmethod
+    def _target_files(targets):
+        """执行目标（测试文件路径或 nodeid 列表）对应的测试文件路径"""
+        targets = targets if isinstance(targets, (list, tuple)) else [targets]
+        return list(dict.fromkeys(target.split('::')[0] for target in targets))
+
+    @staticmethod
+    def _target_name(targets):
+        return ', '.join(os.path.basename(path) for path in PytestExecutorService._target_files(targets))
+
+    @staticmethod
+    def _kill_processes(processes):
+        """终止仍在执行的 pytest 进程并回收资源（已结束的进程跳过，常驻进程执行完任务后不会退出）"""
+        for item in processes:
+            process = item['process']
+            if process.poll() is not None:
+                continue
+            process.kill()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+
+    @staticmethod
+    def _release_processes(processes):
+        """常驻进程执行结束后放回进程池（被终止或需要回收的进程由进程池丢弃）"""
+        for item in processes:
+            if not isinstance(item['process'], subprocess.Popen):
+                pytest_runner_pool.release(item['process'])
+
     @staticmethod
     def _generate_allure_report(execution_timestamp):
         """生成Allure报告"""
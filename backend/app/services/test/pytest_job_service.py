@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 异步执行任务服务（任务入库排队，所有 worker 进程共享有界的执行名额）
+"""
+
+import fcntl
+import json
+import os
+import socket
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import func, update
+
+from ...core.database import db, datetime, tz_beijing
+from ...core.exceptions import APIException
+from ...models.auth import User
+from ...models.test.pytest_job_model import PytestJob
+from ...utils.job_util import BackgroundJobRunner, JobStatus
+from .pytest_code_cache_service import pytest_code_cache
+from .pytest_executor_service import PytestExecutionCancelled, PytestExecutorService
+from .pytest_runner_pool import pytest_runner_pool
+from .pytest_rerun_service import PytestRerunService
+from .pytest_selection_service import PytestSelectionService
+
+
+class PytestJobService:
+    """
+    Pytest 异步执行任务服务
+    - 提交接口只写入一条 queued 状态的任务记录并立即返回任务ID
+    - 每个 worker 进程启动一个调度线程，轮询领取排队任务；领取在文件锁内完成：
+      统计租约未过期的 running 任务数，未达到 PYTEST_JOB_MAX_CONCURRENCY 时用条件 UPDATE 抢占最早的任务，
+      因此所有 gunicorn worker 合计同时执行的任务数有上限
+    - 执行中的任务由所在进程定期续约，租约过期（进程退出或被杀）的任务标记为失败，释放执行名额
+    - 取消排队任务直接标记为 cancelled；取消执行中的任务写入 cancel_requested，执行进程检测到后终止 pytest 进程
+    """
+
+    DEFAULT_MAX_CONCURRENCY = 2
+    DEFAULT_LEASE_TIMEOUT = 120
+    DEFAULT_POLL_INTERVAL = 2
+    # 执行结果中保留的 stdout/stderr 末尾字符数
+    OUTPUT_TAIL_CHARS = 4000
+
+    def __init__(self):
+        self.runner = BackgroundJobRunner('pytest-job', max_workers=self.DEFAULT_MAX_CONCURRENCY)
+        self.max_concurrency = self.DEFAULT_MAX_CONCURRENCY
+        self.lease_timeout = self.DEFAULT_LEASE_TIMEOUT
+        self.poll_interval = self.DEFAULT_POLL_INTERVAL
+        self.lock_file = os.path.join(tempfile.gettempdir(), 'test_platform_pytest_job.lock')
+        self.dispatcher_enabled = True
+        self.app = None
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._dispatcher = None
+        self._dispatcher_pid = None
+        self._wakeup = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.max_concurrency = app.config.get('PYTEST_JOB_MAX_CONCURRENCY', self.max_concurrency)
+        self.lease_timeout = app.config.get('PYTEST_JOB_LEASE_TIMEOUT', self.lease_timeout)
+        self.poll_interval = app.config.get('PYTEST_JOB_POLL_INTERVAL', self.poll_interval)
+        self.dispatcher_enabled = app.config.get('PYTEST_JOB_DISPATCHER_ENABLED', self.dispatcher_enabled)
+        lock_dir = app.config.get('PYTEST_JOB_LOCK_DIR')
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+            self.lock_file = os.path.join(lock_dir, 'test_platform_pytest_job.lock')
+        self.runner.init_app(app, self.max_concurrency)
+        # 调度线程只在处理请求的进程中启动（gunicorn worker 见 gunicorn.conf.py 的 post_worker_init），
+        # 迁移脚本和 flask 命令行同样会调用 create_app，不能在这里启动，否则短暂运行的进程会领取任务后退出
+        app.before_request(self.start_dispatcher)
+
+    @property
+    def owner(self):
+        """当前进程标识，作为租约持有者"""
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def submit(self, environment_name, component_name=None, module_name=None, options=None, current_user=None):
+        """
+        提交 Pytest 执行任务
+        :param options: 执行选项，原样保存在任务记录中
+        :return: 任务状态
+        """
+        if not environment_name:
+            raise APIException('请选择测试环境', 400)
+        if options and not isinstance(options, dict):
+            raise APIException('options 必须为对象', 400)
+        # 提交时校验分片、用例选择和失败重跑参数，避免排队后才失败
+        PytestExecutorService._normalize_shards((options or {}).get('shards'))
+        PytestSelectionService.normalize((options or {}).get('selection'))
+        PytestRerunService.normalize((options or {}).get('rerun'))
+
+        job = PytestJob(
+            component_name=component_name or '',
+            module_name=module_name or '',
+            environment_name=environment_name,
+            status=JobStatus.QUEUED,
+            progress=0,
+            options=json.dumps(options, ensure_ascii=False) if options else None,
+            created_by=current_user.id if current_user else None,
+            updated_by=current_user.id if current_user else None
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.start_dispatcher()
+        self._wakeup.set()
+        return self._job_dict(job)
+
+    def get_job(self, job_id):
+        job = PytestJob.query.filter_by(id=job_id, is_active=True).first()
+        if not job:
+            raise APIException('执行任务不存在', 404)
+        return job
+
+    def get_job_status(self, job_id):
+        """获取任务状态，排队中的任务附带前面等待的任务数量"""
+        return self._job_dict(self.get_job(job_id))
+
+    def list_jobs(self, page=1, per_page=10, status=None):
+        query = PytestJob.query.filter_by(is_active=True)
+        if status:
+            query = query.filter(PytestJob.status == status)
+        pagination = query.order_by(PytestJob.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        return {
+            'data': [job.to_dict() for job in pagination.items],
+            'total': pagination.total,
+            'page': page,
+            'per_page': per_page
+        }
+
+    def cancel(self, job_id, current_user=None):
+        """取消任务：排队任务直接取消，执行中的任务由执行进程在下一次检查时终止"""
+        job = self.get_job(job_id)
+        if job.status == JobStatus.QUEUED:
+            db.session.execute(
+                update(PytestJob)
+                .where(PytestJob.id == job.id, PytestJob.status == JobStatus.QUEUED)
+                .values(status=JobStatus.CANCELLED, cancel_requested=True, finished_at=self._now(),
+                        updated_by=current_user.id if current_user else None)
+            )
+            db.session.commit()
+            db.session.refresh(job)
+        if job.status == JobStatus.RUNNING and not job.cancel_requested:
+            job.cancel_requested = True
+            job.updated_by = current_user.id if current_user else None
+            db.session.commit()
+        return self._job_dict(job)
+
+    def _job_dict(self, job):
+        result = job.to_dict()
+        if job.status == JobStatus.QUEUED:
+            result['queue_position'] = PytestJob.query.filter(
+                PytestJob.status == JobStatus.QUEUED,
+                PytestJob.is_active.is_(True),
+                PytestJob.id < job.id
+            ).count() + 1
+        return result
+
+    # ---------------------- 调度 ----------------------
+
+    def start_dispatcher(self):
+        """启动当前进程的调度线程（fork 出的子进程需要重新启动）"""
+        if not self.dispatcher_enabled or self.app is None:
+            return
+        pid = os.getpid()
+        if self._dispatcher is not None and self._dispatcher_pid == pid:
+            return
+        self._dispatcher_pid = pid
+        with self._active_lock:
+            self._active = set()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='pytest-job-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self._renew_leases()
+                    self._expire_leases()
+                    while self._claim_next():
+                        pass
+                pytest_code_cache.maybe_cleanup(PytestExecutorService._get_testcase_dir())
+                pytest_runner_pool.ensure_warm()
+            except Exception as e:
+                print(f'Pytest任务调度失败: {str(e)}')
+
+    def _renew_leases(self):
+        """为当前进程正在执行的任务续约"""
+        with self._active_lock:
+            active = list(self._active)
+        if not active:
+            return
+        db.session.execute(
+            update(PytestJob)
+            .where(PytestJob.id.in_(active), PytestJob.status == JobStatus.RUNNING, PytestJob.lease_owner == self.owner)
+            .values(lease_expires_at=self._lease_deadline())
+        )
+        db.session.commit()
+
+    def _expire_leases(self):
+        """租约过期的执行中任务视为执行进程已退出，标记为失败"""
+        now = self._now()
+        db.session.execute(
+            update(PytestJob)
+            .where(PytestJob.status == JobStatus.RUNNING, PytestJob.lease_expires_at < now)
+            .values(status=JobStatus.FAILED, finished_at=now, lease_owner=None,
+                    error_message='执行进程已退出，任务租约过期')
+        )
+        db.session.commit()
+
+    def _claim_next(self):
+        """在当前进程还有空闲线程且全局执行名额未满时领取一个排队任务，返回是否领取成功"""
+        with self._active_lock:
+            if len(self._active) >= self.runner.max_workers:
+                return False
+
+        with self._file_lock():
+            now = self._now()
+            running = db.session.query(func.count(PytestJob.id)).filter(
+                PytestJob.status == JobStatus.RUNNING,
+                PytestJob.lease_expires_at >= now
+            ).scalar()
+            if running >= self.max_concurrency:
+                return False
+
+            job_id = db.session.query(PytestJob.id).filter(
+                PytestJob.status == JobStatus.QUEUED,
+                PytestJob.is_active.is_(True)
+            ).order_by(PytestJob.id).limit(1).scalar()
+            if job_id is None:
+                return False
+
+            claimed = db.session.execute(
+                update(PytestJob)
+                .where(PytestJob.id == job_id, PytestJob.status == JobStatus.QUEUED)
+                .values(status=JobStatus.RUNNING, phase='starting', lease_owner=self.owner,
+                        lease_expires_at=self._lease_deadline(), started_at=now)
+            ).rowcount
+            db.session.commit()
+
+        if not claimed:
+            # 其他主机上的进程已领取该任务，继续尝试下一个
+            return True
+        with self._active_lock:
+            self._active.add(job_id)
+        self.runner.submit(self._run, job_id)
+        return True
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程文件锁，保证统计执行数与领取任务之间没有其他 worker 进程插入"""
+        with open(self.lock_file, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # ---------------------- 执行 ----------------------
+
+    def _run(self, job_id):
+        """在后台线程中执行任务"""
+        try:
+            job = db.session.get(PytestJob, job_id)
+            if job.cancel_requested:
+                self._finish(job_id, JobStatus.CANCELLED)
+                return
+            current_user = db.session.get(User, job.created_by) if job.created_by else None
+            options = json.loads(job.options) if job.options else {}
+            # 执行目录在开始前确定并写入任务记录，实时输出接口据此读取日志和事件
+            execution_timestamp = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{job_id}"
+            output_dir = os.path.join(PytestExecutorService._get_report_dir(), execution_timestamp)
+            db.session.execute(update(PytestJob).where(PytestJob.id == job_id).values(output_dir=output_dir))
+            db.session.commit()
+            try:
+                data = PytestExecutorService.execute_pytest(
+                    component_name=job.component_name,
+                    module_name=job.module_name,
+                    environment_name=job.environment_name,
+                    current_user=current_user,
+                    progress_callback=lambda phase, progress: self._update_progress(job_id, phase, progress),
+                    cancel_check=lambda: self._is_cancel_requested(job_id),
+                    shards=options.get('shards'),
+                    selection=options.get('selection'),
+                    rerun=options.get('rerun'),
+                    execution_timestamp=execution_timestamp
+                )['data']
+            except PytestExecutionCancelled:
+                db.session.rollback()
+                self._finish(job_id, JobStatus.CANCELLED)
+                return
+            except APIException as e:
+                db.session.rollback()
+                self._finish(job_id, JobStatus.FAILED, error_message=e.message)
+                return
+            except Exception as e:
+                db.session.rollback()
+                self._finish(job_id, JobStatus.FAILED, error_message=f'{str(e)}\n{traceback.format_exc()}')
+                return
+
+            pytest_result = dict(data.get('pytest_result') or {})
+            for field in ('stdout', 'stderr'):
+                pytest_result[field] = (pytest_result.get(field) or '')[-self.OUTPUT_TAIL_CHARS:]
+            data['pytest_result'] = pytest_result
+            self._finish(job_id, JobStatus.FINISHED, report_id=data.get('report_id'),
+                         result=json.dumps(data, ensure_ascii=False, default=str), progress=100)
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+            db.session.remove()
+            # 释放执行名额后立即尝试领取下一个任务
+            self._wakeup.set()
+
+    def _update_progress(self, job_id, phase, progress):
+        db.session.execute(
+            update(PytestJob)
+            .where(PytestJob.id == job_id)
+            .values(phase=phase, progress=progress, lease_expires_at=self._lease_deadline())
+        )
+        db.session.commit()
+
+    def _is_cancel_requested(self, job_id):
+        requested = db.session.query(PytestJob.cancel_requested).filter(PytestJob.id == job_id).scalar()
+        db.session.commit()
+        return bool(requested)
+
+    def _finish(self, job_id, status, **fields):
+        """结束任务；租约已过期被标记为失败的任务（不再由当前进程持有）不会被改回"""
+        db.session.execute(
+            update(PytestJob)
+            .where(PytestJob.id == job_id, PytestJob.status == JobStatus.RUNNING,
+                   PytestJob.lease_owner == self.owner)
+            .values(status=status, finished_at=self._now(), lease_expires_at=None, **fields)
+        )
+        db.session.commit()
+
+    def _lease_deadline(self):
+        return self._now() + timedelta(seconds=self.lease_timeout)
+
+    @staticmethod
+    def _now():
+        # 与 BaseModel 时间字段一致使用北京时间，去掉时区后用于数据库比较
+        return datetime.now(tz_beijing).replace(tzinfo=None)
+
+
+# 全局服务实例
+pytest_job_service = PytestJobService()
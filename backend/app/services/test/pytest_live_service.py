@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 实时输出服务（增量读取事件文件与日志文件，以 Server-Sent Events 推送执行进度）
+"""
+
+import codecs
+import json
+import os
+import time
+
+from ...core.database import db
+from ...core.exceptions import APIException
+from ...models.test.pytest_job_model import PytestJob
+from ...utils.job_util import JobStatus
+
+
+class PytestEventReader:
+    """按字节偏移增量读取 JSON 行事件文件，未写完的最后一行留到下次读取"""
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def read(self, max_bytes=1024 * 1024):
+        """
+        读取新增的事件
+        :return: [(该行结束处的字节偏移, 事件字典)]
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(max_bytes)
+        except FileNotFoundError:
+            return []
+
+        events = []
+        position = 0
+        while True:
+            end = data.find(b'\n', position)
+            if end < 0:
+                break
+            line = data[position:end]
+            position = end + 1
+            try:
+                event = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+            events.append((self.offset + position, event))
+        self.offset += position
+        return events
+
+
+class PytestLiveService:
+    """
+    Pytest 实时输出服务
+    - pytest 进程的 stdout/stderr 直接写入执行目录下的日志文件（pytest.log 或 shard-N.log），平台进程不在内存中保留完整输出
+    - pytest_live_plugin 插件把用例开始/结束事件追加写入执行目录下的 events.jsonl
+    - SSE 接口按字节偏移增量读取事件文件（事件 id 即偏移，断线后通过 Last-Event-ID 续传），
+      同时推送任务状态变化，可选推送日志增量；任务结束后发送 end 事件并关闭连接
+    """
+
+    EVENTS_FILE = 'events.jsonl'
+    LOG_SUFFIX = '.log'
+    POLL_INTERVAL = 0.5
+    # 事件流中查询任务状态的间隔（秒），低于读取事件文件的频率
+    STATUS_POLL_INTERVAL = 2
+    HEARTBEAT_INTERVAL = 15
+    # 每次推送的单个日志文件最大字节数
+    LOG_CHUNK_BYTES = 64 * 1024
+    MAX_LOG_READ_BYTES = 1024 * 1024
+
+    @staticmethod
+    def read_tail(path, max_bytes):
+        """读取文件末尾 max_bytes 字节（按 UTF-8 解码，截断处的半个字符替换掉）"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - max_bytes))
+                return f.read().decode('utf-8', errors='replace')
+        except FileNotFoundError:
+            return ''
+
+    @staticmethod
+    def _get_job(job_id):
+        job = PytestJob.query.filter_by(id=job_id, is_active=True).first()
+        if not job:
+            raise APIException('执行任务不存在', 404)
+        return job
+
+    @classmethod
+    def list_log_files(cls, output_dir):
+        if not output_dir or not os.path.isdir(output_dir):
+            return []
+        return sorted(name for name in os.listdir(output_dir) if name.endswith(cls.LOG_SUFFIX))
+
+    @classmethod
+    def read_job_log(cls, job_id, file_name=None, offset=0, limit=None):
+        """按字节偏移分段读取任务的日志文件"""
+        job = cls._get_job(job_id)
+        files = cls.list_log_files(job.output_dir)
+        if not files:
+            raise APIException('任务还没有输出日志', 404)
+        file_name = file_name or files[0]
+        if file_name not in files:
+            raise APIException(f'日志文件不存在: {file_name}', 404)
+
+        limit = min(int(limit or cls.LOG_CHUNK_BYTES), cls.MAX_LOG_READ_BYTES)
+        offset = max(0, int(offset or 0))
+        path = os.path.join(job.output_dir, file_name)
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(offset)
+            data = f.read(limit)
+        return {
+            'file': file_name,
+            'files': files,
+            'offset': offset,
+            'next_offset': offset + len(data),
+            'size': size,
+            'content': data.decode('utf-8', errors='replace'),
+            'finished': job.status in JobStatus.FINAL_STATUSES and offset + len(data) >= size
+        }
+
+    @classmethod
+    def stream_job_events(cls, job_id, offset=0, include_log=False):
+        """
+        生成任务的 SSE 事件流
+        :param offset: 事件文件的起始字节偏移（断线续传）
+        :param include_log: 是否同时推送日志增量
+        """
+        cls._get_job(job_id)
+
+        def _generate():
+            reader = None
+            log_offsets = {}
+            decoders = {}
+            job = None
+            last_state = None
+            last_status_check = 0
+            last_sent = time.time()
+            while True:
+                # 任务状态按 STATUS_POLL_INTERVAL 查询，事件文件和日志按 POLL_INTERVAL 读取
+                if time.time() - last_status_check >= cls.STATUS_POLL_INTERVAL:
+                    last_status_check = time.time()
+                    job = cls._load_job_state(job_id)
+                    state = (job.status, job.phase, job.progress)
+                    if state != last_state:
+                        last_state = state
+                        last_sent = time.time()
+                        yield cls._format_sse('status', {'job_id': job.id, 'status': job.status, 'phase': job.phase,
+                                                         'progress': job.progress})
+
+                final = job.status in JobStatus.FINAL_STATUSES
+                if job.output_dir:
+                    if reader is None:
+                        reader = PytestEventReader(os.path.join(job.output_dir, cls.EVENTS_FILE), offset)
+                    # 每次读取有大小上限；任务已结束时读到没有新内容为止，再发送 end 事件
+                    while True:
+                        sent = False
+                        for end_offset, event in reader.read():
+                            sent = True
+                            yield cls._format_sse(event.get('event', 'message'), event, event_id=end_offset)
+
+                        if include_log:
+                            for name in cls.list_log_files(job.output_dir):
+                                chunk = cls._read_log_increment(os.path.join(job.output_dir, name), name,
+                                                                log_offsets, decoders)
+                                if chunk:
+                                    sent = True
+                                    yield cls._format_sse('log', {'file': name, 'text': chunk})
+                        if sent:
+                            last_sent = time.time()
+                        if not final or not sent:
+                            break
+
+                if final:
+                    yield cls._format_sse('end', {'job_id': job.id, 'status': job.status, 'report_id': job.report_id,
+                                                  'error_message': job.error_message})
+                    return
+
+                if time.time() - last_sent >= cls.HEARTBEAT_INTERVAL:
+                    last_sent = time.time()
+                    yield ': ping\n\n'
+                time.sleep(cls.POLL_INTERVAL)
+
+        return _generate()
+
+    @staticmethod
+    def _load_job_state(job_id):
+        """
+        查询任务的最新状态（只查询需要的字段）
+        查询后归还数据库连接，事件流持续整个执行过程，不能一直占用连接池中的连接
+        """
+        try:
+            return (db.session.query(PytestJob.id, PytestJob.status, PytestJob.phase, PytestJob.progress,
+                                     PytestJob.output_dir, PytestJob.report_id, PytestJob.error_message)
+                    .filter(PytestJob.id == job_id)
+                    .one())
+        finally:
+            db.session.remove()
+
+    @classmethod
+    def _read_log_increment(cls, path, name, log_offsets, decoders):
+        start = log_offsets.get(name, 0)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                data = f.read(cls.LOG_CHUNK_BYTES)
+        except FileNotFoundError:
+            return ''
+        log_offsets[name] = start + len(data)
+        decoder = decoders.setdefault(name, codecs.getincrementaldecoder('utf-8')(errors='replace'))
+        return decoder.decode(data)
+
+    @staticmethod
+    def _format_sse(event, data, event_id=None):
+        lines = []
+        if event_id is not None:
+            lines.append(f'id: {event_id}')
+        lines.append(f'event: {event}')
+        lines.append(f'data: {json.dumps(data, ensure_ascii=False, default=str)}')
+        return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 失败重跑策略服务（按用例/模块配置重跑次数和退避时间，执行时解析每个用例的策略）
+"""
+
+from flask import current_app
+
+from ...core.database import db
+from ...core.exceptions import APIException
+from ...models.test.test_case_model import TestCase
+from ...models.test.test_rerun_policy_model import TestRerunPolicy
+
+
+class PytestRerunService:
+    """
+    Pytest 失败重跑策略服务
+    每个用例的重跑次数和退避时间按以下优先级确定：
+    1. 该用例的重跑策略
+    2. 用例所在模块的重跑策略（指定了组件名称的策略只匹配该组件的用例）
+    3. 本次执行的 rerun 选项 {'max_reruns': N, 'backoff_seconds': S}
+    4. 配置 PYTEST_RERUN_DEFAULT_MAX_RERUNS / PYTEST_RERUN_BACKOFF_SECONDS
+    执行选项 {'enabled': false} 可关闭本次执行的重跑；重跑次数不超过 PYTEST_RERUN_MAX_RERUNS
+    """
+
+    DEFAULT_MAX_RERUNS = 0
+    DEFAULT_BACKOFF_SECONDS = 2.0
+    MAX_RERUNS_LIMIT = 3
+
+    @classmethod
+    def _validate(cls, data, policy=None):
+        test_case_id = data.get('test_case_id', policy.test_case_id if policy else None)
+        module_name = data.get('module_name', policy.module_name if policy else None)
+        if not test_case_id and not (module_name and str(module_name).strip()):
+            raise APIException('请指定测试用例或模块名称', 400)
+        if test_case_id and not TestCase.query.filter_by(id=test_case_id, is_active=True).first():
+            raise APIException('测试用例不存在', 404)
+        limit = current_app.config.get('PYTEST_RERUN_MAX_RERUNS', cls.MAX_RERUNS_LIMIT)
+        try:
+            max_reruns = int(data.get('max_reruns', policy.max_reruns if policy else 1))
+            backoff_seconds = float(data.get('backoff_seconds', policy.backoff_seconds if policy
+                                             else cls.DEFAULT_BACKOFF_SECONDS))
+        except (TypeError, ValueError):
+            raise APIException('max_reruns 和 backoff_seconds 必须为数字', 400)
+        if not 0 <= max_reruns <= limit:
+            raise APIException(f'max_reruns 取值范围为 0 ~ {limit}', 400)
+        if backoff_seconds < 0:
+            raise APIException('backoff_seconds 不能小于0', 400)
+        return test_case_id, module_name, max_reruns, backoff_seconds
+
+    @staticmethod
+    def get_policies(module_name=None, test_case_id=None):
+        """获取重跑策略列表"""
+        query = TestRerunPolicy.query.filter_by(is_active=True)
+        if module_name:
+            query = query.filter(TestRerunPolicy.module_name == module_name)
+        if test_case_id:
+            query = query.filter(TestRerunPolicy.test_case_id == test_case_id)
+        return [policy.to_dict() for policy in query.order_by(TestRerunPolicy.id.desc()).all()]
+
+    @classmethod
+    def create_policy(cls, data, current_user=None):
+        """创建重跑策略"""
+        test_case_id, module_name, max_reruns, backoff_seconds = cls._validate(data)
+        policy = TestRerunPolicy(
+            test_case_id=test_case_id or None,
+            component_name=data.get('component_name') or None,
+            module_name=module_name if not test_case_id else None,
+            max_reruns=max_reruns,
+            backoff_seconds=backoff_seconds,
+            description=data.get('description'),
+            created_by=current_user.id if current_user else None,
+            updated_by=current_user.id if current_user else None
+        )
+        db.session.add(policy)
+        db.session.commit()
+        return policy.to_dict()
+
+    @classmethod
+    def update_policy(cls, policy_id, data, current_user=None):
+        """更新重跑策略"""
+        policy = TestRerunPolicy.query.filter_by(id=policy_id, is_active=True).first()
+        if not policy:
+            raise APIException('重跑策略不存在', 404)
+        test_case_id, module_name, max_reruns, backoff_seconds = cls._validate(data, policy)
+        policy.test_case_id = test_case_id or None
+        policy.module_name = module_name if not test_case_id else None
+        if 'component_name' in data:
+            policy.component_name = data['component_name'] or None
+        if 'description' in data:
+            policy.description = data['description']
+        policy.max_reruns = max_reruns
+        policy.backoff_seconds = backoff_seconds
+        policy.updated_by = current_user.id if current_user else None
+        db.session.commit()
+        return policy.to_dict()
+
+    @staticmethod
+    def delete_policy(policy_id):
+        """删除重跑策略（软删除）"""
+        policy = TestRerunPolicy.query.filter_by(id=policy_id, is_active=True).first()
+        if not policy:
+            raise APIException('重跑策略不存在', 404)
+        policy.is_active = False
+        db.session.commit()
+        return {'message': '重跑策略删除成功'}
+
+    @classmethod
+    def normalize(cls, rerun):
+        """校验执行时的 rerun 选项，返回 {'enabled', 'max_reruns', 'backoff_seconds'}"""
+        if rerun in (None, ''):
+            rerun = {}
+        elif isinstance(rerun, bool):
+            rerun = {'enabled': rerun}
+        elif isinstance(rerun, int):
+            rerun = {'max_reruns': rerun}
+        elif not isinstance(rerun, dict):
+            raise APIException('rerun 必须为对象', 400)
+
+        config = current_app.config
+        limit = config.get('PYTEST_RERUN_MAX_RERUNS', cls.MAX_RERUNS_LIMIT)
+        try:
+            max_reruns = rerun.get('max_reruns')
+            max_reruns = int(max_reruns) if max_reruns not in (None, '') else \
+                config.get('PYTEST_RERUN_DEFAULT_MAX_RERUNS', cls.DEFAULT_MAX_RERUNS)
+            backoff_seconds = rerun.get('backoff_seconds')
+            backoff_seconds = float(backoff_seconds) if backoff_seconds not in (None, '') else \
+                config.get('PYTEST_RERUN_BACKOFF_SECONDS', cls.DEFAULT_BACKOFF_SECONDS)
+        except (TypeError, ValueError):
+            raise APIException('max_reruns 和 backoff_seconds 必须为数字', 400)
+        if not 0 <= max_reruns <= limit:
+            raise APIException(f'max_reruns 取值范围为 0 ~ {limit}', 400)
+        if backoff_seconds < 0:
+            raise APIException('backoff_seconds 不能小于0', 400)
+        return {'enabled': rerun.get('enabled', True) is not False, 'max_reruns': max_reruns,
+                'backoff_seconds': backoff_seconds}
+
+    @classmethod
+    def resolve(cls, test_cases, rerun):
+        """
+        解析每个用例的重跑策略
+        :param rerun: normalize 返回的执行选项
+        :return: {测试用例主键: (最多重跑次数, 退避秒数)}，不重跑的用例不在结果中
+        """
+        if not rerun['enabled'] or not test_cases:
+            return {}
+        limit = current_app.config.get('PYTEST_RERUN_MAX_RERUNS', cls.MAX_RERUNS_LIMIT)
+        case_ids = [case.id for case in test_cases]
+        modules = {case.test_module_name for case in test_cases}
+        policies = TestRerunPolicy.query.filter(
+            TestRerunPolicy.is_active.is_(True),
+            db.or_(TestRerunPolicy.test_case_id.in_(case_ids), TestRerunPolicy.module_name.in_(modules))
+        ).order_by(TestRerunPolicy.id.asc()).all()
+        case_policies = {policy.test_case_id: policy for policy in policies if policy.test_case_id}
+        module_policies = {}
+        for policy in policies:
+            if policy.test_case_id:
+                continue
+            # 指定组件的策略优先于不限组件的策略
+            key = (policy.module_name, policy.component_name)
+            module_policies[key] = policy
+
+        resolved = {}
+        for case in test_cases:
+            policy = case_policies.get(case.id) \
+                or module_policies.get((case.test_module_name, case.component_name)) \
+                or module_policies.get((case.test_module_name, None))
+            if policy:
+                max_reruns, backoff_seconds = policy.max_reruns, policy.backoff_seconds
+            else:
+                max_reruns, backoff_seconds = rerun['max_reruns'], rerun['backoff_seconds']
+            max_reruns = min(max_reruns or 0, limit)
+            if max_reruns > 0:
+                resolved[case.id] = (max_reruns, backoff_seconds or 0)
+        return resolved
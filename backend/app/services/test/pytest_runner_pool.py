@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  常驻 Pytest 执行进程池（预先启动并导入依赖的进程，执行时不再付出解释器启动和导入的开销）
+"""
+
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+
+from ...autotest import pytest_runner
+
+
+class PooledPytestProcess:
+    """
+    池中的一个常驻执行进程
+    提供与 subprocess.Popen 相同的 poll/kill/wait/returncode，执行器按普通 pytest 进程处理
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.returncode = None
+        self.recycle = False
+        self._buffer = b''
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def submit(self, job):
+        self.returncode = None
+        self.process.stdin.write((json.dumps(job, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+
+    def poll(self):
+        """读取控制消息，任务结束后返回返回码，进程意外退出时返回进程退出码"""
+        if self.returncode is not None:
+            return self.returncode
+        for message in self._read_messages():
+            if message.get('event') == 'finished':
+                self.returncode = message.get('returncode', -1)
+                self.recycle = message.get('recycle', False)
+                return self.returncode
+        exit_code = self.process.poll()
+        if exit_code is not None:
+            # 进程退出前可能刚写完结束消息
+            for message in self._read_messages():
+                if message.get('event') == 'finished':
+                    self.returncode = message.get('returncode', -1)
+                    return self.returncode
+            self.returncode = exit_code if exit_code != 0 else -1
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """等待当前任务结束；任务已结束时立即返回，不等待常驻进程退出"""
+        if self.poll() is not None:
+            return self.returncode
+        self.process.wait(timeout=timeout)
+        return self.poll()
+
+    def kill(self):
+        """终止进程（被终止的进程不再放回池中）"""
+        self.recycle = True
+        if self.process.poll() is None:
+            self.process.kill()
+
+    def _read_messages(self):
+        messages = []
+        stdout = self.process.stdout
+        while select.select([stdout], [], [], 0)[0]:
+            chunk = os.read(stdout.fileno(), 65536)
+            if not chunk:
+                break
+            self._buffer += chunk
+        while b'\n' in self._buffer:
+            line, self._buffer = self._buffer.split(b'\n', 1)
+            try:
+                messages.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                continue
+        return messages
+
+
+class PytestRunnerPool:
+    """
+    常驻 Pytest 执行进程池
+    - 每个 worker 进程维护 PYTEST_RUNNER_POOL_SIZE 个空闲的常驻进程（pytest_runner.py），
+      进程启动后预先导入 pytest、allure-pytest、实时事件插件和生成代码用到的平台工具模块
+    - 执行时取一个空闲进程下发任务，进程内调用 pytest.main，输出直接写入任务的日志文件；
+      没有空闲进程时（如分片数超过池大小）临时启动一个，需要等待导入完成
+    - 进程执行任务数达到 PYTEST_RUNNER_MAX_JOBS 或内存峰值超过 PYTEST_RUNNER_MAX_MEMORY_MB 后自行退出，
+      被取消或超时终止的进程同样丢弃；丢弃后立即启动替换进程，调度线程也会定期补齐空闲进程
+    """
+
+    DEFAULT_SIZE = 2
+    DEFAULT_MAX_JOBS = 20
+    DEFAULT_MAX_MEMORY_MB = 512
+
+    def __init__(self):
+        self.enabled = True
+        self.size = self.DEFAULT_SIZE
+        self.max_jobs = self.DEFAULT_MAX_JOBS
+        self.max_memory_mb = self.DEFAULT_MAX_MEMORY_MB
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PYTEST_RUNNER_POOL_ENABLED', self.enabled)
+        self.size = app.config.get('PYTEST_RUNNER_POOL_SIZE', self.size)
+        self.max_jobs = app.config.get('PYTEST_RUNNER_MAX_JOBS', self.max_jobs)
+        self.max_memory_mb = app.config.get('PYTEST_RUNNER_MAX_MEMORY_MB', self.max_memory_mb)
+
+    def ensure_warm(self):
+        """补齐空闲进程（由调度线程定期调用）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._reset_after_fork()
+            self._idle = [worker for worker in self._idle if worker.is_alive()]
+            while len(self._idle) < self.size:
+                self._idle.append(self._start())
+
+    def run(self, args, env, cwd, stdout_path, stderr_path, test_files):
+        """
+        在常驻进程中执行一次 pytest
+        :param args: pytest 命令行参数（不含 python -m pytest）
+        :return: PooledPytestProcess
+        """
+        with self._lock:
+            self._reset_after_fork()
+            worker = None
+            while self._idle:
+                candidate = self._idle.pop(0)
+                if candidate.is_alive():
+                    worker = candidate
+                    break
+            if worker is None:
+                worker = self._start()
+        worker.submit({
+            'args': args,
+            'env': env,
+            'cwd': cwd,
+            'stdout_path': stdout_path,
+            'stderr_path': stderr_path,
+            'test_files': test_files
+        })
+        return worker
+
+    def release(self, worker):
+        """任务结束后把进程放回池中，需要回收的进程等待退出"""
+        if worker.recycle or not worker.is_alive() or worker.returncode is None:
+            # 提前启动替换进程，下一次执行时导入已经完成
+            self._discard(worker)
+            self.ensure_warm()
+            return
+        with self._lock:
+            if os.getpid() == self._pid and len(self._idle) < self.size:
+                self._idle.append(worker)
+                return
+        self._discard(worker)
+        self.ensure_warm()
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+    def _start(self):
+        env = dict(os.environ)
+        env[pytest_runner.MAX_JOBS_ENV] = str(self.max_jobs)
+        env[pytest_runner.MAX_MEMORY_ENV] = str(self.max_memory_mb)
+        process = subprocess.Popen([sys.executable, os.path.abspath(pytest_runner.__file__)],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   env=env, close_fds=True)
+        return PooledPytestProcess(process)
+
+    def _reset_after_fork(self):
+        # 子进程继承的空闲进程属于父进程，不能共用
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+
+    @staticmethod
+    def _discard(worker):
+        try:
+            worker.process.stdin.close()
+        except (OSError, ValueError):
+            pass
+        if worker.process.poll() is None:
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+                worker.process.wait()
+        worker.process.stdout.close()
+
+
+pytest_runner_pool = PytestRunnerPool()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 用例选择服务（根据历史执行结果选择和排序用例：失败优先、只跑失败、只跑变更、时间预算）
+"""
+
+import statistics
+
+from flask import current_app
+
+from ...core.exceptions import APIException
+from ...models.test.test_case_result_model import TestCaseResult
+from ...models.test.test_report_model import TestReport
+from .pytest_shard_service import PytestShardService
+
+
+class PytestSelectionService:
+    """
+    Pytest 用例选择服务
+    选择参数 selection: {'mode': 模式, 'last_runs': N, 'budget_minutes': X}
+    - all：全部用例（默认）
+    - failed_first：全部用例，最近一次执行失败（failed/broken）的用例排在前面
+    - failed：只执行最近 N 次执行中失败过的用例
+    - changed：只执行修改时间晚于最近一次执行通过的用例（历史范围内没有通过记录的用例也会执行）
+    - budget：按历史耗时选出 X 分钟内能执行完、价值最高的用例（最近失败、有变更、没有历史记录的用例价值更高）
+    历史取最近 PYTEST_SELECTION_HISTORY_REPORTS 份报告中的用例执行结果；
+    有顺序依赖的模块（见 PytestShardService.is_order_dependent）作为整体选择和排序，保持原有执行顺序
+    """
+
+    MODES = ('all', 'failed_first', 'failed', 'changed', 'budget')
+    FAILED_STATUSES = ('failed', 'broken')
+    DEFAULT_LAST_RUNS = 3
+    DEFAULT_HISTORY_REPORTS = 50
+    # 时间预算模式中各类用例的价值
+    BASE_VALUE = 1.0
+    FAILED_VALUE = 3.0
+    CHANGED_VALUE = 2.0
+    NEW_CASE_VALUE = 1.0
+
+    @classmethod
+    def normalize(cls, selection):
+        """校验选择参数，返回 {'mode', 'last_runs', 'budget_minutes'}"""
+        if selection in (None, '', {}):
+            selection = {}
+        elif isinstance(selection, str):
+            selection = {'mode': selection}
+        elif not isinstance(selection, dict):
+            raise APIException('selection 必须为对象', 400)
+
+        mode = selection.get('mode') or 'all'
+        if mode not in cls.MODES:
+            raise APIException(f'不支持的用例选择模式: {mode}，可选值: {", ".join(cls.MODES)}', 400)
+
+        try:
+            last_runs = selection.get('last_runs')
+            last_runs = int(last_runs) if last_runs not in (None, '') else cls.DEFAULT_LAST_RUNS
+            budget_minutes = selection.get('budget_minutes')
+            budget_minutes = float(budget_minutes) if budget_minutes not in (None, '') else None
+        except (TypeError, ValueError):
+            raise APIException('last_runs 和 budget_minutes 必须为数字', 400)
+        if last_runs < 1:
+            raise APIException('last_runs 必须大于0', 400)
+        if mode == 'budget' and (budget_minutes is None or budget_minutes <= 0):
+            raise APIException('时间预算模式需要指定大于0的 budget_minutes', 400)
+        return {'mode': mode, 'last_runs': last_runs, 'budget_minutes': budget_minutes}
+
+    @classmethod
+    def get_case_history(cls, test_cases, history_reports=None):
+        """
+        获取用例的历史执行结果
+        :return: {测试用例主键: [(报告ID, 状态, 报告时间), ...]}，按报告从新到旧排列
+        """
+        history_reports = history_reports or current_app.config.get('PYTEST_SELECTION_HISTORY_REPORTS',
+                                                                    cls.DEFAULT_HISTORY_REPORTS)
+        case_ids = [case.id for case in test_cases]
+        if not case_ids:
+            return {}
+        # MySQL 不支持 IN 子查询中带 LIMIT，先查出报告
+        reports = dict(TestReport.query
+                       .with_entities(TestReport.id, TestReport.created_at)
+                       .filter(TestReport.is_active.is_(True))
+                       .order_by(TestReport.id.desc())
+                       .limit(history_reports)
+                       .all())
+        if not reports:
+            return {}
+        rows = (TestCaseResult.query
+                .with_entities(TestCaseResult.test_case_id, TestCaseResult.report_id, TestCaseResult.status)
+                .filter(TestCaseResult.report_id.in_(list(reports)), TestCaseResult.test_case_id.in_(case_ids))
+                .order_by(TestCaseResult.report_id.desc())
+                .all())
+        history = {}
+        for test_case_id, report_id, status in rows:
+            history.setdefault(test_case_id, []).append((report_id, status, reports[report_id]))
+        return history
+
+    @classmethod
+    def select(cls, test_cases, selection):
+        """
+        按选择参数筛选和排序用例
+        :param test_cases: 按执行顺序排列的用例列表
+        :param selection: normalize 返回的选择参数
+        :return: (选中的用例列表, 选择结果摘要)
+        """
+        mode = selection['mode']
+        summary = {'mode': mode, 'total_cases': len(test_cases)}
+        if mode == 'all':
+            summary['selected_cases'] = len(test_cases)
+            return test_cases, summary
+
+        history = cls.get_case_history(test_cases)
+        last_runs = selection['last_runs']
+        recently_failed = {case.id for case in test_cases
+                           if any(status in cls.FAILED_STATUSES for _, status, _ in history.get(case.id, [])[:last_runs])}
+        units = cls._build_units(test_cases)
+
+        if mode == 'failed_first':
+            last_failed = {case.id for case in test_cases
+                           if history.get(case.id) and history[case.id][0][1] in cls.FAILED_STATUSES}
+            # 稳定排序：包含最近一次失败用例的单元在前，其余保持原有顺序
+            units.sort(key=lambda unit: 0 if any(case.id in last_failed for _, case in unit) else 1)
+            selected_units = units
+            summary['failed_cases'] = len(last_failed)
+        elif mode == 'failed':
+            selected_units = [unit for unit in units if any(case.id in recently_failed for _, case in unit)]
+            summary['last_runs'] = last_runs
+        elif mode == 'changed':
+            changed = cls._get_changed_cases(test_cases, history)
+            selected_units = [unit for unit in units if any(case.id in changed for _, case in unit)]
+        else:
+            selected_units, estimated = cls._select_by_budget(units, history, recently_failed,
+                                                              selection['budget_minutes'] * 60)
+            summary['budget_minutes'] = selection['budget_minutes']
+            summary['estimated_duration'] = round(estimated, 3)
+
+        if mode != 'failed_first':
+            # 筛选类模式保持原有执行顺序
+            selected_units.sort(key=lambda unit: unit[0][0])
+        selected = [case for unit in selected_units for _, case in unit]
+        summary['selected_cases'] = len(selected)
+        return selected, summary
+
+    @staticmethod
+    def _build_units(test_cases):
+        """有顺序依赖的模块作为一个单元，其余用例各自为一个单元；单元内为 (原始序号, 用例)"""
+        dependent_modules = {case.test_module_name for case in test_cases
+                             if PytestShardService.is_order_dependent(case)}
+        units = {}
+        for index, case in enumerate(test_cases):
+            if case.test_module_name in dependent_modules:
+                unit_key = ('module', case.test_module_name)
+            else:
+                unit_key = ('case', index)
+            units.setdefault(unit_key, []).append((index, case))
+        return sorted(units.values(), key=lambda unit: unit[0][0])
+
+    @classmethod
+    def _get_changed_cases(cls, test_cases, history):
+        """修改时间晚于最近一次执行通过的用例（没有通过记录的用例视为有变更）"""
+        changed = set()
+        for case in test_cases:
+            last_passed = next((created_at for _, status, created_at in history.get(case.id, [])
+                                if status == 'passed'), None)
+            if last_passed is None or (case.updated_at and cls._naive(case.updated_at) > cls._naive(last_passed)):
+                changed.add(case.id)
+        return changed
+
+    @classmethod
+    def _select_by_budget(cls, units, history, recently_failed, budget_seconds):
+        """按 价值/耗时 从高到低贪心选择单元，直到用完时间预算"""
+        durations = PytestShardService.get_case_durations([case for unit in units for _, case in unit])
+        default_duration = statistics.median(durations.values()) if durations else PytestShardService.DEFAULT_CASE_DURATION
+        changed = cls._get_changed_cases([case for unit in units for _, case in unit], history)
+
+        candidates = []
+        for unit in units:
+            cases = [case for _, case in unit if not PytestShardService.is_skipped(case)]
+            if not cases:
+                continue
+            cost = sum(durations.get(PytestShardService.case_key(case), default_duration) for case in cases)
+            value = 0.0
+            for case in cases:
+                value += cls.BASE_VALUE
+                if case.id in recently_failed:
+                    value += cls.FAILED_VALUE
+                if case.id in changed:
+                    value += cls.CHANGED_VALUE
+                if case.id not in history:
+                    value += cls.NEW_CASE_VALUE
+            candidates.append((value / max(cost, 0.001), cost, unit))
+        candidates.sort(key=lambda item: (-item[0], item[2][0][0]))
+
+        selected = []
+        used = 0.0
+        for _, cost, unit in candidates:
+            if used + cost <= budget_seconds:
+                selected.append(unit)
+                used += cost
+        return selected, used
+
+    @staticmethod
+    def _naive(value):
+        return value.replace(tzinfo=None) if value.tzinfo else value
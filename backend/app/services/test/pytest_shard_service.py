@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  Pytest 分片规划服务（按历史耗时均衡分配用例，有顺序依赖的用例保持在同一分片）
+"""
+
+import heapq
+import statistics
+
+from flask import current_app
+from sqlalchemy import func
+
+from ...models.test.test_case_result_model import TestCaseResult
+from ...models.test.test_report_model import TestReport
+
+
+class PytestShardService:
+    """
+    Pytest 分片规划服务
+    - 用例耗时取最近 PYTEST_SHARD_HISTORY_REPORTS 份报告中同名用例（allure 标题: 用例ID-用例名称）执行结果的平均耗时，
+      没有历史记录的用例按已知耗时的中位数估算
+    - 顺序依赖：模块中存在通过 response_body 向后续用例传递数据（self.__class__.xxx = ...）的用例，
+      或用例带有 order / dependency 类注解时，该模块的全部用例作为一个整体分配，并保持原有顺序
+    - 分配使用最长处理时间优先（LPT）贪心：按耗时从大到小依次放入当前总耗时最小的分片
+    """
+
+    DEFAULT_HISTORY_REPORTS = 20
+    # 没有任何历史耗时时每个用例的估算耗时（秒）
+    DEFAULT_CASE_DURATION = 1.0
+    ORDER_MARKERS = ('pytest.mark.order', 'pytest.mark.run(', 'pytest.mark.dependency', 'pytest.mark.incremental')
+
+    @staticmethod
+    def case_key(case):
+        """用例在 allure 结果中的名称（与生成代码中的 @allure.title 一致）"""
+        return case.allure_title
+
+    @staticmethod
+    def is_skipped(case):
+        return bool(case.is_skip) and case.is_skip.lower() != 'no'
+
+    @classmethod
+    def is_order_dependent(cls, case):
+        """用例是否与同模块的其他用例存在执行顺序依赖"""
+        if case.response_body and case.response_body.strip():
+            return True
+        annotation = case.pytest_annotation or ''
+        return any(marker in annotation for marker in cls.ORDER_MARKERS)
+
+    @classmethod
+    def get_case_durations(cls, test_cases, history_reports=None):
+        """
+        从历史报告中获取用例耗时
+        :return: {用例名称: 平均耗时（秒）}
+        """
+        history_reports = history_reports or current_app.config.get('PYTEST_SHARD_HISTORY_REPORTS',
+                                                                    cls.DEFAULT_HISTORY_REPORTS)
+        wanted = list({cls.case_key(case) for case in test_cases})
+        if not wanted:
+            return {}
+        # MySQL 不支持 IN 子查询中带 LIMIT，先查出报告ID
+        report_ids = [row.id for row in (TestReport.query
+                                         .with_entities(TestReport.id)
+                                         .filter(TestReport.is_active.is_(True))
+                                         .order_by(TestReport.id.desc())
+                                         .limit(history_reports)
+                                         .all())]
+        if not report_ids:
+            return {}
+        rows = (TestCaseResult.query
+                .with_entities(TestCaseResult.case_name, func.avg(TestCaseResult.duration))
+                .filter(TestCaseResult.report_id.in_(report_ids),
+                        TestCaseResult.case_name.in_(wanted),
+                        TestCaseResult.duration > 0)
+                .group_by(TestCaseResult.case_name)
+                .all())
+        return {name: float(duration) for name, duration in rows}
+
+    @classmethod
+    def plan(cls, test_cases, shard_count, durations=None):
+        """
+        规划分片
+        :param test_cases: 按执行顺序排列的用例列表
+        :param shard_count: 分片数量
+        :param durations: 用例耗时，为空时从历史报告读取
+        :return: 分片列表 [{'cases': [...], 'estimated_duration': 秒}]，不包含空分片
+        """
+        if durations is None:
+            durations = cls.get_case_durations(test_cases)
+        default_duration = statistics.median(durations.values()) if durations else cls.DEFAULT_CASE_DURATION
+
+        # 跳过的用例不会生成测试方法，不参与分配
+        indexed = [(index, case) for index, case in enumerate(test_cases) if not cls.is_skipped(case)]
+
+        # 有顺序依赖的模块整体作为一个分配单元，其余用例各自作为一个单元
+        dependent_modules = {case.test_module_name for _, case in indexed if cls.is_order_dependent(case)}
+        units = {}
+        for index, case in indexed:
+            if case.test_module_name in dependent_modules:
+                unit_key = ('module', case.test_module_name)
+            else:
+                unit_key = ('case', index)
+            units.setdefault(unit_key, []).append((index, case))
+
+        weighted_units = []
+        for members in units.values():
+            weight = sum(durations.get(cls.case_key(case), default_duration) for _, case in members)
+            weighted_units.append((weight, members))
+        weighted_units.sort(key=lambda item: (-item[0], item[1][0][0]))
+
+        shard_count = max(1, min(shard_count, len(weighted_units)))
+        heap = [(0.0, shard_index) for shard_index in range(shard_count)]
+        shards = [{'members': [], 'estimated_duration': 0.0} for _ in range(shard_count)]
+        for weight, members in weighted_units:
+            load, shard_index = heapq.heappop(heap)
+            shards[shard_index]['members'].extend(members)
+            shards[shard_index]['estimated_duration'] = load + weight
+            heapq.heappush(heap, (load + weight, shard_index))
+
+        result = []
+        for shard in shards:
+            if not shard['members']:
+                continue
+            # 分片内保持原有执行顺序
+            shard['members'].sort(key=lambda member: member[0])
+            result.append({
+                'cases': [case for _, case in shard['members']],
+                'estimated_duration': round(shard['estimated_duration'], 3)
+            })
+        return result
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  测试用例不稳定度统计服务（根据历史执行结果计算每个用例的 flakiness 分数）
+"""
+
+from flask import current_app
+
+from ...models.test.test_case_model import TestCase
+from ...models.test.test_case_result_model import TestCaseResult
+from ...models.test.test_report_model import TestReport
+
+
+class TestFlakinessService:
+    """
+    测试用例不稳定度统计服务
+    统计最近 PYTEST_FLAKY_HISTORY_REPORTS 份报告中每个用例的执行结果（跳过的结果不计入）：
+    - flaky_runs：首次执行失败、重跑后通过的次数
+    - flips：相邻两次执行的最终结果在通过和失败之间切换的次数
+    - score = (flaky_runs + flips) / (runs + runs - 1)，取值 0 ~ 1，越大越不稳定；只执行过一次且没有重跑通过时为 0
+    """
+
+    DEFAULT_HISTORY_REPORTS = 50
+    PASSED = 'passed'
+    FAILED_STATUSES = ('failed', 'broken')
+
+    @classmethod
+    def _recent_report_ids(cls, history_reports=None):
+        history_reports = history_reports or current_app.config.get('PYTEST_FLAKY_HISTORY_REPORTS',
+                                                                    cls.DEFAULT_HISTORY_REPORTS)
+        # MySQL 不支持 IN 子查询中带 LIMIT，先查出报告ID
+        return [row.id for row in (TestReport.query
+                                   .with_entities(TestReport.id)
+                                   .filter(TestReport.is_active.is_(True))
+                                   .order_by(TestReport.id.desc())
+                                   .limit(history_reports)
+                                   .all())]
+
+    @classmethod
+    def get_scores(cls, test_case_ids=None, history_reports=None):
+        """
+        计算用例的不稳定度
+        :param test_case_ids: 测试用例主键列表，为空时统计历史中出现的全部用例
+        :return: {测试用例主键: {'score', 'runs', 'flaky_runs', 'flips', 'last_status'}}
+        """
+        report_ids = cls._recent_report_ids(history_reports)
+        if not report_ids or test_case_ids == []:
+            return {}
+        query = (TestCaseResult.query
+                 .with_entities(TestCaseResult.test_case_id, TestCaseResult.status, TestCaseResult.first_status)
+                 .filter(TestCaseResult.report_id.in_(report_ids), TestCaseResult.test_case_id.isnot(None),
+                         TestCaseResult.status.in_((cls.PASSED,) + cls.FAILED_STATUSES)))
+        if test_case_ids is not None:
+            query = query.filter(TestCaseResult.test_case_id.in_(list(test_case_ids)))
+        history = {}
+        for test_case_id, status, first_status in query.order_by(TestCaseResult.report_id.asc()).all():
+            history.setdefault(test_case_id, []).append((status, first_status))
+        return {test_case_id: cls._score(results) for test_case_id, results in history.items()}
+
+    @classmethod
+    def _score(cls, results):
+        """results 为按时间从旧到新的 (最终状态, 首次状态)"""
+        runs = len(results)
+        flaky_runs = sum(1 for status, first_status in results
+                         if status == cls.PASSED and first_status in cls.FAILED_STATUSES)
+        outcomes = [status == cls.PASSED for status, _ in results]
+        flips = sum(1 for previous, current in zip(outcomes, outcomes[1:]) if previous != current)
+        return {
+            'score': round((flaky_runs + flips) / (2 * runs - 1), 3),
+            'runs': runs,
+            'flaky_runs': flaky_runs,
+            'flips': flips,
+            'last_status': results[-1][0]
+        }
+
+    @classmethod
+    def list_flaky_cases(cls, limit=20, min_score=0.0):
+        """按不稳定度从高到低列出用例"""
+        scores = {test_case_id: score for test_case_id, score in cls.get_scores().items()
+                  if score['score'] > 0 and score['score'] >= min_score}
+        if not scores:
+            return []
+        cases = {case.id: case for case in TestCase.query.filter(TestCase.id.in_(list(scores)),
+                                                                  TestCase.is_active.is_(True)).all()}
+        items = []
+        for test_case_id, score in scores.items():
+            case = cases.get(test_case_id)
+            if not case:
+                continue
+            items.append(dict(score, test_case_id=case.id, case_id=case.test_case_id,
+                              test_case_name=case.test_case_name, test_module_name=case.test_module_name,
+                              component_name=case.component_name))
+        items.sort(key=lambda item: (-item['score'], -item['runs']))
+        return items[:limit]
@@ -16,7 +16,9 @@ from ...core.database import db
 from ...core.exceptions import APIException
 from ...models.test.test_report_model import TestReport
 from ...models.test.test_case_model import TestCase
+from ...models.test.test_case_result_model import TestCaseResult
 from ...utils.path_util import PathUtils
+from .test_flakiness_service import TestFlakinessService
 
 
 class TestReportService:
@@ -105,16 +107,15 @@ class TestReportService:
                 if not cases:
                     continue
                 
-                # 聚合统计信息
-                total = len(cases)
-                passed = sum(1 for c in cases if c.get('status') == 'passed')
-                failed = sum(1 for c in cases if c.get('status') == 'failed')
-                skipped = sum(1 for c in cases if c.get('status') == 'skipped')
-                error = sum(1 for c in cases if c.get('status') in ['broken', 'error'])
-                
-                # 计算总时长
-                durations = [c.get('duration', 0) for c in cases if c.get('duration', 0) > 0]
-                total_duration = sum(durations) if durations else 0.0
+                # 合并失败重跑的多次执行结果，再聚合统计信息
+                cases = TestReportService.merge_attempts(cases)
+                summary = TestReportService.summarize_cases(cases)
+                total = summary['total']
+                passed = summary['passed']
+                failed = summary['failed']
+                skipped = summary['skipped']
+                error = summary['error']
+                total_duration = summary['duration']
                 
                 # 生成报告名称
                 module = suite_info.get('module', '所有模块')
@@ -127,14 +128,7 @@ class TestReportService:
                     'module': module,
                     'environment': environment,
                     'cases': cases,
-                    'summary': {
-                        'total': total,
-                        'passed': passed,
-                        'failed': failed,
-                        'skipped': skipped,
-                        'error': error,
-                        'duration': total_duration
-                    }
+                    'summary': summary
                 }
                 
                 # 检查是否已存在相同的报告（基于suite_name）
@@ -221,9 +215,120 @@ class TestReportService:
                 'steps': data.get('steps', []),
                 'attachments': data.get('attachments', []),
                 'labels': data.get('labels', []),
-                'parameters': data.get('parameters', [])
+                'parameters': data.get('parameters', []),
+                'status_details': data.get('statusDetails', {})
             }
 
+    @staticmethod
+    def collect_allure_results(allure_results_dir):
+        """
+        解析 allure-results 目录下全部用例结果
+        :return: 报告数据 {'suite_name', 'module', 'environment', 'cases', 'summary'}，
+                 cases 中的耗时单位为毫秒（allure 原始值），summary 中的 duration 为秒
+        """
+        cases = []
+        suite_name = ''
+        module = None
+        environment = None
+        if os.path.isdir(allure_results_dir):
+            for file in sorted(os.listdir(allure_results_dir)):
+                if not file.endswith('-result.json'):
+                    continue
+                try:
+                    case_data = TestReportService._parse_result_json(os.path.join(allure_results_dir, file))
+                except Exception:
+                    continue
+                cases.append(case_data)
+
+                # 从第一个带有 suite/story 标签的用例中提取模块和环境信息（suite 格式：test_auto_时间戳_模块_环境）
+                for label in case_data.get('labels', []):
+                    if label.get('name') == 'story' and module is None:
+                        module = label.get('value', '')
+                    elif label.get('name') == 'suite' and not suite_name:
+                        suite_name = label.get('value', '')
+                        parts = suite_name.split('_')
+                        if len(parts) >= 2:
+                            environment = parts[-1]
+
+        cases = TestReportService.merge_attempts(cases)
+        return {
+            'suite_name': suite_name,
+            'module': module,
+            'environment': environment,
+            'cases': cases,
+            'summary': TestReportService.summarize_cases(cases)
+        }
+
+    @staticmethod
+    def merge_attempts(cases):
+        """
+        合并同一用例的多次执行结果（失败重跑会在同一个 allure-results 目录写入多个结果）
+        保留最后一次执行的结果，并记录首次执行状态 first_status、执行次数 attempts
+        """
+        grouped = {}
+        for case in sorted(cases, key=lambda c: c.get('start_time') or 0):
+            grouped.setdefault((case.get('full_name'), case.get('name')), []).append(case)
+        merged = []
+        for attempts in grouped.values():
+            final = dict(attempts[-1])
+            final['first_status'] = attempts[0].get('status')
+            final['attempts'] = len(attempts)
+            merged.append(final)
+        return merged
+
+    @staticmethod
+    def summarize_cases(cases):
+        """
+        统计用例结果数量和耗时
+        duration 为整体执行时长（秒）：取最早开始到最晚结束的时间差，分片并行执行时不会重复累计
+        """
+        starts = [c.get('start_time') for c in cases if c.get('start_time')]
+        stops = [c.get('stop_time') for c in cases if c.get('stop_time')]
+        if starts and stops:
+            duration = (max(stops) - min(starts)) / 1000.0
+        else:
+            duration = sum(c.get('duration', 0) for c in cases if c.get('duration', 0) > 0) / 1000.0
+        return {
+            'total': len(cases),
+            'passed': sum(1 for c in cases if c.get('status') == 'passed'),
+            'failed': sum(1 for c in cases if c.get('status') == 'failed'),
+            'skipped': sum(1 for c in cases if c.get('status') == 'skipped'),
+            'error': sum(1 for c in cases if c.get('status') in ['broken', 'error']),
+            # 首次执行失败、重跑后通过的用例数
+            'flaky': sum(1 for c in cases if c.get('status') == 'passed'
+                         and c.get('first_status') in ['failed', 'broken']),
+            'duration': round(duration, 3)
+        }
+
+    @staticmethod
+    def save_case_results(report, cases, test_cases=None):
+        """
+        写入报告的用例执行结果（不提交事务，由调用方与报告一起提交）
+        :param report: 已 flush 的测试报告
+        :param cases: collect_allure_results 返回的用例结果
+        :param test_cases: 本次执行的测试用例，用于按 allure 标题关联测试用例主键，为空时在全部用例中匹配
+        """
+        if test_cases is None:
+            test_cases = TestCase.query.filter_by(is_active=True).all()
+        case_ids = {case.allure_title: case.id for case in test_cases}
+        for case in cases:
+            status_details = case.get('status_details') or {}
+            message = status_details.get('message')
+            db.session.add(TestCaseResult(
+                report_id=report.id,
+                test_case_id=case_ids.get(case.get('name')),
+                case_name=(case.get('name') or '')[:500],
+                full_name=(case.get('full_name') or '')[:500],
+                status=case.get('status') or 'unknown',
+                first_status=case.get('first_status') or case.get('status') or 'unknown',
+                attempts=case.get('attempts') or 1,
+                duration=round((case.get('duration') or 0) / 1000.0, 3),
+                message=message[:2000] if message else None,
+                started_at=datetime.fromtimestamp(case['start_time'] / 1000.0) if case.get('start_time') else None,
+                created_by=report.created_by,
+                updated_by=report.created_by
+            ))
+
     @staticmethod
     def get_test_reports(page=1, per_page=10, search=None):
         """获取测试报告列表（支持分页和搜索）"""
@@ -269,104 +374,26 @@ class TestReportService:
         if not os.path.exists(allure_results_dir):
             raise APIException(f'测试报告目录不存在: {allure_results_dir}', 404)
         
-        # 解析allure-results目录下的JSON文件
-        suite_groups = {}
-        for file in os.listdir(allure_results_dir):
-            if file.endswith('-result.json'):
-                file_path = os.path.join(allure_results_dir, file)
-                try:
-                    case_data = TestReportService._parse_result_json(file_path)
-                    if case_data:
-                        # 从labels中提取suite信息作为分组key
-                        suite_name = None
-                        for label in case_data.get('labels', []):
-                            if label.get('name') == 'suite':
-                                suite_name = label.get('value', '')
-                                break
-                        
-                        if not suite_name:
-                            suite_name = 'unknown_suite'
-                        
-                        # 按suite分组
-                        if suite_name not in suite_groups:
-                            suite_groups[suite_name] = {
-                                'cases': [],
-                                'module': None,
-                                'environment': None
-                            }
-                        
-                        suite_groups[suite_name]['cases'].append(case_data)
-                        
-                        # 提取模块和环境信息
-                        if suite_groups[suite_name]['module'] is None:
-                            for label in case_data.get('labels', []):
-                                if label.get('name') == 'story':
-                                    suite_groups[suite_name]['module'] = label.get('value', '')
-                                elif label.get('name') == 'suite':
-                                    suite_value = label.get('value', '')
-                                    parts = suite_value.split('_')
-                                    if len(parts) >= 2:
-                                        suite_groups[suite_name]['environment'] = parts[-1]
-                except Exception as e:
-                    continue
-        
-        # 更新报告数据（使用第一个suite的数据，或者合并所有suite）
-        if suite_groups:
-            # 合并所有suite的数据
-            all_cases = []
-            total_passed = 0
-            total_failed = 0
-            total_skipped = 0
-            total_error = 0
-            total_duration = 0.0
-            module = report.execution_module or ''
-            environment = report.execution_environment or ''
-            
-            for suite_name, suite_info in suite_groups.items():
-                cases = suite_info['cases']
-                if cases:
-                    all_cases.extend(cases)
-                    if not module and suite_info.get('module'):
-                        module = suite_info['module']
-                    if not environment and suite_info.get('environment'):
-                        environment = suite_info['environment']
-            
-            # 统计信息
-            total = len(all_cases)
-            total_passed = sum(1 for c in all_cases if c.get('status') == 'passed')
-            total_failed = sum(1 for c in all_cases if c.get('status') == 'failed')
-            total_skipped = sum(1 for c in all_cases if c.get('status') == 'skipped')
-            total_error = sum(1 for c in all_cases if c.get('status') in ['broken', 'error'])
-            durations = [c.get('duration', 0) for c in all_cases if c.get('duration', 0) > 0]
-            total_duration = sum(durations) if durations else 0.0
-            
-            # 构建报告数据
-            report_data = {
-                'suite_name': list(suite_groups.keys())[0] if suite_groups else '',
-                'module': module,
-                'environment': environment,
-                'cases': all_cases,
-                'summary': {
-                    'total': total,
-                    'passed': total_passed,
-                    'failed': total_failed,
-                    'skipped': total_skipped,
-                    'error': total_error,
-                    'duration': total_duration
-                }
-            }
-            
+        collected = TestReportService.collect_allure_results(allure_results_dir)
+        if collected['cases']:
+            summary = collected['summary']
+            module = report.execution_module or collected['module'] or ''
+            environment = report.execution_environment or collected['environment'] or ''
+            report_data = dict(collected, module=module, environment=environment)
+
             # 更新报告
             report.execution_module = module
             report.execution_environment = environment
-            report.total_tests = total
-            report.passed_tests = total_passed
-            report.failed_tests = total_failed
-            report.skipped_tests = total_skipped
-            report.error_tests = total_error
-            report.duration = total_duration
+            report.total_tests = summary['total']
+            report.passed_tests = summary['passed']
+            report.failed_tests = summary['failed']
+            report.skipped_tests = summary['skipped']
+            report.error_tests = summary['error']
+            report.duration = summary['duration']
             report.report_data = json.dumps(report_data, ensure_ascii=False)
-            report.status = 'success' if total_failed == 0 and total_error == 0 else 'failed'
+            report.status = 'success' if summary['failed'] == 0 and summary['error'] == 0 else 'failed'
+            if not TestCaseResult.query.filter_by(report_id=report.id).first():
+                TestReportService.save_case_results(report, collected['cases'])
             
             db.session.commit()
         
@@ -406,13 +433,23 @@ class TestReportService:
                 # 构建用例树形结构
                 cases = report_data.get('cases', [])
                 case_tree = []
+
+                # 用例执行结果和历史不稳定度
+                case_results = {item.case_name: item for item in
+                                TestCaseResult.query.filter_by(report_id=report.id, is_active=True).all()}
+                flakiness = TestFlakinessService.get_scores(
+                    [item.test_case_id for item in case_results.values() if item.test_case_id])
                 
                 for case in cases:
+                    case_result = case_results.get(case.get('name', ''))
                     case_info = {
                         'id': case.get('uuid', ''),
                         'name': case.get('name', ''),
                         'full_name': case.get('full_name', ''),
                         'status': case.get('status', 'unknown'),
+                        'first_status': case.get('first_status', case.get('status', 'unknown')),
+                        'attempts': case.get('attempts', 1),
+                        'flakiness': flakiness.get(case_result.test_case_id) if case_result else None,
                         'duration': case.get('duration', 0),
                         'description': case.get('description', ''),
                         'request': None,
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  后台任务工具类（有界线程池 + 基于文件的任务状态存储）
+
+任务状态以 JSON 文件保存在本机目录中，通过原子替换写入，gunicorn 的多个 worker 进程都可以读取；
+任务只由提交它的进程执行和更新状态，其他进程通过取消标记文件请求取消。
+状态中记录执行进程（owner_pid/owner_host）和心跳时间（heartbeat_at），执行期间定期续约；
+执行进程已退出或心跳超时的未结束任务在读取时标记为失败，避免 worker 重启后任务永远停留在排队中/执行中。
+"""
+
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class JobStatus:
+    """任务状态"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    TIMEOUT = 'timeout'
+
+    FINAL_STATUSES = (FINISHED, FAILED, CANCELLED, TIMEOUT)
+
+
+def is_process_alive(pid):
+    """本机进程是否存在（无权限发送信号时视为存在）"""
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError, OSError):
+        return True
+    return True
+
+
+class FileJobStore:
+    """基于文件的任务状态存储"""
+
+    ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+    STATE_FILE = 'state.json'
+    CANCEL_FILE = 'cancel'
+    # 执行期间续约心跳的间隔（秒）
+    HEARTBEAT_INTERVAL = 15
+    HOST = socket.gethostname()
+
+    def __init__(self, name, root=None, ttl=3600, stale_timeout=120):
+        """
+        :param stale_timeout: 执行中任务超过该秒数没有心跳时视为执行进程已退出
+        """
+        self.name = name
+        self.root = root or os.path.join(tempfile.gettempdir(), 'test_platform_jobs', name)
+        self.ttl = ttl
+        self.stale_timeout = stale_timeout
+        self._lock = threading.RLock()
+
+    @classmethod
+    def is_valid_id(cls, job_id):
+        return bool(job_id) and bool(cls.ID_PATTERN.match(str(job_id)))
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def create(self, data, job_id=None):
+        """创建任务，返回任务状态"""
+        job_id = job_id or uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        state = {
+            'job_id': job_id,
+            'status': JobStatus.QUEUED,
+            'created_at': now,
+            'updated_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'owner_pid': os.getpid(),
+            'owner_host': self.HOST,
+            'heartbeat_at': now
+        }
+        state.update(data)
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        self._write(job_id, state)
+        return state
+
+    def load(self, job_id):
+        """读取任务状态，执行进程已退出的未结束任务标记为失败"""
+        state = self._read(job_id)
+        if state and self._is_stale(state):
+            with self._lock:
+                state = self._read(job_id)
+                if state and self._is_stale(state):
+                    now = datetime.now().isoformat()
+                    state.update(status=JobStatus.FAILED, error='执行任务的进程已退出，任务中断',
+                                 finished_at=now, updated_at=now)
+                    self._write(job_id, state)
+        return state
+
+    def update(self, job_id, **fields):
+        """更新任务状态（只应由执行任务的进程调用）"""
+        with self._lock:
+            state = self._read(job_id)
+            if state is None:
+                return None
+            state.update(fields)
+            state['updated_at'] = datetime.now().isoformat()
+            self._write(job_id, state)
+            return state
+
+    def claim(self, job_id):
+        """由当前进程执行任务：记录执行进程并续约心跳"""
+        return self.update(job_id, owner_pid=os.getpid(), owner_host=self.HOST,
+                           heartbeat_at=datetime.now().isoformat())
+
+    def touch(self, job_id):
+        """续约未结束任务的心跳"""
+        with self._lock:
+            state = self._read(job_id)
+            if state is None or state.get('status') in JobStatus.FINAL_STATUSES:
+                return
+            state['heartbeat_at'] = datetime.now().isoformat()
+            self._write(job_id, state)
+
+    @contextmanager
+    def heartbeat(self, job_id):
+        """在上下文中每隔 HEARTBEAT_INTERVAL 秒续约任务心跳"""
+        stop = threading.Event()
+
+        def _beat():
+            while not stop.wait(self.HEARTBEAT_INTERVAL):
+                try:
+                    self.touch(job_id)
+                except OSError:
+                    pass
+
+        thread = threading.Thread(target=_beat, name=f'{self.name}-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    def _is_stale(self, state):
+        """未结束的任务：执行进程（本机）已不存在，或执行中超过 stale_timeout 秒没有心跳"""
+        status = state.get('status')
+        if status in JobStatus.FINAL_STATUSES:
+            return False
+        owner_pid = state.get('owner_pid')
+        if owner_pid and state.get('owner_host') == self.HOST and not self._pid_alive(owner_pid):
+            return True
+        if status != JobStatus.RUNNING:
+            return False
+        heartbeat_at = state.get('heartbeat_at') or state.get('updated_at')
+        try:
+            elapsed = (datetime.now() - datetime.fromisoformat(heartbeat_at)).total_seconds()
+        except (TypeError, ValueError):
+            return True
+        return elapsed > self.stale_timeout
+
+    @staticmethod
+    def _pid_alive(pid):
+        return is_process_alive(pid)
+
+    def _read(self, job_id):
+        if not self.is_valid_id(job_id):
+            return None
+        try:
+            with open(os.path.join(self.job_dir(job_id), self.STATE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def list(self):
+        """列出所有未过期的任务（按创建时间倒序）"""
+        if not os.path.isdir(self.root):
+            return []
+        jobs = [self.load(name) for name in os.listdir(self.root)]
+        jobs = [job for job in jobs if job]
+        return sorted(jobs, key=lambda job: job.get('created_at') or '', reverse=True)
+
+    def request_cancel(self, job_id):
+        """写入取消标记，执行任务的进程检测到后停止任务"""
+        path = os.path.join(self.job_dir(job_id), self.CANCEL_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(datetime.now().isoformat())
+
+    def is_cancel_requested(self, job_id):
+        return os.path.exists(os.path.join(self.job_dir(job_id), self.CANCEL_FILE))
+
+    def cleanup(self):
+        """清理已结束且超过保留时间的任务目录（执行进程已退出的任务先标记为失败，再按保留时间清理）"""
+        if not os.path.isdir(self.root):
+            return 0
+        expire_before = time.time() - self.ttl
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(os.path.join(path, self.STATE_FILE)) >= expire_before:
+                    continue
+            except OSError:
+                if os.path.isdir(path) and os.path.getmtime(path) >= expire_before:
+                    continue
+            state = self.load(name)
+            if state and state.get('status') not in JobStatus.FINAL_STATUSES:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def _write(self, job_id, state):
+        path = os.path.join(self.job_dir(job_id), self.STATE_FILE)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+
+class BackgroundJobRunner:
+    """有界线程池，在 Flask 应用上下文中执行后台任务"""
+
+    def __init__(self, name, max_workers=4):
+        self.name = name
+        self.max_workers = max_workers
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, max_workers=None):
+        self.app = app
+        if max_workers:
+            self.max_workers = max_workers
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f'{self.name}-job')
+            return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        """提交任务，任务函数在应用上下文中执行"""
+        app = self.app
+
+        def _run():
+            if app is None:
+                return func(*args, **kwargs)
+            with app.app_context():
+                return func(*args, **kwargs)
+
+        return self.executor.submit(_run)
+
+    def submit_job(self, store, job_id, func, *args, **kwargs):
+        """
+        提交 FileJobStore 中的任务：记录当前进程为执行进程，执行期间定期续约心跳
+        任务函数以 func(job_id, *args, **kwargs) 调用
+        """
+        store.claim(job_id)
+
+        def _run_job():
+            with store.heartbeat(job_id):
+                return func(job_id, *args, **kwargs)
+
+        return self.submit(_run_job)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+@author       weimenghua
+@time         2026/10/18
+@description  基准测试：统计每次 get_tables 调用到远端数据库的往返次数（移除 SELECT 1 探测前后对比）
+
+使用方式（在 backend 目录下执行，需要平台库中存在对应的数据库连接配置）：
+    python benchmarks/bench_get_tables_round_trips.py --connection-id 1 --database test_platform --iterations 20
+
+往返次数统计口径：
+- 每次从连接池借出连接时 pool_pre_ping 发送一次 ping
+- 每条通过游标执行的 SQL 语句（SELECT 1、SHOW TABLES 等）
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import event, text
+
+# 添加 backend 目录到 Python 路径
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from app.routes import create_app  # noqa: E402
+from app.services.database.connection_registry import engine_registry  # noqa: E402
+from app.services.database.database_info_service import DatabaseInfoService  # noqa: E402
+
+
+class RoundTripCounter:
+    """通过引擎和连接池事件统计往返次数"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.pings = 0
+        self.statements = 0
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        # pool_pre_ping 开启时，每次借出都会向服务端发送一次 ping
+        if self.engine.pool._pre_ping:
+            self.pings += 1
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def reset(self):
+        self.pings = 0
+        self.statements = 0
+
+    @property
+    def round_trips(self):
+        return self.pings + self.statements
+
+    def detach(self):
+        event.remove(self.engine, 'checkout', self._on_checkout)
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def legacy_get_tables(service, connection_id, database_name):
+    """旧实现：返回引擎前先借出连接执行 SELECT 1 探测"""
+    engine = service._get_connection_engine(connection_id)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return service.get_tables(connection_id, database_name)
+
+
+def run(label, func, counter, iterations):
+    """执行多次调用并输出平均往返次数和耗时"""
+    counter.reset()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<8} 往返次数/次: {counter.round_trips / iterations:.2f} '
+          f'(ping {counter.pings / iterations:.2f}, SQL {counter.statements / iterations:.2f}) '
+          f'平均耗时: {elapsed / iterations * 1000:.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计 get_tables 每次调用的数据库往返次数')
+    parser.add_argument('--connection-id', type=int, required=True, help='平台中的数据库连接ID')
+    parser.add_argument('--database', required=True, help='要列出数据表的数据库名')
+    parser.add_argument('--iterations', type=int, default=20, help='每种模式的调用次数')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AUTO_MIGRATE', 'false')
+    app = create_app()
+
+    with app.app_context():
+        service = DatabaseInfoService()
+        engine = engine_registry.acquire(args.connection_id)
+        # 预热：建立首个连接并完成方言初始化，避免计入统计
+        service.get_tables(args.connection_id, args.database)
+
+        counter = RoundTripCounter(engine)
+        try:
+            run('before', lambda: legacy_get_tables(service, args.connection_id, args.database), counter, args.iterations)
+            run('after', lambda: service.get_tables(args.connection_id, args.database), counter, args.iterations)
+        finally:
+            counter.detach()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,4 +9,10 @@ accesslog = "./log/access.log"
 # 错误日志文件
 errorlog = "./log/error.log"
 # 日志级别
-loglevel = "info"
\ No newline at end of file
+loglevel = "info"
+
+
+def post_worker_init(worker):
+    """worker 加载应用后启动 Pytest 任务调度线程，不必等到第一个请求"""
+    from app.services.test.pytest_job_service import pytest_job_service
+    pytest_job_service.start_dispatcher()
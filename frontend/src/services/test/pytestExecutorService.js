@@ -1,23 +1,101 @@
 import apiClient from "../../utils/request";
 
+/**
+ * 解析 SSE 文本块，返回 { id, event, data }
+ */
+const parseSseBlock = (block) => {
+  const message = { id: null, event: "message", data: "" };
+  const dataLines = [];
+  block.split("\n").forEach((line) => {
+    if (!line || line.startsWith(":")) return;
+    const index = line.indexOf(":");
+    const field = index === -1 ? line : line.slice(0, index);
+    const value = index === -1 ? "" : line.slice(index + 1).replace(/^ /, "");
+    if (field === "id") message.id = value;
+    else if (field === "event") message.event = value;
+    else if (field === "data") dataLines.push(value);
+  });
+  if (!dataLines.length) return null;
+  try {
+    message.data = JSON.parse(dataLines.join("\n"));
+  } catch (e) {
+    message.data = dataLines.join("\n");
+  }
+  return message;
+};
+
 /**
  * Pytest执行相关 API 服务
+ * 执行通过任务队列异步进行：提交任务后通过任务状态或事件流获取进度和结果
  */
 export const pytestExecutorService = {
   /**
-   * 执行Pytest测试并生成Allure报告
-   * 注意：Pytest执行可能需要较长时间，因此设置较长的超时时间
+   * 提交Pytest执行任务，立即返回任务信息（含任务ID和排队位置）
    */
-  executePytest({ module_name, environment_name, component_name } = {}) {
-    return apiClient.post("/pytest-executor/execute", {
+  submitJob({ module_name, environment_name, component_name, options } = {}) {
+    return apiClient.post("/pytest-executor/jobs", {
       module_name,
       environment_name,
-      component_name
-    }, {
-      timeout: 600000 // 10分钟超时（600秒），因为测试执行可能需要较长时间
+      component_name,
+      options
     });
   },
+
+  /**
+   * 获取执行任务状态和进度
+   */
+  getJob(jobId) {
+    return apiClient.get(`/pytest-executor/jobs/${jobId}`);
+  },
+
+  /**
+   * 取消执行任务
+   */
+  cancelJob(jobId) {
+    return apiClient.post(`/pytest-executor/jobs/${jobId}/cancel`);
+  },
+
+  /**
+   * 订阅任务事件流（status、用例事件、end）
+   * EventSource 无法携带 Authorization 头，这里使用 fetch 读取 SSE
+   * @param {Function} onEvent 回调参数 { id, event, data }
+   * @param {AbortSignal} signal 用于关闭事件流
+   * @param {number} offset 事件文件偏移（断线续传时传入最后收到的事件 id）
+   * @returns {Promise} 事件流结束（收到 end 事件或连接断开）时 resolve
+   */
+  async streamJobEvents(jobId, { onEvent, signal, offset = 0 } = {}) {
+    const headers = { Accept: "text/event-stream" };
+    const token = localStorage.getItem("token");
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+    const response = await fetch(
+      `${apiClient.defaults.baseURL}/pytest-executor/jobs/${jobId}/events?offset=${offset}`,
+      { headers, signal }
+    );
+    if (!response.ok || !response.body) {
+      throw new Error(`事件流连接失败: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder("utf-8");
+    let buffer = "";
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, "\n");
+      let index;
+      while ((index = buffer.indexOf("\n\n")) !== -1) {
+        const message = parseSseBlock(buffer.slice(0, index));
+        buffer = buffer.slice(index + 2);
+        if (message && onEvent) onEvent(message);
+        if (message && message.event === "end") {
+          reader.cancel();
+          return;
+        }
+      }
+    }
+  },
 };
 
 export default pytestExecutorService;
-